@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Precomputed answers for frequent questions, served without retrieval or an LLM call.
+
+The book is static, so common questions ("what is ROS 2") have stable answers. An offline job
+mines frequent questions from chat_messages (or takes a list), runs each through the normal
+RAG pipeline per language and stores the answer together with the question's embedding and a
+fingerprint of every document it cites. Online, an exact (normalised) match is a dict lookup;
+a near match costs one cached embedding and a dot product against the stored questions.
+
+Entries citing a document are retired when that document is re-indexed through the API, and
+`refresh` regenerates every entry whose cited documents changed:
+
+    python answer_index.py build --from-logs --top 200
+    python answer_index.py build --questions questions.txt --languages en ur
+    python answer_index.py refresh
+    python answer_index.py stats
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+from config import load_environment
+from cache import make_key
+from chunk_store import chunk_store
+from query_normalizer import fold
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGES = ["en", "ur"]
+
+
+class AnswerIndex:
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("ANSWER_INDEX_PATH", "./answer_index.db")
+        self.enabled = os.getenv("ANSWER_INDEX_ENABLED", "true").lower() == "true"
+        self.match_threshold = float(os.getenv("ANSWER_MATCH_THRESHOLD", "0.95"))
+        self._lock = threading.Lock()
+        self._connection = None
+
+        # In-memory view of the live entries, rebuilt when another process writes the file
+        self._data_version = None
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use so importing the module never touches the disk
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY,"
+                " language TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " response TEXT NOT NULL,"
+                " sources TEXT NOT NULL,"
+                " fingerprints TEXT NOT NULL,"
+                " stale INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _key(query: str, language: str) -> str:
+        return make_key(language, fold(query))
+
+    def _reload(self):
+        """Rebuild the in-memory view if the file changed since it was last read (call with the lock held)"""
+        # data_version only moves when another connection commits; own writes reset _data_version
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+
+        exact, entries = {}, {}
+        cursor = self._conn.execute(
+            "SELECT key, language, query, embedding, response, sources FROM answers WHERE stale = 0"
+        )
+        for key, language, query, embedding, response, sources in cursor:
+            entry = {
+                "query": query,
+                "language": language,
+                "response": response,
+                "sources": json.loads(sources),
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+            }
+            exact[key] = entry
+            entries.setdefault(language, []).append(entry)
+
+        self._exact = exact
+        self._entries = entries
+        self._matrices = {language: np.vstack([entry["embedding"] for entry in rows])
+                          for language, rows in entries.items()}
+        self._data_version = version
+        logger.info(f"Loaded {len(exact)} precomputed answers")
+
+    def exact(self, query: str, language: str = "en") -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._reload()
+            return self._exact.get(self._key(query, language))
+
+    def nearest(self, embedding: List[float], language: str = "en") -> Optional[Dict[str, Any]]:
+        """Closest stored question in this language, if its cosine similarity clears the threshold"""
+        with self._lock:
+            self._reload()
+            matrix = self._matrices.get(language)
+            if matrix is None:
+                return None
+            query = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return None
+            scores = matrix @ (query / norm)
+            best = int(np.argmax(scores))
+            if scores[best] < self.match_threshold:
+                return None
+            return {**self._entries[language][best], "similarity": float(scores[best])}
+
+    def has_entries(self, language: str = "en") -> bool:
+        with self._lock:
+            self._reload()
+            return language in self._matrices
+
+    async def lookup(self, query: str, language: str = "en") -> Optional[Dict[str, Any]]:
+        """Exact match first, then a near match on the question embedding"""
+        if not self.enabled:
+            return None
+        try:
+            entry = self.exact(query, language)
+            if entry is None and self.has_entries(language):
+                from vector_store import qdrant_service
+
+                # Served from the embedding cache for repeats, and warms it for retrieval on a miss
+                embedding = (await qdrant_service.generate_embeddings([query], cache=True))[0]
+                entry = self.nearest(embedding, language)
+            return entry
+        except sqlite3.Error as e:
+            logger.error(f"Answer index lookup failed: {e}")
+            return None
+
+    def put(self, query: str, language: str, embedding: List[float], response: str,
+            sources: List[Dict[str, Any]], fingerprints: Dict[str, str]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        # Stored vectors are only needed for matching, not in the served sources
+        sources = [{k: v for k, v in source.items() if k != "vector"} for source in sources]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (key, language, query, embedding, response, sources, fingerprints, stale, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                (self._key(query, language), language, query, vector.tobytes(), response,
+                 json.dumps(sources), json.dumps(fingerprints), time.time())
+            )
+            self._data_version = None
+
+    def _keys_citing(self, doc_ids: Iterable[str]) -> List[str]:
+        doc_ids = set(doc_ids)
+        cursor = self._conn.execute("SELECT key, fingerprints FROM answers")
+        return [key for key, fingerprints in cursor if doc_ids & set(json.loads(fingerprints))]
+
+    def invalidate_docs(self, doc_ids: List[str]) -> int:
+        """Stop serving answers that cite any of these documents; `refresh` regenerates them"""
+        with self._lock, self._conn:
+            keys = self._keys_citing(doc_ids)
+            self._conn.executemany("UPDATE answers SET stale = 1 WHERE key = ?", [(key,) for key in keys])
+            self._data_version = None
+        if keys:
+            logger.info(f"Retired {len(keys)} precomputed answers citing {', '.join(doc_ids)}")
+        return len(keys)
+
+    def _outdated_rows(self, store=None) -> List[tuple]:
+        """(key, query, language, stale) of entries that are retired or whose cited documents changed"""
+        store = store or chunk_store
+        with self._lock:
+            rows = self._conn.execute("SELECT key, query, language, fingerprints, stale FROM answers").fetchall()
+
+        cited = {doc_id for *_, fingerprints, _ in rows for doc_id in json.loads(fingerprints)}
+        current = store.fingerprints(sorted(cited))
+        return [
+            (key, query, language, stale)
+            for key, query, language, fingerprints, stale in rows
+            if stale or any(current.get(doc_id) != digest for doc_id, digest in json.loads(fingerprints).items())
+        ]
+
+    def outdated(self) -> List[Dict[str, str]]:
+        """Entries that are retired or whose cited documents no longer match their fingerprints"""
+        return [{"query": query, "language": language} for _, query, language, _ in self._outdated_rows()]
+
+    def invalidate_outdated(self, store=None) -> int:
+        """
+        Retire every live answer citing a document whose chunks changed, after the whole corpus
+        was replaced (a version switch, a snapshot import) rather than one document re-indexed
+        """
+        keys = [key for key, _, _, stale in self._outdated_rows(store) if not stale]
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE answers SET stale = 1 WHERE key = ?", [(key,) for key in keys])
+            self._data_version = None
+        if keys:
+            logger.info(f"Retired {len(keys)} precomputed answers citing changed documents")
+        return len(keys)
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT language, stale, COUNT(*) FROM answers GROUP BY language, stale")
+            return {f"{language}{' (stale)' if stale else ''}": count for language, stale, count in rows}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._data_version = None
+
+
+# Singleton instance
+answer_index = AnswerIndex()
+
+
+# ===================== OFFLINE JOB =====================
+
+def mine_frequent_queries(top: int = 100, min_count: int = 3) -> List[str]:
+    """The most frequent user questions in chat_messages, most common phrasing of each"""
+    from database import SessionLocal, ChatMessage
+
+    counts, phrasings = Counter(), {}
+    db = SessionLocal()
+    try:
+        for (content,) in db.query(ChatMessage.content).filter(ChatMessage.role == "user").yield_per(1000):
+            normalized = fold(content or "")
+            if normalized:
+                counts[normalized] += 1
+                phrasings.setdefault(normalized, Counter())[content.strip()] += 1
+    finally:
+        db.close()
+
+    return [phrasings[normalized].most_common(1)[0][0]
+            for normalized, count in counts.most_common(top) if count >= min_count]
+
+
+async def generate(questions: List[Dict[str, str]], index: AnswerIndex = answer_index) -> int:
+    """Answer each {"query", "language"} through the RAG pipeline and store the result"""
+    from rag import rag_service
+    from vector_store import qdrant_service
+
+    stored = 0
+    for item in questions:
+        query, language = item["query"], item["language"]
+        response = await rag_service.query(query, target_language=language, use_answer_index=False)
+        # tokens_used == 0 means the LLM call failed and the response is an extract; don't pin it
+        if not response.sources or response.tokens_used == 0:
+            logger.warning(f"Skipping '{query}' ({language}): no grounded answer was generated")
+            continue
+        embedding = (await qdrant_service.generate_embeddings([query], cache=True))[0]
+        doc_ids = sorted({source["doc_id"] for source in response.sources if source.get("doc_id")})
+        index.put(query, language, embedding, response.response, response.sources, chunk_store.fingerprints(doc_ids))
+        stored += 1
+        logger.info(f"Stored precomputed answer for '{query}' ({language})")
+    return stored
+
+
+def main():
+    from config import configure_logging
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="generate answers for frequent or listed questions")
+    build.add_argument("--questions", help="file with one question per line")
+    build.add_argument("--from-logs", action="store_true", help="mine frequent questions from chat_messages")
+    build.add_argument("--top", type=int, default=100)
+    build.add_argument("--min-count", type=int, default=3)
+    build.add_argument("--languages", nargs="+", default=DEFAULT_LANGUAGES)
+
+    commands.add_parser("refresh", help="regenerate answers whose cited documents changed")
+    commands.add_parser("stats", help="count stored answers")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(answer_index.count())
+        return 0
+
+    if args.command == "refresh":
+        questions = answer_index.outdated()
+    else:
+        queries = []
+        if args.questions:
+            with open(args.questions, encoding="utf-8") as f:
+                queries.extend(line.strip() for line in f if line.strip())
+        if args.from_logs:
+            queries.extend(mine_frequent_queries(args.top, args.min_count))
+        if not queries:
+            parser.error("build needs --questions and/or --from-logs")
+        queries = list({fold(q): q for q in queries}.values())
+        questions = [{"query": q, "language": language} for q in queries for language in args.languages]
+
+    stored = asyncio.run(generate(questions))
+    print(f"Stored {stored} of {len(questions)} answers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Async data-access layer for the API (asyncpg on Postgres/Neon, aiosqlite on the SQLite fallback).
+
+database.py keeps the models and the synchronous engine used by scripts; request handlers use
+this module instead, so database round trips no longer block the event loop.
+
+Pool tuning for serverless Postgres (Neon):
+    - pre-ping: Neon suspends idle computes and drops their connections, so every checkout
+      is validated and a dead connection is replaced instead of failing the request
+    - recycle: connections are retired before Neon's idle timeout closes them
+    - prepared statements: asyncpg caches a prepared statement per distinct SQL string, and the
+      upsert is built once per dialect (database.document_upsert) so its SQL (and SQLAlchemy's
+      compiled form) is reused. PgBouncer in transaction mode (Neon's "-pooler" hosts) cannot keep prepared statements,
+      so the cache is disabled for those URLs
+"""
+import logging
+import os
+from typing import AsyncIterator, Dict, Any, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import database
+
+from config import load_environment
+from database import DATABASE_URL
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+
+def async_url(url: str) -> Tuple[str, Dict[str, Any]]:
+    """Translate a sync database URL into its async-driver form plus driver connect_args"""
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1), {}
+
+    parts = urlsplit(url)
+    scheme = "postgresql+asyncpg"
+    query = dict(parse_qsl(parts.query))
+    connect_args: Dict[str, Any] = {}
+
+    # libpq-only parameters that asyncpg rejects
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = "require"
+
+    # prepared_statement_cache_size is read by SQLAlchemy's asyncpg dialect from the URL;
+    # statement_cache_size goes to asyncpg.connect
+    if "-pooler" in (parts.hostname or ""):
+        query["prepared_statement_cache_size"] = "0"
+        connect_args["statement_cache_size"] = 0
+    else:
+        query["prepared_statement_cache_size"] = os.getenv("DB_STATEMENT_CACHE_SIZE", "256")
+
+    return urlunsplit((scheme, parts.netloc, parts.path, urlencode(query), parts.fragment)), connect_args
+
+
+_engine = None
+_session_factory = None
+
+
+def get_engine():
+    """The async engine, created on first use so importing this module opens nothing"""
+    global _engine, _session_factory
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url, connect_args = async_url(DATABASE_URL)
+        options: Dict[str, Any] = {"pool_pre_ping": True}
+        if not url.startswith("sqlite"):
+            options.update(
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+                pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),
+            )
+        _engine = create_async_engine(url, connect_args=connect_args, **options)
+        _session_factory = async_sessionmaker(_engine, expire_on_commit=False, autoflush=False)
+        logger.info(f"Created async database engine ({_engine.dialect.name})")
+    return _engine
+
+
+def session_factory():
+    get_engine()
+    return _session_factory
+
+
+async def get_db() -> AsyncIterator["AsyncSession"]:
+    """FastAPI dependency: one session per request, committed on success and rolled back on error"""
+    async with session_factory()() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def dispose():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = _session_factory = None
+
+
+async def upsert_document(session, doc_id: str, title: str, content: str, section: str,
+                          is_indexed: bool = True):
+    """Insert or update the document in one statement; the existing row is never read"""
+    await session.run_sync(database.upsert_document, doc_id, title, content, section, is_indexed)
@@ -0,0 +1,179 @@
+"""
+Sentence-level citations: which retrieved chunk sentence backs each sentence of an answer.
+
+Chunks are split into sentences when they are indexed, and the sentence embeddings are kept in
+the chunk store next to the chunk text. After generation the answer is split the same way and
+its sentences are embedded in one batch; one matrix product against the sentence embeddings
+of the retrieved chunks then scores every answer sentence against every source sentence.
+Chunks indexed before sentences were stored are embedded in the same batch and stored then.
+
+A citation is {"start", "end"} of the answer sentence, "chunk_id" and "doc_id" of the source,
+"span" ([start, end] of the source sentence within the chunk text) and the cosine "score".
+"""
+import logging
+import os
+import re
+import time
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at terminal punctuation (Latin or Urdu) followed by whitespace, or at a line break
+_BOUNDARY = re.compile(r"[.!?؟۔]+[\"'”’)\]]*(?=\s)|\n")
+_FENCE = re.compile(r"```.*?(?:```|\Z)", re.DOTALL)
+_WORD = re.compile(r"\w+")
+
+
+def sentence_spans(text: str, min_words: int = 3) -> List[Tuple[int, int]]:
+    """(start, end) of each prose sentence with at least `min_words` words; fenced code is skipped"""
+    spans = []
+    prose, position = [], 0
+    for fence in _FENCE.finditer(text):
+        prose.append((position, fence.start()))
+        position = fence.end()
+    prose.append((position, len(text)))
+
+    for region_start, region_end in prose:
+        start = region_start
+        for boundary in _BOUNDARY.finditer(text, region_start, region_end):
+            spans.append((start, boundary.end()))
+            start = boundary.end()
+        spans.append((start, region_end))
+
+    result = []
+    for start, end in spans:
+        # Trim whitespace and markdown list/heading markers off the ends
+        while start < end and (text[start].isspace() or text[start] in "#>*-|"):
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if len(_WORD.findall(text[start:end])) >= min_words:
+            result.append((start, end))
+    return result
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class AttributionService:
+    def __init__(self, store=None):
+        self._store = store  # the chunk store singleton unless given
+        self.enabled = os.getenv("CITATIONS_ENABLED", "true").lower() == "true"
+        self.min_score = float(os.getenv("CITATION_MIN_SCORE", "0.5"))
+        self.min_words = 3
+
+    @property
+    def store(self):
+        if self._store is None:
+            from chunk_store import chunk_store
+            self._store = chunk_store
+        return self._store
+
+    @staticmethod
+    def _encode(spans: List[Tuple[int, int]], vectors: np.ndarray) -> Tuple[bytes, bytes]:
+        if not spans:
+            return b"", b""
+        # Unit vectors in half precision: plenty for picking the best match, half the bytes
+        return (np.asarray(spans, dtype=np.int32).tobytes(),
+                _unit(np.asarray(vectors, dtype=np.float32)).astype(np.float16).tobytes())
+
+    @staticmethod
+    def _decode(spans: bytes, vectors: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        spans = np.frombuffer(spans, dtype=np.int32).reshape(-1, 2)
+        vectors = np.frombuffer(vectors, dtype=np.float16).astype(np.float32)
+        return spans, vectors.reshape(len(spans), -1) if len(spans) else vectors.reshape(0, 0)
+
+    async def _embed_sentences(self, chunks: Dict[str, str], extra: List[str] = ()) -> List[List[float]]:
+        """
+        Split `chunks` ({point_id: text}) into sentences and store their embeddings, embedding `extra`
+        texts in the same batch; returns the embeddings of `extra`
+        """
+        from vector_store import qdrant_service
+
+        spans = {point_id: sentence_spans(text, self.min_words) for point_id, text in chunks.items()}
+        sentences = [chunks[point_id][a:b] for point_id, found in spans.items() for a, b in found]
+        embeddings = await qdrant_service.generate_embeddings(list(extra) + sentences) if extra or sentences else []
+
+        rows, offset = [], len(extra)
+        for point_id, found in spans.items():
+            rows.append((point_id, *self._encode(found, embeddings[offset:offset + len(found)])))
+            offset += len(found)
+        self.store.put_sentences(rows)
+        return embeddings[:len(extra)]
+
+    async def index_sentences(self, chunks: Dict[str, str]) -> int:
+        """Store sentence embeddings for chunks ({point_id: text}) that have none yet"""
+        if not self.enabled or not chunks:
+            return 0
+        stored = self.store.get_sentences(list(chunks))
+        missing = {point_id: text for point_id, text in chunks.items() if point_id not in stored}
+        if missing:
+            await self._embed_sentences(missing)
+        return len(missing)
+
+    async def attribute(self, answer: str, sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Best-matching source sentence for each answer sentence scoring at least CITATION_MIN_SCORE"""
+        if not self.enabled or not answer or not sources:
+            return []
+        answer_spans = sentence_spans(answer, self.min_words)
+        if not answer_spans:
+            return []
+
+        start = time.perf_counter()
+        doc_of = {}
+        for source in sources:
+            # A merged span cites the chunks it was built from
+            for point_id in source.get("merged_ids") or [source.get("id")]:
+                if point_id:
+                    doc_of.setdefault(point_id, source.get("doc_id"))
+        stored = self.store.get_sentences(list(doc_of))
+        missing = {point_id: chunk["text"] for point_id, chunk in
+                   self.store.get_many([point_id for point_id in doc_of if point_id not in stored]).items()}
+
+        answer_sentences = [answer[a:b] for a, b in answer_spans]
+        queries = await self._embed_sentences(missing, answer_sentences)
+        if missing:
+            stored.update(self.store.get_sentences(list(missing)))
+        embedded = time.perf_counter()
+
+        owners, spans, matrices = [], [], []
+        for point_id in doc_of:
+            if point_id not in stored:
+                continue
+            chunk_spans, vectors = self._decode(*stored[point_id])
+            if len(chunk_spans):
+                owners.extend([point_id] * len(chunk_spans))
+                spans.append(chunk_spans)
+                matrices.append(vectors)
+        if not matrices:
+            return []
+
+        source_vectors = np.concatenate(matrices)
+        answer_vectors = _unit(np.asarray(queries, dtype=np.float32))
+        if answer_vectors.shape[1] != source_vectors.shape[1]:
+            logger.warning("Stored sentence embeddings have another dimension than the query embeddings; "
+                           "no citations (re-index to refresh them)")
+            return []
+        scores = answer_vectors @ source_vectors.T
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        spans = np.concatenate(spans)
+
+        citations = [
+            {"start": a, "end": b, "chunk_id": owners[j], "doc_id": doc_of[owners[j]],
+             "span": [int(spans[j][0]), int(spans[j][1])], "score": round(float(score), 3)}
+            for (a, b), j, score in zip(answer_spans, best.tolist(), best_scores.tolist())
+            if score >= self.min_score
+        ]
+        logger.info(f"Attributed {len(citations)} of {len(answer_spans)} answer sentences against "
+                    f"{len(owners)} source sentences in {(time.perf_counter() - start) * 1000:.1f} ms "
+                    f"(matching {(time.perf_counter() - embedded) * 1000:.1f} ms)")
+        return citations
+
+
+# Singleton instance
+attribution_service = AttributionService()
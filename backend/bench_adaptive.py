@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Calibrate ADAPTIVE_MIN_SCORE and report what the adaptive retrieval policy saves.
+
+Answerable queries are the section headings of frontend/docs (as in bench_rerank.py);
+unanswerable ones are off-topic questions the book cannot answer. The script prints the
+top-hit score distribution of both sets, the threshold that best separates them, and the
+branch mix and context tokens saved at that threshold. Run it with the production
+embedding model configured (GOOGLE_API_KEY) - placeholder embeddings carry no meaning.
+
+Usage:
+    python bench_adaptive.py --limit 5
+"""
+import argparse
+import asyncio
+import statistics
+from collections import Counter
+
+import numpy as np
+
+from bench_rerank import build_labelled_set
+from retrieval_policy import AdaptivePolicy, NO_MATCH
+from tokens import count_tokens
+from vector_store import qdrant_service
+
+OFF_TOPIC = [
+    "What is the best pizza dough recipe?",
+    "Who won the football world cup in 2014?",
+    "How do I file my income tax return?",
+    "What is the capital of Australia?",
+    "Recommend a good romantic comedy movie",
+    "How many calories are in a banana?",
+    "What are the symptoms of the flu?",
+    "How do I repot a cactus?",
+    "Explain the rules of cricket",
+    "What is the exchange rate of the euro today?",
+    "How do I knit a scarf?",
+    "Who painted the Mona Lisa?",
+    "What is the plot of Pride and Prejudice?",
+    "How do I bake sourdough bread?",
+    "Which stocks should I buy this year?",
+    "What time zone is Tokyo in?",
+]
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    return " ".join(f"p{p}={ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]:.3f}" for p in (5, 50, 95))
+
+
+async def run(limit: int):
+    chunks, labelled = build_labelled_set()
+    queries = [q for q, _ in labelled] + OFF_TOPIC
+    answerable = np.array([True] * len(labelled) + [False] * len(OFF_TOPIC))
+
+    chunk_vectors = np.asarray(await qdrant_service.generate_embeddings(chunks))
+    query_vectors = np.asarray(await qdrant_service.generate_embeddings(queries))
+    chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    scores = query_vectors @ chunk_vectors.T
+    top = np.argsort(-scores, axis=1)[:, :limit]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+
+    print(f"{answerable.sum()} answerable / {(~answerable).sum()} off-topic queries over {len(chunks)} chunks")
+    print(f"top score, answerable: {percentiles(top_scores[answerable, 0])}")
+    print(f"top score, off-topic:  {percentiles(top_scores[~answerable, 0])}")
+
+    # Threshold with the best balanced accuracy between the two sets
+    best = max(
+        np.unique(top_scores[:, 0]),
+        key=lambda t: ((top_scores[answerable, 0] >= t).mean() + (top_scores[~answerable, 0] < t).mean())
+    )
+    print(f"suggested ADAPTIVE_MIN_SCORE={best:.3f}")
+
+    policy = AdaptivePolicy()
+    policy.min_score = float(best)
+    branches, saved, baseline = Counter(), [], []
+    for row, indices in enumerate(top):
+        docs = [{"text": chunks[i], "score": float(s)} for i, s in zip(indices, top_scores[row])]
+        decision = policy.decide(docs, limit, 4096)
+        branches[(decision.branch, bool(answerable[row]))] += 1
+        baseline.append(sum(count_tokens(doc["text"]) for doc in docs))
+        saved.append(decision.prompt_tokens_saved)
+
+    for (branch, is_answerable), count in sorted(branches.items()):
+        print(f"  {branch:<10} {'answerable' if is_answerable else 'off-topic':<11} {count}")
+    skipped = sum(count for (branch, _), count in branches.items() if branch == NO_MATCH)
+    print(f"context tokens saved: {sum(saved)} of {sum(baseline)} ({sum(saved) / max(1, sum(baseline)):.1%}), "
+          f"completions skipped: {skipped}, mean saved per query: {statistics.mean(saved):.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.limit))
+
+
+if __name__ == "__main__":
+    main()
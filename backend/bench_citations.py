@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cost of sentence-level citations (attribution.py) and the response size they save.
+
+Chunks frontend/docs plus --pages generated pages as the indexer does and stores sentence
+embeddings for every chunk. Then for --answers simulated answers, each made of four sentences
+from 5 retrieved chunks plus one sentence from elsewhere in the book, it measures:
+
+    stage ms   attribution, answer-sentence embedding included (placeholder embeddings, so
+               this is local cost; with an embedding API add one round trip). Placeholder
+               vectors carry no meaning, so which sentences get cited is not measured here
+    bytes      the chat response's sources as full chunk dicts, against compact sources
+               plus citations
+
+Usage:
+    python bench_citations.py --pages 200 --answers 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ["CHUNK_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "chunks.db")
+
+
+def generated_pages(pages: int, seed: int = 0):
+    from bench_dedup import WORDS
+
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = [
+            " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))).capitalize() + "."
+                     for _ in range(rng.randint(3, 6)))
+            for _ in range(rng.randint(3, 8))
+        ]
+        documents.append({"doc_id": f"lesson-{page}", "title": f"Lesson {page}", "section": f"module-{page % 8}",
+                          "content": f"# Lesson {page}\n\n" + "\n\n".join(paragraphs)})
+    return documents
+
+
+async def run(pages: int, answers: int, sources_per_answer: int = 5):
+    from attribution import attribution_service, sentence_spans
+    from bench_dedup import docs_corpus
+    from chunk_store import chunk_store, content_key, point_id_for
+    from chunking import section_spans, chunk_metadata
+    from rag import compact_sources
+
+    chunks = []
+    for document in docs_corpus() + generated_pages(pages):
+        content = document["content"]
+        spans = section_spans(content)
+        for (start, end), meta in zip(spans, chunk_metadata(content, spans, section=document["section"],
+                                                              title=document["title"])):
+            text = content[start:end]
+            chunks.append({"id": point_id_for(content_key(text)), "text": text, "doc_id": document["doc_id"],
+                           "score": 0.8, "metadata": meta})
+    chunks = [chunk for chunk in chunks if sentence_spans(chunk["text"])]
+    chunk_store.add_refs([(chunk["id"], content_key(chunk["text"]), chunk["doc_id"], i, chunk["text"], chunk["metadata"])
+                          for i, chunk in enumerate(chunks)])
+
+    start = time.perf_counter()
+    await attribution_service.index_sentences({chunk["id"]: chunk["text"] for chunk in chunks})
+    print(f"{len(chunks)} chunks, sentence embeddings stored in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(0)
+    timings, full_bytes, compact_bytes = [], [], []
+    for _ in range(answers):
+        sources = rng.sample(chunks, sources_per_answer)
+        pool = [source["text"][a:b] for source in sources for a, b in sentence_spans(source["text"])]
+        outside = rng.choice([chunk for chunk in chunks if chunk not in sources])["text"]
+        a, b = rng.choice(sentence_spans(outside))
+        answer = " ".join(rng.sample(pool, min(4, len(pool))) + [outside[a:b]])
+
+        start = time.perf_counter()
+        citations = await attribution_service.attribute(answer, sources)
+        timings.append((time.perf_counter() - start) * 1000)
+        full_bytes.append(len(json.dumps({"response": answer, "sources": sources})))
+        compact_bytes.append(len(json.dumps({"response": answer, "sources": compact_sources(sources),
+                                             "citations": citations})))
+
+    timings.sort()
+    print(f"stage ms      p50 {statistics.median(timings):.2f}, p95 {timings[int(0.95 * (len(timings) - 1))]:.2f}")
+    print(f"bytes         {statistics.mean(full_bytes):.0f} full sources -> "
+          f"{statistics.mean(compact_bytes):.0f} compact sources + citations "
+          f"({1 - statistics.mean(compact_bytes) / statistics.mean(full_bytes):.0%} smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.answers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Cost of the cross-lingual query path (cross_lingual.py) for Urdu questions.
+
+--questions distinct Urdu questions are each asked --repeats times, written the ways Urdu
+keyboards and users vary them (Arabic yeh and kaf, diacritics, tatweel, a zero-width non-joiner,
+a trailing ؟). Translation goes to a stand-in translator answering after --latency-ms, the
+typical time of a short Gemini completion. Reports:
+
+    calls       translations requested, against questions asked
+    miss ms     english_query on a cache miss (the translation round trip)
+    hit us      english_query on a cache hit: script detection, folding and the cache lookup
+    en us       english_query for an English question (script detection only)
+
+Usage:
+    python bench_cross_lingual.py --questions 50 --repeats 10 --latency-ms 400
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+STEMS = ["ہیومنائڈ روبوٹ کیا ہے", "روبوٹ توازن کیسے رکھتے ہیں", "سینسر کی اقسام بتائیں",
+         "ROS 2 میں نوڈ کیا ہے", "سیمولیشن کیوں ضروری ہے", "جوڑوں کا ٹارک کیسے ناپا جاتا ہے"]
+
+
+def spelling_variant(question: str, rng: random.Random) -> str:
+    """The same question as another user might type it"""
+    edits = [
+        lambda q: q.replace("ی", "ي"),
+        lambda q: q.replace("ک", "ك"),
+        lambda q: q.replace("ا", "ا\u064e", 1),
+        lambda q: q.replace("ہ", "ہ\u0640", 1),
+        lambda q: q.replace(" ", " \u200c", 1),
+        lambda q: q + "؟",
+    ]
+    for edit in rng.sample(edits, rng.randint(0, 3)):
+        question = edit(question)
+    return question
+
+
+class DelayedTranslator:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    async def translate(self, text, source_lang="en", target_lang="ur"):
+        from translation_service import TranslationResponse
+
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return TranslationResponse(translated_text=f"question {self.calls}", source_lang=source_lang,
+                                   target_lang=target_lang, tokens_used=20)
+
+
+async def run(questions: int, repeats: int, latency_ms: float):
+    from cross_lingual import CrossLingualService
+
+    rng = random.Random(0)
+    translator = DelayedTranslator(latency_ms)
+    service = CrossLingualService(translator)
+    distinct = [f"{rng.choice(STEMS)} {i}" for i in range(questions)]
+    asked = [spelling_variant(question, rng) for question in distinct for _ in range(repeats)]
+    rng.shuffle(asked)
+
+    misses, hits = [], []
+    for question in asked:
+        calls = translator.calls
+        start = time.perf_counter()
+        await service.english_query(question)
+        (misses if translator.calls > calls else hits).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(len(asked)):
+        await service.english_query("How do humanoid robots keep their balance?")
+    english = (time.perf_counter() - start) / len(asked)
+
+    print(f"calls       {translator.calls} translations for {len(asked)} questions "
+          f"({len(distinct)} distinct, {len(set(asked))} distinct spellings)")
+    print(f"miss ms     {statistics.median(misses) * 1000:.0f}")
+    print(f"hit us      {statistics.median(hits) * 1e6:.1f}")
+    print(f"en us       {english * 1e6:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    args = parser.parse_args()
+    asyncio.run(run(args.questions, args.repeats, args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Per-request database overhead under concurrency: the old handler pattern (a synchronous
+SessionLocal opened, queried and committed inside the async handler) against the async pool
+in async_db.py.
+
+Each simulated request looks a document up and logs a chat exchange, like /chat and
+/index-document do. All requests arrive at once and latency is measured from that arrival;
+"max loop stall" is how long the event loop (and so every other request on the worker) was
+blocked at worst.
+
+By default a throwaway SQLite file (aiosqlite) stands in for Postgres. Set NEON_DB_URL to
+measure against the real database, where the blocking pattern stalls the event loop for
+every network round trip.
+
+Usage:
+    python bench_db.py --requests 256 --concurrency 1 16 64
+    NEON_DB_URL=postgresql://... python bench_db.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("NEON_DB_URL"):
+    os.environ["NEON_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import async_db  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from database import SessionLocal, Document, ChatMessage, init_db  # noqa: E402
+
+
+def sync_request(i: int):
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.doc_id == f"doc-{i % 16}").first()
+        db.add(ChatMessage(session_id="bench", role="user", content=f"question {i}"))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def async_request(i: int):
+    async with async_db.session_factory()() as db:
+        await db.execute(select(Document).where(Document.doc_id == f"doc-{i % 16}"))
+        db.add(ChatMessage(session_id="bench", role="user", content=f"question {i}"))
+        await db.commit()
+
+
+async def run_mode(mode: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    lag = [0.0]
+    done = asyncio.Event()
+
+    async def one(i: int):
+        async with semaphore:
+            if mode == "sync":
+                sync_request(i)  # blocks the event loop, as the handlers used to
+            else:
+                await async_request(i)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    async def ticker():
+        # How late a 1 ms timer fires: the stall every other request on the worker sees
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag[0] = max(lag[0], (time.perf_counter() - start) * 1000 - 1)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    arrival = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - arrival
+    done.set()
+    await tick
+    latencies.sort()
+    return (statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1],
+            len(latencies) / elapsed, lag[0])
+
+
+async def run(requests: int, levels):
+    init_db()
+    async with async_db.session_factory()() as db:
+        for i in range(16):
+            await async_db.upsert_document(db, f"doc-{i}", f"Doc {i}", "text " * 200, "bench")
+        await db.commit()
+    await async_request(0)  # open the pool before timing
+
+    print(f"{requests} requests against {async_db.get_engine().dialect.name}")
+    for concurrency in levels:
+        for mode in ("sync", "async"):
+            p50, p95, throughput, lag = await run_mode(mode, requests, concurrency)
+            print(f"concurrency {concurrency:>3}  {mode:<5}  p50={p50:8.2f} ms  p95={p95:8.2f} ms  "
+                  f"{throughput:6.0f} req/s  max loop stall={lag:7.2f} ms")
+    await async_db.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
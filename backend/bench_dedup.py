@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Vector count and embedding spend with content-deduplicated chunk storage.
+
+Indexes a corpus through QdrantService.store_embeddings into an in-process Qdrant collection
+and compares what was stored and embedded with what per-occurrence storage (one point and
+one embedding per chunk) would have cost:
+
+    docs       frontend/docs as index_book.py reads it
+    synthetic  --pages generated pages that all open with the same navigation/license header,
+               with --copies of them republished under a second doc_id (cross-listed pages
+               that differ only in trailing whitespace)
+
+Chunks are fixed-size windows (chunking.py), so repeated text is shared only where it lines up
+with chunk boundaries: whole repeated pages and headers at least one chunk long.
+
+Usage:
+    python bench_dedup.py --pages 200 --copies 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+
+from chunking import chunk_spans, chunk_metadata
+from tokens import count_tokens
+
+# Only chunk embeddings are counted; sentence embeddings for citations would inflate them
+os.environ.setdefault("CITATIONS_ENABLED", "false")
+
+HEADER = (
+    "Physical AI & Humanoid Robotics | Home | Modules | Lab Setup | Glossary | Search\n\n"
+    "This page is part of an open textbook. Content is licensed under CC BY-SA 4.0; code "
+    "samples are licensed under the Apache License 2.0. You may share and adapt the material "
+    "for any purpose, provided you give appropriate credit, link to the license and indicate "
+    "if changes were made. Report errors or suggest improvements through the course "
+    "repository's issue tracker. Lab exercises assume the reference workstation described in "
+    "the Lab Setup module; instructions for other hardware may differ. Safety notice: never "
+    "run motion code on a physical robot without an emergency stop within reach, and test "
+    "every controller in simulation first. Version 2.3, revised for ROS 2 Humble and Isaac "
+    "Sim 4. Translations into Urdu are machine-assisted and reviewed by the course staff; "
+    "the English text is authoritative where the two differ. Questions about the course go to "
+    "the discussion forum linked from the home page, not to individual instructors.\n\n"
+)
+
+WORDS = ("robot actuator sensor torque balance gait controller policy simulation joint frame "
+         "topic node service lidar camera kinematics dynamics trajectory planner reward").split()
+
+
+def docs_corpus():
+    from index_book import read_book_content
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return read_book_content()
+    finally:
+        os.chdir(cwd)
+
+
+def synthetic_corpus(pages: int, copies: float, seed: int = 0):
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 160))).capitalize() + "."
+            for _ in range(rng.randint(3, 8))
+        ]
+        body = f"# Lesson {page}\n\n" + "\n\n".join(paragraphs)
+        documents.append({"doc_id": f"lesson-{page}", "title": f"Lesson {page}",
+                          "section": f"module-{page % 8}", "content": HEADER + body})
+    for page in rng.sample(range(pages), int(pages * copies)):
+        # Same page cross-listed elsewhere, differing only in trailing whitespace
+        original = documents[page]
+        documents.append({**original, "doc_id": f"{original['doc_id']}-v2", "section": "archive",
+                          "content": original["content"] + " \n"})
+    return documents
+
+
+async def index(documents):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+    from chunk_store import chunk_store
+    from vector_store import qdrant_service
+
+    client = QdrantClient(":memory:")
+    client.create_collection(qdrant_service.collection_name,
+                             vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE))
+    qdrant_service.client, qdrant_service._connected = client, True
+    chunk_store.close()
+    chunk_store.path = os.path.join(tempfile.mkdtemp(), "chunks.db")
+
+    embedded = []
+    generate = qdrant_service.generate_embeddings
+
+    async def counting(texts):
+        embedded.extend(texts)
+        return await generate(texts)
+    qdrant_service.generate_embeddings = counting
+
+    chunks = []
+    try:
+        for document in documents:
+            spans = chunk_spans(document["content"])
+            texts = [document["content"][start:end] for start, end in spans]
+            chunks.extend(texts)
+            metadata = chunk_metadata(document["content"], spans, section=document["section"], title=document["title"])
+            await qdrant_service.store_embeddings(texts, [document["doc_id"]] * len(texts), metadata, replace=True)
+    finally:
+        qdrant_service.generate_embeddings = generate
+
+    return {
+        "documents": len(documents),
+        "chunks": len(chunks),
+        "points": client.count(qdrant_service.collection_name).count,
+        "embedded": len(embedded),
+        "tokens_before": sum(count_tokens(text) for text in chunks),
+        "tokens_after": sum(count_tokens(text) for text in embedded),
+        **{f"store_{key}": value for key, value in chunk_store.stats().items()},
+    }
+
+
+def report(name: str, stats):
+    def drop(before, after):
+        return f"{before} -> {after} ({(before - after) / before:.1%} fewer)" if before else "n/a"
+
+    print(f"{name}: {stats['documents']} documents, {stats['chunks']} chunks, "
+          f"{stats['store_shared_chunks']} chunks shared by several occurrences")
+    print(f"  vectors          {drop(stats['chunks'], stats['points'])}")
+    print(f"  embedding calls  {drop(stats['chunks'], stats['embedded'])} texts")
+    print(f"  embedding tokens {drop(stats['tokens_before'], stats['tokens_after'])}")
+
+
+async def run(pages: int, copies: float):
+    report("frontend/docs", await index(docs_corpus()))
+    report("synthetic", await index(synthetic_corpus(pages, copies)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--copies", type=float, default=0.3, help="fraction of pages republished under a second doc_id")
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.copies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compare single-query retrieval with query expansion (question + rewrites, one batch search,
+reciprocal rank fusion) on the labelled queries from frontend/docs (see bench_rerank.py).
+
+The chunks go into an in-process Qdrant collection; --rtt-ms of latency is added per call to
+the client, so the latency columns show what expansion costs against a remote Qdrant. Recall
+only means something with the production embedding model configured (GOOGLE_API_KEY).
+
+Usage:
+    python bench_expansion.py --limit 5 --rtt-ms 30
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from bench_rerank import build_labelled_set, metrics
+from query_expansion import QueryExpansionService
+from vector_store import qdrant_service
+
+
+async def load_collection(chunks, rtt_ms: float):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+    from chunk_store import chunk_store, content_key
+
+    client = QdrantClient(":memory:")
+    client.create_collection(qdrant_service.collection_name,
+                             vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE))
+    vectors = await qdrant_service.generate_embeddings(chunks)
+    ids = [str(uuid.uuid4()) for _ in chunks]
+    client.upsert(qdrant_service.collection_name, points=[
+        models.PointStruct(id=point_id, vector=vector, payload={"doc_id": "book", "chunk_index": i})
+        for i, (point_id, vector) in enumerate(zip(ids, vectors))
+    ])
+    chunk_store.path = os.path.join(tempfile.mkdtemp(), "chunks.db")
+    chunk_store.add_refs([(point_id, content_key(text), "book", i, text, {"index": i})
+                          for i, (point_id, text) in enumerate(zip(ids, chunks))])
+
+    # One simulated network round trip per client call, single or batch
+    for name in ("query_points", "query_batch_points"):
+        method = getattr(client, name)
+
+        def delayed(*args, _method=method, **kwargs):
+            time.sleep(rtt_ms / 1000)
+            return _method(*args, **kwargs)
+        setattr(client, name, delayed)
+
+    qdrant_service.client, qdrant_service._connected = client, True
+
+
+async def run(limit: int, rtt_ms: float, variants: int):
+    chunks, queries = build_labelled_set()
+    await load_collection(chunks, rtt_ms)
+
+    expansion = QueryExpansionService()
+    expansion.max_variants = variants
+    # Embeddings of every query and variant are computed up front, so only search latency is compared
+    await qdrant_service.generate_embeddings([q for query, _ in queries for q in await expansion.expand(query)],
+                                         cache=True)
+
+    rows = {"single query": ([], []), "expanded + RRF": ([], [])}
+    for query, relevant in queries:
+        start = time.perf_counter()
+        hits = await qdrant_service.search_similar(query, limit=limit)
+        rows["single query"][1].append((time.perf_counter() - start) * 1000)
+        rows["single query"][0].append(metrics([hit["metadata"]["index"] for hit in hits], relevant, limit))
+
+        start = time.perf_counter()
+        fused = expansion.fuse(await qdrant_service.search_similar_batch(await expansion.expand(query), limit=limit))
+        rows["expanded + RRF"][1].append((time.perf_counter() - start) * 1000)
+        rows["expanded + RRF"][0].append(metrics([hit["metadata"]["index"] for hit in fused], relevant, limit))
+
+    print(f"{len(queries)} labelled queries over {len(chunks)} chunks, up to {variants} variants, rtt {rtt_ms:.0f} ms")
+    for name, (quality, latencies) in rows.items():
+        print(f"{name:<15} recall@{limit}={statistics.mean(r for r, _ in quality):.3f}  "
+              f"MRR@{limit}={statistics.mean(rr for _, rr in quality):.3f}  "
+              f"latency p50={statistics.median(latencies):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=30)
+    parser.add_argument("--variants", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.limit, args.rtt_ms, args.variants))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark payload-filtered Qdrant search against unfiltered search with post-filtering.
+
+Usage:
+    python bench_filtered_search.py                      # in-process Qdrant (:memory:)
+    python bench_filtered_search.py --url http://localhost:6333 --points 200000
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from vector_store import INDEXED_PAYLOAD_FIELDS
+
+COLLECTION = "bench_filtered_search"
+
+
+def build_collection(client: QdrantClient, points: int, dim: int, sections: int, batch_size: int = 1000):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE)
+    )
+    for field_name in INDEXED_PAYLOAD_FIELDS:
+        client.create_payload_index(COLLECTION, field_name, models.PayloadSchemaType.KEYWORD)
+
+    rng = np.random.default_rng(42)
+    for offset in range(0, points, batch_size):
+        count = min(batch_size, points - offset)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        batch = []
+        for i in range(count):
+            n = offset + i
+            section = f"section-{n % sections}"
+            batch.append(models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vectors[i].tolist(),
+                payload={
+                    "doc_id": f"doc-{n % (sections * 10)}",
+                    "section": section,
+                    "heading_path": [section, f"{section} > part-{n % 7}"],
+                }
+            ))
+        client.upsert(collection_name=COLLECTION, points=batch)
+
+
+def run(client: QdrantClient, queries: int, dim: int, sections: int, limit: int, overfetch: int):
+    rng = np.random.default_rng(7)
+    filtered_ms, post_ms, unfiltered_ms = [], [], []
+    post_filled = 0
+
+    for q in range(queries):
+        vector = rng.standard_normal(dim, dtype=np.float32).tolist()
+        section = f"section-{q % sections}"
+        query_filter = models.Filter(must=[
+            models.FieldCondition(key="section", match=models.MatchValue(value=section))
+        ])
+
+        start = time.perf_counter()
+        client.query_points(COLLECTION, query=vector, limit=limit)
+        unfiltered_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        client.query_points(COLLECTION, query=vector, query_filter=query_filter, limit=limit)
+        filtered_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        hits = client.query_points(COLLECTION, query=vector, limit=limit * overfetch).points
+        kept = [hit for hit in hits if hit.payload.get("section") == section][:limit]
+        post_ms.append((time.perf_counter() - start) * 1000)
+        post_filled += len(kept)
+
+    def describe(name, samples):
+        ordered = sorted(samples)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        print(f"{name:<28} p50={statistics.median(samples):7.2f} ms  p95={p95:7.2f} ms")
+
+    describe("unfiltered", unfiltered_ms)
+    describe("payload-filtered", filtered_ms)
+    describe(f"post-filtered (x{overfetch})", post_ms)
+    print(f"post-filter fill rate: {post_filled / (queries * limit):.1%} of requested hits "
+          f"(payload filter always returns {limit} when the section has enough points)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:", help="Qdrant URL, or :memory: for the local engine")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=10)
+    args = parser.parse_args()
+
+    client = QdrantClient(location=args.url) if args.url == ":memory:" else QdrantClient(url=args.url)
+    print(f"Building {args.points} points ({args.dim} dims, {args.sections} sections) at {args.url}...")
+    build_collection(client, args.points, args.dim, args.sections)
+    run(client, args.queries, args.dim, args.sections, args.limit, args.overfetch)
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
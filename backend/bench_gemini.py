@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load test of GeminiService against a local fake of the Gemini API.
+
+The fake answers after --latency-ms (+-50% jitter) and, like a per-key quota, rejects a call
+with 429 whenever --quota calls are already in flight. --requests chat completions arrive at
+once and are run through three configurations:
+
+    unbounded  no concurrency limit and no retries (how calls were made before)
+    retry      no concurrency limit, 429s retried with jittered backoff
+    limited    GEMINI_MAX_CONCURRENCY = quota, plus the retries
+
+For each: answers returned, quota fallbacks, calls the fake received, and answer latency.
+
+Usage:
+    python bench_gemini.py --requests 200 --quota 4 --latency-ms 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+
+class FakeGemini:
+    def __init__(self, quota: int, latency_ms: float):
+        from gemini_service import load_genai
+
+        self.protos = load_genai().protos
+        self.quota, self.latency = quota, latency_ms / 1000
+        self.in_flight = self.calls = self.rejected = 0
+
+    async def generate_content(self, request, timeout=None, retry=None):
+        from google.api_core import exceptions
+
+        self.calls += 1
+        if self.in_flight >= self.quota:
+            self.rejected += 1
+            await asyncio.sleep(0.005)
+            raise exceptions.TooManyRequests("Resource has been exhausted (e.g. check quota).")
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        finally:
+            self.in_flight -= 1
+        return self.protos.GenerateContentResponse(
+            candidates=[{"content": {"role": "model", "parts": [{"text": "An answer from the book."}]}}],
+            usage_metadata={"prompt_token_count": 800, "candidates_token_count": 120},
+        )
+
+
+async def run(name: str, requests: int, quota: int, latency_ms: float, concurrency: int, retries: int):
+    from gemini_service import GeminiService
+
+    fake = FakeGemini(quota, latency_ms)
+    gemini = GeminiService()
+    gemini._client, gemini.max_retries, gemini.retry_base_delay = fake, retries, latency_ms / 1000
+    gemini._semaphore = asyncio.Semaphore(concurrency)
+    messages = [{"role": "system", "content": "Answer from the book."}, {"role": "user", "content": "What is ROS 2?"}]
+
+    async def one():
+        start = time.perf_counter()
+        response = await gemini.get_chat_completion(messages)
+        return response.tokens_used > 0, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency * 1000 for ok, latency in results if ok)
+    answered = len(latencies)
+    p95 = latencies[int(0.95 * (answered - 1))] if latencies else float("nan")
+    print(f"{name:<10} {answered:>8} {requests - answered:>9} {fake.calls:>7} {fake.rejected:>9} "
+          f"{statistics.median(latencies) if latencies else float('nan'):>8.0f} {p95:>8.0f} {wall:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--quota", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+    random.seed(0)
+
+    print(f"{'config':<10} {'answered':>8} {'fallbacks':>9} {'calls':>7} {'rejected':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'wall s':>7}")
+    unlimited = args.requests
+    asyncio.run(run("unbounded", args.requests, args.quota, args.latency_ms, unlimited, 0))
+    asyncio.run(run("retry", args.requests, args.quota, args.latency_ms, unlimited, 3))
+    asyncio.run(run("limited", args.requests, args.quota, args.latency_ms, args.quota, 3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Per-query cost of query normalization (query_normalizer.py) and the exact-key cache hits it adds.
+
+The spelling vocabulary is mined from frontend/docs, padded with --vocabulary synthetic words
+(Zipf-distributed counts) so lookups run against an index the size of a full textbook's. Questions
+are built from words of the book; each is asked --variants times in the ways users repeat
+themselves: different case, trailing punctuation, doubled spaces, one transposed or dropped letter.
+
+    build s        mining the vocabulary and building the symmetric-delete index (and its size)
+    fold us        Unicode, case and punctuation folding alone, per query
+    correct us     folding plus spelling correction, per query (clean / with a typo)
+    hit rate       share of questions answerable from an exact-key cache (retrieval, embedding
+                   and answer index) keyed on the raw text against the normalized text
+
+Usage:
+    python bench_normalize.py --vocabulary 20000 --questions 500 --variants 4
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+
+os.environ["CHUNK_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "chunks.db")
+
+
+def synthetic_texts(words: int, rng: random.Random):
+    """Texts in which `words` random pseudo-words occur with Zipf-like counts"""
+    vocabulary = {"".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+                  for _ in range(words)}
+    return [" ".join([word] * max(2, int(2000 / rank))) for rank, word in enumerate(sorted(vocabulary), 1)]
+
+
+def variant(question: str, rng: random.Random) -> str:
+    kind = rng.randrange(4)
+    if kind == 0:
+        return question.capitalize() + "?"
+    if kind == 1:
+        return question.upper() if rng.random() < 0.2 else question.title()
+    if kind == 2:
+        return question.replace(" ", "  ", 1) + "??"
+    words = question.split()
+    long_words = [i for i, word in enumerate(words) if len(word) >= 6]
+    if not long_words:
+        return question + " ?"
+    i = rng.choice(long_words)
+    word, j = words[i], rng.randint(1, len(words[i]) - 3)
+    words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:] if rng.random() < 0.5 else word[:j] + word[j + 1:]
+    return " ".join(words)
+
+
+def timed(fn, queries, repeat: int = 3) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--variants", type=int, default=4)
+    args = parser.parse_args()
+
+    from bench_dedup import docs_corpus
+    from chunk_store import chunk_store, content_key
+    from query_normalizer import fold, query_normalizer
+
+    rng = random.Random(0)
+    book = [document["content"] for document in docs_corpus()]
+    texts = book + synthetic_texts(args.vocabulary, rng)
+    chunk_store.add_refs((f"p{i}", content_key(text), "bench", i, text, {}) for i, text in enumerate(texts))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = query_normalizer.index()
+    elapsed, size = time.perf_counter() - start, tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"build s       {elapsed:.2f} ({len(index.frequencies)} words, {len(index._deletes)} delete keys, "
+          f"{size / 1e6:.0f} MB)")
+
+    book_words = sorted({word for word in fold(" ".join(book)).split() if len(word) >= 4 and word.isalpha()})
+    templates = ["what is {} {}", "how does {} work with {}", "explain {} and {}", "{} {}"]
+    questions = [rng.choice(templates).format(*rng.sample(book_words, 2)) for _ in range(args.questions)]
+    asked = [variant(question, rng) for question in questions for _ in range(args.variants)]
+    typos = [query for query in asked if fold(query) not in {fold(q) for q in questions}]
+
+    print(f"fold us       {timed(fold, asked):.1f}")
+    print(f"correct us    {timed(query_normalizer.normalize_sync, questions):.1f} clean, "
+          f"{timed(query_normalizer.normalize_sync, typos):.1f} with a typo")
+
+    raw = set(questions)
+    normalized = {query_normalizer.normalize_sync(question) for question in questions}
+    raw_hits = sum(query in raw for query in asked)
+    normalized_hits = sum(query_normalizer.normalize_sync(query) in normalized for query in asked)
+    print(f"hit rate      {raw_hits / len(asked):.0%} raw keys -> {normalized_hits / len(asked):.0%} normalized "
+          f"({len(asked)} repeats of {len(questions)} cached questions)")
+
+
+if __name__ == "__main__":
+    main()
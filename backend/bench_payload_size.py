@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compare search response size and latency for points that carry the full chunk text
+in their Qdrant payload ("fat") against slim payloads hydrated from the chunk store, and the
+slim search as it runs with MMR on ("vectors": MMR_OVERFETCH times the candidates, each with
+its embedding).
+
+Usage:
+    python bench_payload_size.py                      # in-process Qdrant (:memory:)
+    python bench_payload_size.py --url http://localhost:6333 --copies 50
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from chunk_store import ChunkStore, content_key
+from chunking import chunk_spans, chunk_metadata
+from vector_store import PAYLOAD_FIELDS
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "frontend" / "docs"
+
+
+def load_chunks(copies: int):
+    chunks = []
+    for path in sorted(DOCS_DIR.rglob("*.md")):
+        content = path.read_text(encoding="utf-8")
+        spans = chunk_spans(content)
+        metadata = chunk_metadata(content, spans, section=path.parent.name, title=path.stem)
+        for (start, end), meta in zip(spans, metadata):
+            chunks.append((path.stem, content[start:end], meta))
+    # Replicate the book so the collection is large enough to matter
+    return [(f"{doc_id}-{n}", text, meta) for n in range(copies) for doc_id, text, meta in chunks]
+
+
+def build(client: QdrantClient, store: ChunkStore, chunks, dim: int):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((len(chunks), dim), dtype=np.float32)
+    for name in ("bench_fat", "bench_slim"):
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        client.create_collection(name, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+
+    fat, slim, rows = [], [], []
+    for i, (doc_id, text, meta) in enumerate(chunks):
+        point_id = str(uuid.uuid4())
+        fat.append(models.PointStruct(id=point_id, vector=vectors[i].tolist(),
+                                      payload={"text": text, "doc_id": doc_id, **meta}))
+        slim.append(models.PointStruct(id=point_id, vector=vectors[i].tolist(),
+                                       payload={"doc_id": doc_id, **{k: v for k, v in meta.items() if k in PAYLOAD_FIELDS}}))
+        rows.append((point_id, content_key(text), doc_id, i, text, {k: v for k, v in meta.items() if k not in PAYLOAD_FIELDS}))
+
+    for offset in range(0, len(chunks), 500):
+        client.upsert("bench_fat", points=fat[offset:offset + 500])
+        client.upsert("bench_slim", points=slim[offset:offset + 500])
+    store.add_refs(rows)
+
+
+def response_bytes(points) -> int:
+    # Size of the equivalent REST response body
+    return len(json.dumps([{"id": str(p.id), "score": p.score, "payload": p.payload,
+                            **({"vector": p.vector} if p.vector is not None else {})} for p in points]).encode())
+
+
+def run(client: QdrantClient, store: ChunkStore, dim: int, queries: int, limit: int, overfetch: int):
+    rng = np.random.default_rng(2)
+    results = {"fat": ([], []), "slim": ([], []), "vectors": ([], [])}
+
+    for _ in range(queries):
+        vector = rng.standard_normal(dim, dtype=np.float32).tolist()
+
+        start = time.perf_counter()
+        points = client.query_points("bench_fat", query=vector, limit=limit, with_payload=True).points
+        texts = [p.payload["text"] for p in points]
+        results["fat"][0].append((time.perf_counter() - start) * 1000)
+        results["fat"][1].append(response_bytes(points))
+
+        start = time.perf_counter()
+        points = client.query_points("bench_slim", query=vector, limit=limit, with_payload=PAYLOAD_FIELDS).points
+        stored = store.get_many([str(p.id) for p in points])
+        texts = [stored[str(p.id)]["text"] for p in points]
+        results["slim"][0].append((time.perf_counter() - start) * 1000)
+        results["slim"][1].append(response_bytes(points))
+        assert len(texts) == len(points)
+
+        start = time.perf_counter()
+        points = client.query_points("bench_slim", query=vector, limit=limit * overfetch,
+                                     with_payload=PAYLOAD_FIELDS, with_vectors=True).points
+        stored = store.get_many([str(p.id) for p in points])
+        results["vectors"][0].append((time.perf_counter() - start) * 1000)
+        results["vectors"][1].append(response_bytes(points))
+
+    for name, (latencies, sizes) in results.items():
+        print(f"{name:<7} p50={statistics.median(latencies):7.2f} ms  "
+              f"mean response={statistics.mean(sizes) / 1024:7.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=":memory:", help="Qdrant URL, or :memory: for the local engine")
+    parser.add_argument("--copies", type=int, default=20, help="times to replicate frontend/docs")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=2, help="MMR_OVERFETCH")
+    args = parser.parse_args()
+
+    client = QdrantClient(location=args.url) if args.url == ":memory:" else QdrantClient(url=args.url)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkStore(os.path.join(tmp, "chunks.db"))
+        chunks = load_chunks(args.copies)
+        print(f"Indexing {len(chunks)} chunks at {args.url}...")
+        build(client, store, chunks, args.dim)
+        run(client, store, args.dim, args.queries, args.limit, args.overfetch)
+        store.close()
+
+    client.delete_collection("bench_fat")
+    client.delete_collection("bench_slim")
+
+
+if __name__ == "__main__":
+    main()
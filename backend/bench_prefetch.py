@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+What /prefetch changes for the /chat request that follows a highlight.
+
+Each paragraph of frontend/docs is a selection, asked about with a question of its own. The
+selections alternate between a /chat without a prefetch and one after it. RAGService.query runs
+end to end up to the completion, which is replaced by a stand-in that records when it was
+called. Remote latency is simulated around the embedding call and the search, since the local
+index answers in microseconds. Reported for long selections (>= 100 characters: /chat searches
+by the selection) and short ones (/chat searches by the selection and the question, side by side):
+
+    ms to completion   p50 time from the request to the start of the completion
+    sources            mean context documents handed to the completion
+
+/chat always runs the search by the selection, so both settings get the same context. A
+prefetch answers that search ahead of time from the retrieval cache; the search by the
+question, unknown until it is sent, stays on the critical path.
+
+Usage:
+    python bench_prefetch.py --embed-latency-ms 80 --search-latency-ms 40
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def selections(min_chars: int = 100):
+    for path in sorted((BACKEND_DIR.parent / "frontend" / "docs").rglob("*.md")):
+        for paragraph in path.read_text(encoding="utf-8").split("\n\n"):
+            if len(paragraph.strip()) >= min_chars and not paragraph.startswith("---"):
+                yield paragraph.strip()
+
+
+async def run(embed_latency: float, search_latency: float):
+    from chunk_store import chunk_store
+    from query_normalizer import query_normalizer
+    from rag import RAGResponse, rag_service
+    from vector_store import qdrant_service
+
+    # The singletons were constructed while the fixture was built; point them at it
+    chunk_store.path = os.environ["CHUNK_STORE_PATH"]
+    qdrant_service.local_index_path = os.environ["LOCAL_INDEX_PATH"]
+    qdrant_service.load_local_index()
+    query_normalizer.index()
+
+    embed, search = qdrant_service._embed, qdrant_service.local_index.search
+
+    async def slow_embed(texts):
+        await asyncio.sleep(embed_latency / 1000)
+        return await embed(texts)
+
+    def slow_search(*args, **kwargs):
+        time.sleep(search_latency / 1000)
+        return search(*args, **kwargs)
+
+    qdrant_service._embed = slow_embed
+    qdrant_service.local_index.search = slow_search
+
+    reached = {}
+
+    async def completion(query, context_docs, *args, **kwargs):
+        reached["at"], reached["sources"] = time.perf_counter(), len(context_docs)
+        return RAGResponse(response="", sources=[], tokens_used=0)
+
+    rag_service.generate_response = completion
+
+    results = {}
+    for i, paragraph in enumerate(selections()):
+        prefetched = i % 2 == 1
+        for kind, selection in (("long", paragraph), ("short", paragraph[:60])):
+            if prefetched:
+                await rag_service.prefetch(selection)
+            start = time.perf_counter()
+            await rag_service.query(f"What does this say about case {i}?", selected_context=selection,
+                                    target_language="en", use_answer_index=False)
+            results.setdefault((kind, prefetched), []).append(
+                ((reached["at"] - start) * 1000, reached["sources"])
+            )
+
+    print(f"{'selection':<10} {'prefetch':<9} {'requests':>8} {'ms to completion':>17} {'sources':>8}")
+    for (kind, prefetched), rows in sorted(results.items()):
+        print(f"{kind:<10} {'yes' if prefetched else 'no':<9} {len(rows):>8} "
+              f"{statistics.median(ms for ms, _ in rows):>17.2f} {statistics.mean(n for _, n in rows):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--search-latency-ms", type=float, default=40)
+    parser.add_argument("--chunks", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from bench_workers import build_fixture
+        os.environ.update(build_fixture(tmp, args.chunks))
+        asyncio.run(run(args.embed_latency_ms, args.search_latency_ms))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compare prompt sizes and completion budgets of the previous prompt format with prompts.py.
+
+For each labelled query from frontend/docs (see bench_rerank.py) the top --limit chunks are
+used as context, as /chat would send them. Reports prompt tokens, the requested max_tokens and
+how much of each prompt is the static, cacheable prefix; then the same for translating the
+chunks to Urdu (previously a flat max_tokens=2048).
+
+Usage:
+    python bench_prompt.py --limit 5
+"""
+import argparse
+import asyncio
+import statistics
+
+import numpy as np
+
+from bench_rerank import build_labelled_set
+from prompts import (build_rag_messages, build_translation_messages, completion_budget,
+                     prompt_tokens, translation_budget, RAG_SYSTEM_PROMPT)
+from tokens import count_tokens
+from vector_store import qdrant_service
+
+
+def legacy_messages(query, context_docs, max_context_length=4096):
+    """The message layout generate_response used before prompts.py"""
+    context_parts, total = [], 0
+    for doc in context_docs:
+        doc_text = doc["text"].strip()
+        new_part = f"RELEVANT BOOK CONTENT:\n{doc_text}\n\n"
+        if total + len(new_part) <= max_context_length:
+            context_parts.append(new_part)
+            total += len(new_part)
+        else:
+            if max_context_length - total > 0:
+                context_parts.append(f"RELEVANT BOOK CONTENT:\n{doc_text[:max_context_length - total]}\n\n")
+            break
+    return [
+        {"role": "system", "content": (
+            "You are an expert assistant for the 'Physical AI & Humanoid Robotics' book. "
+            "ANSWER ONLY BASED ON THE PROVIDED BOOK CONTENT. "
+            "If the provided context doesn't contain relevant information, explicitly state that the information is not available in the book. "
+            "NEVER provide information that is not contained in the provided context. "
+            "Cite specific sections and content from the book when answering. "
+            "Be precise and accurate based solely on the book content provided in the context.")},
+        {"role": "user", "content": (
+            f"BOOK CONTENT CONTEXT:\n{''.join(context_parts)}\n\n"
+            f"USER QUESTION: {query}\n\n"
+            "Please provide a detailed answer based EXCLUSIVELY on the book content provided above. "
+            "If the book content does not contain the information needed to answer this question, "
+            "clearly state that the information is not available in the book. "
+            "Do not make up information or provide external knowledge.")},
+    ]
+
+
+def row(name, before, after):
+    b, a = statistics.mean(before), statistics.mean(after)
+    print(f"{name:<28} before={b:8.1f}  after={a:8.1f}  ({(a - b) / b:+.1%})")
+
+
+async def run(limit: int):
+    chunks, labelled = build_labelled_set()
+    queries = [q for q, _ in labelled]
+    chunk_vectors = np.asarray(await qdrant_service.generate_embeddings(chunks))
+    query_vectors = np.asarray(await qdrant_service.generate_embeddings(queries))
+
+    before_prompt, after_prompt, before_max, after_max = [], [], [], []
+    for query, vector in zip(queries, query_vectors):
+        docs = [{"text": chunks[i]} for i in np.argsort(-(chunk_vectors @ vector))[:limit]]
+        before_prompt.append(prompt_tokens(legacy_messages(query, docs)))
+        after_prompt.append(prompt_tokens(build_rag_messages(query, docs)))
+        before_max.append(1024)
+        after_max.append(completion_budget(query))
+
+    print(f"{len(queries)} queries, {limit} context chunks each")
+    row("RAG prompt tokens", before_prompt, after_prompt)
+    row("RAG max_tokens", before_max, after_max)
+    print(f"cacheable static prefix: {count_tokens(RAG_SYSTEM_PROMPT)} tokens per request")
+
+    before_prompt, after_prompt, after_max = [], [], []
+    for chunk in chunks:
+        legacy = [{"role": "system", "content": "You are a professional translator. Accurately translate between English and Urdu. Only return the translated text without any additional commentary."},
+                  {"role": "user", "content": f"Translate the following English text to Urdu. Only respond with the translated text and nothing else:\n\n{chunk}"}]
+        before_prompt.append(prompt_tokens(legacy))
+        after_prompt.append(prompt_tokens(build_translation_messages(chunk, "English", "Urdu")))
+        after_max.append(translation_budget(chunk, "en", "ur"))
+    row("translation prompt tokens", before_prompt, after_prompt)
+    row("translation max_tokens", [2048] * len(chunks), after_max)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Measure rerank latency and the retrieval quality change from reranking on a labelled
+query set built from frontend/docs: evaluation.py's labels (each section heading is a query,
+answered by the section below its heading line), over the chunks section_spans serves.
+
+Usage:
+    python bench_rerank.py --overfetch 4 --limit 5 --chunk-size 300
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+
+from evaluation import build_labels, chunk_corpus, load_documents, metrics, relevant_chunks
+from reranker import RerankService
+from vector_store import qdrant_service
+
+
+def build_labelled_set(chunk_size: int = 1000, overlap: int = 100):
+    """Return (chunks, queries) where each query is (text, set of relevant chunk indices)"""
+    documents = load_documents()
+    spans = chunk_corpus(documents, "section", chunk_size, overlap)
+    chunks = [documents[doc_id][start:end] for doc_id, start, end in spans]
+    queries = [(label["question"], relevant_chunks(label, spans)) for label in build_labels(documents)]
+    return chunks, [(query, relevant) for query, relevant in queries if relevant]
+
+
+async def run(limit: int, overfetch: int, budget_ms: float, chunk_size: int, overlap: int):
+    chunks, queries = build_labelled_set(chunk_size, overlap)
+    chunk_vectors = np.asarray(await qdrant_service.generate_embeddings(chunks))
+    query_vectors = np.asarray(await qdrant_service.generate_embeddings([q for q, _ in queries]))
+
+    reranker = RerankService()
+    reranker.enabled = True
+    reranker.overfetch = overfetch
+
+    base, reranked, latencies = [], [], []
+    for (query, relevant), vector in zip(queries, query_vectors):
+        order = np.argsort(-(chunk_vectors @ vector))[:limit * overfetch]
+        hits = [{"text": chunks[i], "index": int(i)} for i in order]
+        base.append(metrics([[hit["index"]] for hit in hits], relevant, limit))
+
+        start = time.perf_counter()
+        top = await reranker.rerank(query, hits, limit, budget_ms=budget_ms)
+        latencies.append((time.perf_counter() - start) * 1000)
+        reranked.append(metrics([[hit["index"]] for hit in top], relevant, limit))
+
+    print(f"{len(queries)} labelled queries over {len(chunks)} chunks, "
+          f"{limit * overfetch} candidates -> top {limit}, scorer={reranker.scorer.name}")
+    for name, rows in (("vector order", base), ("reranked", reranked)):
+        print(f"{name:<13} recall@{limit}={statistics.mean(row['recall'] for row in rows):.3f}  "
+              f"MRR@{limit}={statistics.mean(row['mrr'] for row in rows):.3f}")
+    if limit * overfetch >= len(chunks):
+        print(f"note: every chunk is a candidate, so reranked recall is 1.0 by construction; "
+              f"lower --chunk-size or --overfetch")
+    ordered = sorted(latencies)
+    print(f"rerank latency p50={statistics.median(latencies):.2f} ms  "
+          f"p95={ordered[int(len(ordered) * 0.95) - 1]:.2f} ms  (budget {budget_ms:.0f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--overfetch", type=int, default=4)
+    parser.add_argument("--budget-ms", type=float, default=150)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.limit, args.overfetch, args.budget_ms, args.chunk_size, args.overlap))
+
+
+if __name__ == "__main__":
+    main()
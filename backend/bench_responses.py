@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Serialization time and bytes on the wire of /chat responses.
+
+A typical response: a 900-character answer with five retrieved sources (1,000 characters of
+chunk text each, cut from frontend/docs, with title, section, heading path and offsets) and
+ten citations. For each `sources` mode it reports:
+
+    json us / orjson us   render time of the response body with FastAPI's JSONResponse and
+                          ORJSONResponse (after the same response_model serialization)
+    bytes                 uncompressed, gzip (GZIP_LEVEL) and Brotli (BROTLI_QUALITY, when the
+                          brotli package is installed)
+
+Usage:
+    python bench_responses.py --repeat 2000
+"""
+import argparse
+import gzip
+import os
+import random
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def typical_response(rng: random.Random):
+    from bench_dedup import docs_corpus
+    from main import ChatResponse
+
+    book = "\n\n".join(document["content"] for document in docs_corpus())
+
+    def excerpt(length: int) -> str:
+        start = rng.randint(0, max(len(book) - length, 0))
+        return book[start:start + length]
+
+    sources = []
+    for i in range(5):
+        start = rng.randint(0, 20000)
+        sources.append({
+            "id": f"3f2b8c1e-0a4d-5e6f-8a9b-{i:012d}",
+            "text": excerpt(1000),
+            "doc_id": f"module-{i}_lesson-{rng.randint(1, 9)}",
+            "score": rng.random(),
+            "metadata": {"title": f"Lesson {i}", "section": f"module-{i}", "chunk_index": i,
+                         "heading_path": [f"Lesson {i}", f"Lesson {i} > Gait control"],
+                         "start": start, "end": start + 1000, "rerank_score": rng.random() * 10},
+        })
+    answer = excerpt(900)
+    citations = [{"start": 90 * i, "end": 90 * i + 85, "chunk_id": sources[i % 5]["id"],
+                  "doc_id": sources[i % 5]["doc_id"], "span": [0, 100], "score": 0.8} for i in range(10)]
+    return ChatResponse, sources, answer, citations
+
+
+def timed(render, content, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(content)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    from rag import shape_sources
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    level = int(os.getenv("GZIP_LEVEL", "6"))
+    quality = int(os.getenv("BROTLI_QUALITY", "4"))
+
+    ChatResponse, sources, answer, citations = typical_response(random.Random(0))
+    print(f"{'sources':<8} {'json us':>8} {'orjson us':>10} {'bytes':>7} {'gzip':>7} {'br':>7}")
+    for mode in ("full", "compact", "none"):
+        model = ChatResponse(response=answer, sources=shape_sources(sources, mode), tokens_used=950,
+                             citations=citations)
+        content = model.model_dump(mode="json")
+        json_us = timed(JSONResponse(content).render, content, args.repeat)
+        orjson_us = timed(ORJSONResponse(content).render, content, args.repeat)
+        body = ORJSONResponse(content).body
+        compressed = len(gzip.compress(body, compresslevel=level))
+        br = len(brotli.compress(body, quality=quality)) if brotli else "n/a"
+        print(f"{mode:<8} {json_us:>8.1f} {orjson_us:>10.1f} {len(body):>7} {compressed:>7} {br:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Bootstrapping an environment from a snapshot (snapshot.py) instead of re-indexing.
+
+Fills an in-process Qdrant collection, chunk store and SQLite database with --points synthetic
+768-dimension chunks, then measures:
+
+    export   time and file size, float32 and int8 vectors
+    import   time into a fresh local index directory and a fresh in-process Qdrant collection
+    cold     a new Python process loading the imported local index and answering one query
+             (imports included), i.e. time to serve on a machine that has only the snapshot
+
+Re-indexing the same corpus would instead embed every chunk again; the token count it would
+send to the embedding API is printed for comparison.
+
+Usage:
+    python bench_snapshot.py --points 20000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+WORK = tempfile.mkdtemp()
+os.environ["NEON_DB_URL"] = f"sqlite:///{os.path.join(WORK, 'source.db')}"
+os.environ["CHUNK_STORE_PATH"] = os.path.join(WORK, "source_chunks.db")
+
+import numpy as np  # noqa: E402
+
+WORDS = ("robot actuator sensor torque balance gait controller policy simulation joint frame "
+         "topic node service lidar camera kinematics dynamics trajectory planner reward").split()
+
+COLD_QUERY = """
+import time
+start = time.perf_counter()
+import numpy as np
+from local_index import LocalVectorIndex
+index = LocalVectorIndex({path!r})
+hits = index.search(np.random.default_rng(1).standard_normal(768).tolist(), 5)
+print(f"{{(time.perf_counter() - start) * 1000:.0f}}")
+"""
+
+
+def populate(points: int, per_document: int = 20):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+    from chunk_store import chunk_store, content_key, point_id_for
+    from database import SessionLocal, init_db, upsert_document
+    from vector_store import qdrant_service
+
+    qdrant_service.client, qdrant_service._connected = QdrantClient(":memory:"), True
+    qdrant_service._create_collection()
+    init_db()
+
+    rng = np.random.default_rng(0)
+    words = np.asarray(WORDS)
+    texts = [f"Chunk {i}: " + " ".join(rng.choice(words, 150)) for i in range(points)]
+    refs, ids, payloads = [], [], []
+    for i, text in enumerate(texts):
+        doc_id, position = f"page-{i // per_document}", i % per_document
+        key = content_key(text)
+        point_id = point_id_for(key)
+        metadata = {"section": f"module-{i // (per_document * 10)}", "chunk_index": position}
+        refs.append((point_id, key, doc_id, position, text, metadata))
+        ids.append(point_id)
+        payloads.append({"doc_id": doc_id, **metadata})
+    chunk_store.add_refs(refs)
+
+    vectors = rng.standard_normal((points, 768)).astype(np.float32)
+    for offset in range(0, points, 1024):
+        qdrant_service.client.upsert(qdrant_service.collection_name, points=models.Batch(
+            ids=ids[offset:offset + 1024], vectors=vectors[offset:offset + 1024].tolist(),
+            payloads=payloads[offset:offset + 1024]))
+
+    db = SessionLocal()
+    try:
+        for page in range(0, points, per_document):
+            content = "\n\n".join(texts[page:page + per_document])
+            upsert_document(db, f"page-{page // per_document}", f"Page {page // per_document}", content, "module")
+        db.commit()
+    finally:
+        db.close()
+    return texts
+
+
+def fresh_targets(name: str):
+    """Point the chunk store, database and Qdrant singletons at empty instances"""
+    import chunk_store as chunk_store_module
+    import database
+    from qdrant_client import QdrantClient
+    from sqlalchemy import create_engine
+    from vector_store import qdrant_service
+
+    chunk_store_module.chunk_store.__init__(os.path.join(WORK, f"{name}_chunks.db"))
+    database.engine = create_engine(f"sqlite:///{os.path.join(WORK, f'{name}.db')}")
+    database.SessionLocal.configure(bind=database.engine)
+    qdrant_service.client = QdrantClient(":memory:")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=20000)
+    args = parser.parse_args()
+
+    from snapshot import export_snapshot, import_snapshot
+    from tokens import count_tokens
+
+    start = time.perf_counter()
+    texts = populate(args.points)
+    print(f"{args.points} chunks populated in {time.perf_counter() - start:.1f}s; re-indexing would embed "
+          f"{sum(count_tokens(text) for text in texts):,} tokens\n")
+
+    print(f"{'vectors':<9} {'export s':>9} {'size MB':>9} {'local s':>9} {'qdrant s':>9} {'cold ms':>8}")
+    for quantization in ("float32", "int8"):
+        path = os.path.join(WORK, f"index-{quantization}.npz")
+        manifest = export_snapshot(path, quantization)
+
+        out = os.path.join(WORK, f"local-{quantization}")
+        fresh_targets(f"local-{quantization}")
+        local = import_snapshot(path, target="local", out=out)
+        fresh_targets(f"qdrant-{quantization}")
+        qdrant = import_snapshot(path, target="qdrant")
+
+        cold = subprocess.run([sys.executable, "-c", COLD_QUERY.format(path=out)], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(f"{quantization:<9} {manifest['seconds']:>9.2f} {manifest['bytes'] / 1e6:>9.1f} "
+              f"{local['total']:>9.2f} {qdrant['total']:>9.2f} {cold.stdout.strip():>8}")
+
+
+if __name__ == "__main__":
+    main()
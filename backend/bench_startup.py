@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Measure API cold start: `import main` cost from `python -X importtime`, the slowest
+imports, and the time the FastAPI lifespan takes to finish its startup probes.
+
+Usage:
+    python bench_startup.py --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_LIFESPAN_SNIPPET = """
+import asyncio, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        print(f"{(imported - start) * 1000:.0f} {(time.perf_counter() - imported) * 1000:.0f}")
+asyncio.run(boot())
+"""
+
+
+def measure_import(module: str = "main") -> Tuple[float, List[Tuple[float, str]]]:
+    """Return (cumulative import ms of `module`, [(ms, name)] of its slowest dependencies)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+
+    total = next(ms for ms, name in reversed(rows) if name.strip() == module)
+    top_level = [(ms, name.strip()) for ms, name in rows if name.startswith("   ") and not name.startswith("    ")]
+    return total, sorted(top_level, reverse=True)
+
+
+def measure_lifespan() -> Tuple[float, float]:
+    """Return (import ms, lifespan startup ms) measured in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", _LIFESPAN_SNIPPET],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    import_ms, lifespan_ms = result.stdout.split()[-2:]
+    return float(import_ms), float(lifespan_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        total, top_level = measure_import()
+        totals.append(total)
+    print(f"import main: best {min(totals):.0f} ms over {args.runs} runs")
+    for ms, name in top_level[:8]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    import_ms, lifespan_ms = measure_lifespan()
+    print(f"boot: import {import_ms:.0f} ms + lifespan startup {lifespan_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+First-request latency of a freshly started server, with and without the boot warm-up (warmup.py).
+
+Serves the bench_workers.py fixture (a local index built from frontend/docs, replicated to
+--chunks points, and a temporary chunk store) with serve.py and one worker. Qdrant and the LLM
+providers are left unconfigured, so this covers the app's own cold paths: lazily loaded state,
+the database pool and empty caches. For each setting, over --runs fresh servers:
+
+    live ms     start until /health answers
+    ready ms    start until /health/ready answers 200 (the same as live without warm-up)
+    first ms    the first /chat after readiness, with a question not in WARMUP_QUERIES
+    next ms     median of the --requests /chat calls after it, with other new questions
+
+Usage:
+    python bench_warmup.py --runs 3 --chunks 5000
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUESTIONS = [
+    "How are lidar sensors used on humanoids?",
+    "What does a joint controller do?",
+    "Why simulate before deploying to hardware?",
+    "What is a reward function?",
+    "How is torque measured in a joint?",
+    "What are topics and services?",
+    "What does a trajectory planner output?",
+    "How do policies map observations to actions?",
+    "What is sim-to-real transfer?",
+    "Which sensors estimate balance?",
+    "What is inverse kinematics?",
+]
+
+
+def wait_for(url: str, started: float, deadline: float = 60) -> float:
+    import httpx
+
+    while time.perf_counter() - started < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return (time.perf_counter() - started) * 1000
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def run_once(env: dict, warmup: bool, requests: int):
+    import httpx
+    from bench_workers import free_port
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "1",
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env, "WARMUP_ENABLED": str(warmup).lower()},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        live = wait_for(f"{base}/health", started)
+        ready = wait_for(f"{base}/health/ready", started)
+        timings = []
+        with httpx.Client(base_url=base, timeout=30) as client:
+            for question in QUESTIONS[:requests + 1]:
+                start = time.perf_counter()
+                client.post("/chat", json={"message": question}).raise_for_status()
+                timings.append((time.perf_counter() - start) * 1000)
+        return live, ready, timings[0], statistics.median(timings[1:])
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=len(QUESTIONS) - 1)
+    args = parser.parse_args()
+
+    from bench_workers import build_fixture
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = build_fixture(tmp, args.chunks)
+        print(f"{args.chunks} indexed chunks, median of {args.runs} fresh servers")
+        print(f"{'warm-up':<8} {'live ms':>8} {'ready ms':>9} {'first ms':>9} {'next ms':>8}")
+        for warmup in (False, True):
+            runs = [run_once(env, warmup, args.requests) for _ in range(args.runs)]
+            live, ready, first, rest = (statistics.median(column) for column in zip(*runs))
+            print(f"{'on' if warmup else 'off':<8} {live:>8.0f} {ready:>9.0f} {first:>9.1f} {rest:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
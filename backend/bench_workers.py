@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark /chat throughput of the serve.py launcher with 1..8 workers.
+
+Each run serves a local index built from frontend/docs (replicated to --chunks points), a
+temporary chunk store and the shared cache tier. Qdrant and the LLM providers are left
+unconfigured, so the numbers cover the app's own work: JSON, embeddings, search, hydration.
+
+Usage:
+    python bench_workers.py --workers 1 2 4 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_fixture(tmp: str, chunks: int):
+    """Write a local index and chunk store into tmp; returns the env the server needs"""
+    from pathlib import Path
+    from chunk_store import ChunkStore, content_key
+    from chunking import chunk_spans
+    from local_index import LocalVectorIndex
+    from vector_store import placeholder_embeddings
+
+    texts = []
+    for path in sorted((Path(BACKEND_DIR).parent / "frontend" / "docs").rglob("*.md")):
+        content = path.read_text(encoding="utf-8")
+        texts.extend((path.stem, content[start:end]) for start, end in chunk_spans(content))
+
+    ids, payloads, rows, chunk_texts = [], [], [], []
+    for n in range(chunks):
+        doc_id, text = texts[n % len(texts)]
+        text = f"{text}\n[copy {n}]"
+        point_id = str(uuid.uuid4())
+        ids.append(point_id)
+        payloads.append({"doc_id": f"{doc_id}-{n // len(texts)}", "section": doc_id})
+        rows.append((point_id, content_key(text), doc_id, n, text, {"title": doc_id}))
+        chunk_texts.append(text)
+
+    LocalVectorIndex.write(os.path.join(tmp, "index"), ids, placeholder_embeddings(chunk_texts), payloads)
+    store = ChunkStore(os.path.join(tmp, "chunks.db"))
+    store.add_refs(rows)
+    store.close()
+
+    return {
+        "LOCAL_INDEX_PATH": os.path.join(tmp, "index"),
+        "CHUNK_STORE_PATH": os.path.join(tmp, "chunks.db"),
+        "CACHE_BACKEND": "shared",
+        "SHARED_CACHE_PATH": os.path.join(tmp, "cache.db"),
+        "NEON_DB_URL": f"sqlite:///{os.path.join(tmp, 'app.db')}",
+        "QDRANT_HOST": "127.0.0.1",
+        "QDRANT_PORT": "1",
+        "OPENROUTER_API_KEY": "",
+        "GOOGLE_API_KEY": "",
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _client_loop(url: str, duration: float, concurrency: int, seed: int):
+    import httpx
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def user(n: int):
+        async with httpx.AsyncClient(timeout=30) as client:
+            i = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                # Unique questions, so the retrieval cache does not short-circuit the work
+                response = await client.post(url, json={"message": f"what is physical ai {seed}-{n}-{i}"})
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                i += 1
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return latencies
+
+
+def client_process(args):
+    return asyncio.run(_client_loop(*args))
+
+
+def run_level(workers: int, env: dict, duration: float, concurrency: int, clients: int):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        import httpx
+        for _ in range(200):
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+
+        url = f"http://127.0.0.1:{port}/chat"
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(client_process, [(url, duration, concurrency // clients, seed) for seed in range(clients)])
+        latencies = [ms for result in results for ms in result]
+        return len(latencies) / duration, statistics.median(latencies) if latencies else 0.0
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--chunks", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = build_fixture(tmp, args.chunks)
+        print(f"{args.chunks} indexed chunks, {args.concurrency} concurrent clients, {os.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers:
+            rps, p50 = run_level(workers, env, args.duration, args.concurrency, args.clients)
+            baseline = baseline or rps
+            print(f"workers={workers:<2} {rps:8.1f} req/s  p50={p50:7.1f} ms  scaling={rps / baseline:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config import load_environment
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: Any) -> str:
+    """Stable cache key for any JSON-serialisable parts"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """Per-process LRU with TTL"""
+
+    def __init__(self, namespace: str, max_entries: int = 10000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedCache:
+    """
+    Cache shared by every worker on the host: a SQLite file on tmpfs (/dev/shm when available).
+    A local stand-in for Redis when running several workers on one instance.
+    """
+
+    def __init__(self, namespace: str, path: Optional[str] = None, max_entries: int = 50000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        default_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.path = path or os.getenv("SHARED_CACHE_PATH", os.path.join(default_dir, "rag_chatbot_cache.db"))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (and per forked worker, since it is opened lazily)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune()
+
+    def _prune(self):
+        connection = self._conn
+        connection.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        connection.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key NOT IN "
+            "(SELECT key FROM cache WHERE namespace = ? ORDER BY rowid DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def clear(self):
+        self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+
+class RedisCache:
+    """Cache shared across instances; used when REDIS_URL is set and the redis package is installed"""
+
+    def __init__(self, namespace: str, url: str):
+        import redis
+        self.namespace = namespace
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(f"{self.namespace}:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(f"{self.namespace}:{key}", json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.namespace}:*"):
+            self.client.delete(key)
+
+
+_caches = {}
+
+
+def get_cache(namespace: str):
+    """
+    Cache for a namespace, picked by CACHE_BACKEND: memory (per process, default),
+    shared (all workers on this host) or redis (REDIS_URL)
+    """
+    if namespace not in _caches:
+        backend = os.getenv("CACHE_BACKEND", "memory").lower()
+        cache = None
+        if backend == "redis":
+            try:
+                cache = RedisCache(namespace, os.environ["REDIS_URL"])
+            except (ImportError, KeyError):
+                logger.warning("REDIS_URL or the redis package is missing. Falling back to the shared local cache.")
+                backend = "shared"
+        if cache is None and backend == "shared":
+            cache = SharedCache(namespace)
+        _caches[namespace] = cache or MemoryCache(namespace)
+    return _caches[namespace]
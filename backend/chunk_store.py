@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import re
+import threading
+import unicodedata
+import uuid
+from typing import List, Dict, Any, Iterable, Tuple, Set
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_MAX_BATCH = 900
+
+# Point IDs of content-addressed chunks are derived from this namespace and the content key
+_POINT_NAMESPACE = uuid.UUID("8a4f7a3e-3c1b-4f0e-9a51-2f3c0e6d7b10")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_key(text: str) -> str:
+    """Hash of a chunk's normalized text (NFKC, whitespace collapsed): equal keys share one point"""
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def point_id_for(key: str) -> str:
+    return str(uuid.uuid5(_POINT_NAMESPACE, key))
+
+
+def _batches(items: List[Any]):
+    for offset in range(0, len(items), _MAX_BATCH):
+        yield items[offset:offset + _MAX_BATCH]
+
+
+class ChunkStore:
+    """
+    Local store for chunk texts keyed by Qdrant point ID.
+
+    Qdrant payloads only carry IDs and filter fields; search hits are hydrated
+    from here with one batched lookup instead of shipping the text over the network.
+
+    Chunks are deduplicated by content_key(): identical text in several documents (license blocks,
+    navigation, repeated listings) is one point and one stored text. chunk_refs keeps every
+    occurrence (document, position, metadata) for filtering and citations, and chunks.refcount
+    counts them; a chunk is dropped when its last reference is released.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("CHUNK_STORE_PATH", "./chunk_store.db")
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use so importing the module never touches the disk
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " point_id TEXT PRIMARY KEY,"
+                " doc_id TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " metadata TEXT NOT NULL DEFAULT '{}')"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_chunks_doc_id ON chunks (doc_id)")
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(chunks)")}
+            if "refcount" not in columns:
+                connection.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+                connection.execute("ALTER TABLE chunks ADD COLUMN refcount INTEGER NOT NULL DEFAULT 1")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_refs ("
+                " point_id TEXT NOT NULL,"
+                " doc_id TEXT NOT NULL,"
+                " position INTEGER NOT NULL,"
+                " metadata TEXT NOT NULL DEFAULT '{}',"
+                " PRIMARY KEY (point_id, doc_id, position))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_chunk_refs_doc_id ON chunk_refs (doc_id)")
+            # Sentence offsets and embeddings of each chunk, for answer attribution (attribution.py)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_sentences ("
+                " point_id TEXT PRIMARY KEY,"
+                " spans BLOB NOT NULL,"
+                " vectors BLOB NOT NULL)"
+            )
+            # Chunks stored before deduplication each become their own single reference
+            connection.execute(
+                "INSERT OR IGNORE INTO chunk_refs (point_id, doc_id, position, metadata)"
+                " SELECT point_id, doc_id, -rowid, metadata FROM chunks"
+                " WHERE NOT EXISTS (SELECT 1 FROM chunk_refs r WHERE r.point_id = chunks.point_id)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def existing(self, point_ids: List[str]) -> Set[str]:
+        """Which of the given points are already stored"""
+        found = set()
+        with self._lock:
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT point_id FROM chunks WHERE point_id IN ({placeholders})", batch
+                ))
+        return found
+
+    def add_refs(self, refs: Iterable[Tuple[str, str, str, int, str, Dict[str, Any]]]):
+        """
+        Record (point_id, content_hash, doc_id, position, text, metadata) occurrences. The text is
+        stored once per point (the first occurrence wins); re-adding an occurrence is a no-op.
+        """
+        refs = list(refs)
+        point_ids = list({ref[0] for ref in refs})
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (point_id, doc_id, text, metadata, content_hash, refcount)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                [(point_id, doc_id, text, json.dumps(metadata), key)
+                 for point_id, key, doc_id, _, text, metadata in refs]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_refs (point_id, doc_id, position, metadata) VALUES (?, ?, ?, ?)",
+                [(point_id, doc_id, position, json.dumps(metadata))
+                 for point_id, _, doc_id, position, _, metadata in refs]
+            )
+            self._recount(point_ids)
+
+    def release(self, doc_ids: List[str], keep: Set[Tuple[str, str, int]] = frozenset()) -> Tuple[List[str], List[str]]:
+        """
+        Drop the references the given documents hold, except those in `keep`
+        ((point_id, doc_id, position) triples). Returns (orphaned point IDs, now removed from the
+        store, and point IDs still referenced by other occurrences whose provenance changed).
+        """
+        with self._lock, self._conn:
+            released = []
+            for batch in _batches(doc_ids):
+                placeholders = ",".join("?" * len(batch))
+                released.extend(
+                    row for row in self._conn.execute(
+                        f"SELECT point_id, doc_id, position FROM chunk_refs WHERE doc_id IN ({placeholders})", batch
+                    ) if tuple(row) not in keep
+                )
+            if not released:
+                return [], []
+            self._conn.executemany(
+                "DELETE FROM chunk_refs WHERE point_id = ? AND doc_id = ? AND position = ?", released
+            )
+            point_ids = list({point_id for point_id, _, _ in released})
+            self._recount(point_ids)
+            orphaned = []
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                orphaned.extend(row[0] for row in self._conn.execute(
+                    f"SELECT point_id FROM chunks WHERE point_id IN ({placeholders}) AND refcount = 0", batch
+                ))
+            self._conn.executemany("DELETE FROM chunks WHERE point_id = ?", [(point_id,) for point_id in orphaned])
+            self._conn.executemany("DELETE FROM chunk_sentences WHERE point_id = ?", [(point_id,) for point_id in orphaned])
+        orphaned_set = set(orphaned)
+        return orphaned, [point_id for point_id in point_ids if point_id not in orphaned_set]
+
+    def _recount(self, point_ids: List[str]):
+        # Call with the lock held, inside a transaction
+        self._conn.executemany(
+            "UPDATE chunks SET refcount = (SELECT COUNT(*) FROM chunk_refs r WHERE r.point_id = chunks.point_id)"
+            " WHERE point_id = ?",
+            [(point_id,) for point_id in point_ids]
+        )
+
+    def provenance(self, point_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Every occurrence of the given points as {"doc_id", "position", "metadata"}, in document order"""
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT point_id, doc_id, position, metadata FROM chunk_refs"
+                    f" WHERE point_id IN ({placeholders}) ORDER BY doc_id, position",
+                    batch
+                )
+                for point_id, doc_id, position, metadata in cursor:
+                    found.setdefault(point_id, []).append(
+                        {"doc_id": doc_id, "position": position, "metadata": json.loads(metadata)}
+                    )
+        return found
+
+    def get_many(self, point_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch text and metadata for the given point IDs; missing IDs are omitted. Chunks shared by
+        several documents also carry "refs", their occurrences as returned by provenance().
+        """
+        found = {}
+        shared = []
+        with self._lock:
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT point_id, text, metadata, refcount FROM chunks WHERE point_id IN ({placeholders})",
+                    batch
+                )
+                for point_id, text, metadata, refcount in cursor:
+                    found[point_id] = {"text": text, "metadata": json.loads(metadata)}
+                    if refcount > 1:
+                        shared.append(point_id)
+        for point_id, refs in self.provenance(shared).items():
+            found[point_id]["refs"] = refs
+        return found
+
+    def fingerprints(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Hash of each document's indexed chunk texts; changes whenever the document is re-indexed differently"""
+        digests = {doc_id: hashlib.sha1() for doc_id in doc_ids}
+        with self._lock:
+            for batch in _batches(doc_ids):
+                placeholders = ",".join("?" * len(batch))
+                cursor = self._conn.execute(
+                    f"SELECT r.doc_id, c.text FROM chunk_refs r JOIN chunks c ON c.point_id = r.point_id"
+                    f" WHERE r.doc_id IN ({placeholders}) ORDER BY r.doc_id, c.text",
+                    batch
+                )
+                for doc_id, text in cursor:
+                    digests[doc_id].update(text.encode("utf-8"))
+        return {doc_id: digest.hexdigest() for doc_id, digest in digests.items()}
+
+    def dump(self) -> Tuple[List[tuple], List[tuple]]:
+        """Every chunk (point_id, doc_id, text, metadata, content_hash, refcount) and reference row"""
+        with self._lock:
+            chunks = self._conn.execute(
+                "SELECT point_id, doc_id, text, metadata, content_hash, refcount FROM chunks"
+            ).fetchall()
+            refs = self._conn.execute("SELECT point_id, doc_id, position, metadata FROM chunk_refs").fetchall()
+        return chunks, refs
+
+    def load(self, chunks: List[tuple], refs: List[tuple]):
+        """Replace the whole store with rows from dump(), in one transaction"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunk_refs")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.executemany(
+                "INSERT INTO chunks (point_id, doc_id, text, metadata, content_hash, refcount) VALUES (?, ?, ?, ?, ?, ?)",
+                chunks
+            )
+            self._conn.executemany(
+                "INSERT INTO chunk_refs (point_id, doc_id, position, metadata) VALUES (?, ?, ?, ?)", refs
+            )
+            # Point IDs are content-addressed, so sentences of chunks that are still stored stay valid
+            self._conn.execute("DELETE FROM chunk_sentences WHERE point_id NOT IN (SELECT point_id FROM chunks)")
+
+    def put_sentences(self, rows: Iterable[Tuple[str, bytes, bytes]]):
+        """Store (point_id, spans, vectors) sentence rows, encoded by attribution.py"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_sentences (point_id, spans, vectors) VALUES (?, ?, ?)", list(rows)
+            )
+
+    def get_sentences(self, point_ids: List[str]) -> Dict[str, Tuple[bytes, bytes]]:
+        """(spans, vectors) of the given points; points without stored sentences are omitted"""
+        found = {}
+        with self._lock:
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                for point_id, spans, vectors in self._conn.execute(
+                    f"SELECT point_id, spans, vectors FROM chunk_sentences WHERE point_id IN ({placeholders})", batch
+                ):
+                    found[point_id] = (spans, vectors)
+        return found
+
+    def texts(self) -> List[str]:
+        """Text of every stored chunk"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT text FROM chunks")]
+
+    def doc_ids(self) -> List[str]:
+        """Every document holding at least one chunk"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT doc_id FROM chunk_refs ORDER BY doc_id")]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Stored chunks against the occurrences they stand for"""
+        with self._lock:
+            chunks, shared = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(refcount > 1), 0) FROM chunks"
+            ).fetchone()
+            refs = self._conn.execute("SELECT COUNT(*) FROM chunk_refs").fetchone()[0]
+        return {"chunks": chunks, "references": refs, "shared_chunks": shared}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Singleton instance
+chunk_store = ChunkStore()
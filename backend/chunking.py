@@ -0,0 +1,127 @@
+import bisect
+import re
+from typing import List, Dict, Any, Tuple
+
+HEADING_SEPARATOR = " > "
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$")
+_FENCE_RE = re.compile(r"^[ \t]*(```|~~~)")
+
+
+def chunk_spans(content: str, chunk_size: int = 1000, overlap: int = 100) -> List[Tuple[int, int]]:
+    """
+    Return the (start, end) character offsets of each chunk of the content. The chunk that reaches
+    the end of the content is the last one: no trailing chunk repeats its final `overlap` characters.
+    """
+    if not content:
+        return []
+
+    spans = []
+    start = 0
+    length = len(content)
+    max_chunks = len(content) // 100
+    chunk_count = 0
+
+    while start < length and chunk_count < max_chunks:
+        end = min(start + chunk_size, length)
+        if content[start:end].strip():
+            spans.append((start, end))
+            chunk_count += 1
+        if end >= length:
+            # Last chunk reached; stepping back by the overlap would only repeat the tail
+            break
+        start = end - overlap
+        if start <= 0:
+            start += chunk_size
+        if start >= length:
+            break
+    return spans
+
+
+def section_spans(content: str, chunk_size: int = 1000, overlap: int = 100, max_depth: int = 2) -> List[Tuple[int, int]]:
+    """
+    chunk_spans applied within each section (headings up to max_depth levels deep) instead of
+    across the whole document, so editing one section leaves the chunks of the others unchanged.
+    Short sections are grouped with the following ones until a group is half a chunk long.
+    """
+    offsets, trails = scan_headings(content)
+    bounds = [0] + [offset for offset, trail in zip(offsets, trails) if len(trail) <= max_depth and offset > 0]
+    bounds.append(len(content))
+
+    groups = []
+    start = 0
+    for end in bounds[1:]:
+        if end - start >= chunk_size // 2 or end == len(content):
+            groups.append((start, end))
+            start = end
+
+    spans = []
+    for start, end in groups:
+        section = content[start:end]
+        if not section.strip():
+            continue
+        # chunk_spans yields nothing for text under 100 characters; keep such a section whole
+        local = chunk_spans(section, chunk_size, overlap) or [(0, len(section))]
+        spans.extend((start + a, start + b) for a, b in local)
+    return spans
+
+
+def chunk_document(content: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
+    return [content[start:end] for start, end in chunk_spans(content, chunk_size, overlap)]
+
+
+def scan_headings(content: str) -> Tuple[List[int], List[List[str]]]:
+    """
+    Single pass over the markdown collecting the heading trail in effect at each heading,
+    skipping fenced code blocks (where '# comment' lines are not headings)
+    """
+    offsets = []
+    trails = []
+    trail: List[Tuple[int, str]] = []
+    in_fence = False
+    position = 0
+
+    for line in content.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING_RE.match(line.rstrip("\r\n"))
+            if match:
+                level = len(match.group(1))
+                trail = [item for item in trail if item[0] < level]
+                trail.append((level, match.group(2).strip()))
+                offsets.append(position)
+                trails.append([text for _, text in trail])
+        position += len(line)
+
+    return offsets, trails
+
+
+def heading_prefixes(trail: List[str]) -> List[str]:
+    """
+    Expand a heading trail into its cumulative paths, e.g. ["A", "A > B"], so a keyword
+    match on any element selects everything under that heading
+    """
+    return [HEADING_SEPARATOR.join(trail[:i + 1]) for i in range(len(trail))]
+
+
+def chunk_metadata(content: str, spans: List[Tuple[int, int]], **base: Any) -> List[Dict[str, Any]]:
+    """
+    Build the per-chunk payload metadata (heading path, position) for the given spans
+    """
+    offsets, trails = scan_headings(content)
+    metadata = []
+
+    for index, (start, end) in enumerate(spans):
+        # The heading in effect is the last one starting at or before the chunk start
+        position = bisect.bisect_right(offsets, start) - 1
+        trail = trails[position] if position >= 0 else []
+        metadata.append({
+            **base,
+            "heading_path": heading_prefixes(trail),
+            "chunk_index": index,
+            "start": start,
+            "end": end,
+        })
+
+    return metadata
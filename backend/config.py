@@ -0,0 +1,26 @@
+import logging
+
+_environment_loaded = False
+_logging_configured = False
+
+
+def load_environment():
+    """
+    Load variables from a local .env file once per process (Render sets real env vars).
+    Safe to call from every module that reads configuration at import time.
+    """
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _environment_loaded = True
+
+
+def configure_logging(level: int = logging.INFO):
+    """Configure root logging once, from the entry point rather than from library modules"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.basicConfig(level=level)
+    _logging_configured = True
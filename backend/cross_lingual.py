@@ -0,0 +1,63 @@
+"""
+Cross-lingual query path: Urdu questions are searched in English.
+
+The book and its embeddings are English, so an Urdu question embedded as it is lands nowhere
+near the chunks that answer it. Questions written mostly in Arabic script are translated to
+English once, before normalization, retrieval and the completion; the answer is translated to
+Urdu, or to the language the request asked for. Translations are cached under the folded
+question (query_normalizer.fold), so spelling variants of the same Urdu question (Arabic yeh and
+kaf, diacritics, tatweel, zero-width joiners) share an entry and a repeated question costs no
+LLM round trip.
+"""
+import logging
+import os
+import re
+
+from cache import get_cache, make_key
+from query_normalizer import fold
+from translation_service import translation_service
+
+logger = logging.getLogger(__name__)
+
+# Arabic, Arabic Supplement and the presentation forms Urdu keyboards sometimes emit
+_ARABIC_SCRIPT = re.compile("[\u0600-\u06ff\u0750-\u077f\ufb50-\ufdff\ufe70-\ufeff]")
+_LATIN = re.compile("[A-Za-z]")
+
+
+def script_language(text: str) -> str:
+    """'ur' when the text is written mostly in Arabic script, 'en' otherwise"""
+    arabic = len(_ARABIC_SCRIPT.findall(text))
+    return "ur" if arabic and arabic >= len(_LATIN.findall(text)) else "en"
+
+
+class CrossLingualService:
+    def __init__(self, translator=None):
+        self.enabled = os.getenv("CROSS_LINGUAL_ENABLED", "true").lower() == "true"
+        # The book doesn't change between deploys often; neither do translations of questions about it
+        self.cache_ttl = float(os.getenv("QUERY_TRANSLATION_TTL", str(7 * 24 * 3600)))
+        self.translator = translator or translation_service
+
+    async def english_query(self, query: str) -> str:
+        """The question in English: as asked when it already is, otherwise translated (cached)"""
+        if not self.enabled or script_language(query) != "ur":
+            return query
+
+        cache = get_cache("query_translations")
+        key = make_key("ur", "en", fold(query))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = await self.translator.translate(query, source_lang="ur", target_lang="en")
+        if result.tokens_used == 0:
+            # Translation failed and returned the question (or a placeholder): search with the Urdu text
+            logger.warning("Could not translate the question to English; searching with it as asked")
+            return query
+        translated = result.translated_text.strip()
+        cache.set(key, translated, ttl=self.cache_ttl)
+        logger.info(f"Translated Urdu question for retrieval: {translated[:100]}")
+        return translated
+
+
+# Singleton instance
+cross_lingual_service = CrossLingualService()
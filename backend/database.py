@@ -44,10 +44,17 @@
 #     timestamp = Column(DateTime, default=datetime.utcnow)
 #     sources = Column(Text)  # JSON string for source documents
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, Float, insert, update
+from sqlalchemy.orm import sessionmaker, declarative_base, deferred
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+import base64
 import os
+import zlib
+
+from config import load_environment
+
+load_environment()
 
 # Database setup
 DATABASE_URL = os.getenv(
@@ -57,13 +64,45 @@ DATABASE_URL = os.getenv(
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    # Serverless Postgres drops idle connections; validate on checkout and retire them early
+    pool_pre_ping=True,
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300"))
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+# ===================== TYPES =====================
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored zlib-compressed when DOCUMENT_COMPRESSION=true. Compressed values are kept in the
+    same Text column behind a prefix (base64, so Postgres TEXT accepts them), so rows written before
+    or without compression read back unchanged and no migration is needed.
+    """
+    impl = Text
+    cache_ok = True
+
+    PREFIX = "zlib:b64:"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enabled = os.getenv("DOCUMENT_COMPRESSION", "false").lower() == "true"
+        self.min_length = int(os.getenv("DOCUMENT_COMPRESSION_MIN_LENGTH", "1024"))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.enabled or len(value) < self.min_length:
+            return value
+        return self.PREFIX + base64.b64encode(zlib.compress(value.encode("utf-8"), 6)).decode("ascii")
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.startswith(self.PREFIX):
+            return zlib.decompress(base64.b64decode(value[len(self.PREFIX):])).decode("utf-8")
+        return value
+
+
 # ===================== MODELS =====================
 
 class Document(Base):
@@ -72,14 +111,15 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     doc_id = Column(String, unique=True, index=True)
     title = Column(String, index=True)
-    content = Column(Text)
+    # Bodies can be megabytes: loaded only when accessed (or with undefer()), never by listings
+    content = deferred(Column(CompressedText))
     section = Column(String, index=True)  # e.g., introduction, ros2-fundamentals
     embedding_vector_id = Column(String)  # Qdrant vector ID
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_indexed = Column(Boolean, default=False)
 
-    doc_metadata = Column(Text)  # ✅ FIXED (was metadata ❌)
+    doc_metadata = deferred(Column(Text))  # ✅ FIXED (was metadata ❌)
 
 
 class ChatSession(Base):
@@ -104,5 +144,66 @@ class ChatMessage(Base):
     sources = Column(Text)  # JSON string for source docs
 
 
+class UsageRecord(Base):
+    __tablename__ = "usage_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    provider = Column(String, index=True)  # openrouter / gemini
+    model = Column(String)
+    purpose = Column(String)  # chat / translation
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+
+
+# ===================== UPSERT =====================
+
+_UPSERT_COLUMNS = ("title", "content", "section", "is_indexed", "updated_at")
+_upserts = {}
+
+
+def document_upsert(dialect_name: str):
+    """
+    One INSERT ... ON CONFLICT (doc_id) DO UPDATE statement for Postgres and SQLite, keeping
+    created_at of an existing row. Built once per dialect; None for dialects without it.
+    Parameters: doc_id, title, content, section, is_indexed, created_at, updated_at.
+    """
+    if dialect_name not in _upserts:
+        if dialect_name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            _upserts[dialect_name] = None
+            return None
+        stmt = dialect_insert(Document)
+        _upserts[dialect_name] = stmt.on_conflict_do_update(
+            index_elements=[Document.doc_id],
+            set_={column: stmt.excluded[column] for column in _UPSERT_COLUMNS},
+        )
+    return _upserts[dialect_name]
+
+
+def document_values(doc_id: str, title: str, content: str, section: str, is_indexed: bool = True):
+    now = datetime.utcnow()
+    return {"doc_id": doc_id, "title": title, "content": content, "section": section,
+            "is_indexed": is_indexed, "created_at": now, "updated_at": now}
+
+
+def upsert_document(db, doc_id: str, title: str, content: str, section: str, is_indexed: bool = True):
+    """Insert or update a document in one statement, without reading the existing row (sync sessions)"""
+    values = document_values(doc_id, title, content, section, is_indexed)
+    stmt = document_upsert(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, values)
+        return
+    fields = {column: values[column] for column in _UPSERT_COLUMNS}
+    if db.execute(update(Document).where(Document.doc_id == doc_id).values(**fields)).rowcount == 0:
+        db.execute(insert(Document).values(**values))
+
+
 # ===================== CREATE TABLES =====================
-Base.metadata.create_all(bind=engine)
+def init_db():
+    """Create missing tables. Called from the API lifespan and the indexing scripts, not at import."""
+    Base.metadata.create_all(bind=engine)
@@ -0,0 +1,146 @@
+import logging
+import os
+from typing import List, Dict, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def mmr(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick the candidate that maximises
+    lambda * relevance - (1 - lambda) * max similarity to anything already picked.
+    Returns indices into the candidate list in selection order.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to the selected set, updated incrementally
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        choice = int(np.argmax(scores))
+        selected.append(choice)
+        available[choice] = False
+        np.maximum(redundancy, similarity[choice], out=redundancy)
+
+    return selected
+
+
+def _spliceable(hit: Dict[str, Any]) -> bool:
+    """
+    Whether the hit's text is its document's content[start:end]. A deduplicated chunk serves the
+    text stored for its first occurrence, which can differ (in whitespace or Unicode form) from
+    this document's copy, and such text cannot be spliced by offsets.
+    """
+    meta = hit.get("metadata", {})
+    start, end = meta.get("start"), meta.get("end")
+    return start is not None and end is not None and len(hit.get("text", "")) == end - start
+
+
+def merge_adjacent(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse hits that repeat the same text, and merge overlapping or touching chunks of the same
+    document into one contiguous span. A merged hit keeps the rank of its best member.
+    """
+    unique: List[Dict[str, Any]] = []
+    seen_texts = set()
+    for hit in hits:
+        text = hit.get("text", "")
+        if text not in seen_texts:
+            seen_texts.add(text)
+            unique.append(hit)
+
+    # Each document's spans are swept in start order, so spans that only meet through a merge
+    # are joined too. A span is {"start", "end", "text", "ranks"}; ranks index into unique.
+    spans: List[Dict[str, Any]] = []
+    by_doc: Dict[Any, List[int]] = {}
+    for rank, hit in enumerate(unique):
+        if _spliceable(hit):
+            by_doc.setdefault(hit.get("doc_id"), []).append(rank)
+        else:
+            spans.append({"ranks": [rank]})
+
+    for ranks in by_doc.values():
+        current = None
+        for rank in sorted(ranks, key=lambda r: unique[r]["metadata"]["start"]):
+            text, meta = unique[rank]["text"], unique[rank]["metadata"]
+            start, end = meta["start"], meta["end"]
+            if current is not None and start <= current["end"]:
+                offset = start - current["start"]
+                overlap = min(end, current["end"]) - start
+                # Versions of a page indexed at different times can disagree; those stay apart
+                if current["text"][offset:offset + overlap] == text[:overlap]:
+                    if end > current["end"]:
+                        current["text"] += text[overlap:]
+                        current["end"] = end
+                    current["ranks"].append(rank)
+                    continue
+            current = {"start": start, "end": end, "text": text, "ranks": [rank]}
+            spans.append(current)
+
+    merged = []
+    for span in spans:
+        ranks = sorted(span["ranks"])
+        best = unique[ranks[0]]
+        hit = {**best, "metadata": dict(best.get("metadata", {}))}
+        if len(ranks) > 1:
+            hit["text"] = span["text"]
+            hit["metadata"].update(start=span["start"], end=span["end"])
+            hit["score"] = max(unique[rank].get("score", 0) for rank in ranks)
+            hit["merged_ids"] = [unique[rank].get("id") for rank in ranks]
+        merged.append((ranks[0], hit))
+
+    return [hit for _, hit in sorted(merged, key=lambda item: item[0])]
+
+
+class DiversityService:
+    def __init__(self):
+        # Off by default: MMR needs every candidate's embedding, which Qdrant sends as JSON floats
+        # (see bench_payload_size.py); overlapping chunks are merged either way
+        self.enabled = os.getenv("MMR_ENABLED", "false").lower() == "true"
+        self.lambda_ = float(os.getenv("MMR_LAMBDA", "0.5"))
+        self.overfetch = max(1, int(os.getenv("MMR_OVERFETCH", "2")))  # candidates per returned source
+
+    def candidate_limit(self, limit: int) -> int:
+        return limit * self.overfetch if self.enabled else limit
+
+    def select(self, hits: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Pick a diverse top `limit` from hits that carry their embedding under "vector",
+        then merge adjacent chunks. Relevance is the rerank score when present, else the vector score.
+        """
+        if self.enabled and len(hits) > 1 and all(hit.get("vector") is not None for hit in hits):
+            if all("rerank_score" in hit for hit in hits):
+                # Rerank scores are unbounded; scale them onto the cosine range
+                relevance = np.array([hit["rerank_score"] for hit in hits], dtype=np.float64)
+                peak = np.abs(relevance).max()
+                relevance = relevance / peak if peak > 0 else relevance
+            else:
+                relevance = np.array([hit.get("score", 0.0) for hit in hits], dtype=np.float64)
+
+            order = mmr(relevance, np.asarray([hit["vector"] for hit in hits], dtype=np.float32),
+                        limit, self.lambda_)
+            hits = [hits[i] for i in order]
+        else:
+            hits = hits[:limit]
+
+        selected = merge_adjacent([{k: v for k, v in hit.items() if k != "vector"} for hit in hits])
+        if len(selected) < len(hits):
+            logger.info(f"Merged {len(hits)} hits into {len(selected)} spans")
+        return selected
+
+
+# Singleton instance
+diversity_service = DiversityService()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Keep the index in step with frontend/docs: watch the tree and re-index pages as they change.
+
+Changes are picked up with inotify (through watchfiles, installed with uvicorn[standard]) or,
+without it or with --poll, by polling an mtime/size index of the tree; bursts of saves are
+debounced into one pass. A file whose mtime or size changed is re-read and re-indexed only if
+its content hash changed too. Pages are chunked per section (chunking.section_spans, as every
+indexing entry point does) and chunks are content-addressed, so an edit re-embeds only the chunks
+of the sections it touched.
+
+A page's new chunks are stored before the chunks it no longer has are released, so while it is
+re-indexed a reader may find chunks of both versions, but never a page with chunks missing.
+Deleted pages are removed from Qdrant, the chunk store and the database. A page that fails to
+index is logged and left out of the saved state, so the next pass retries it.
+
+Usage:
+    python docs_watcher.py                 # sync what changed since the last run, then watch
+    python docs_watcher.py --once          # sync and exit
+    python docs_watcher.py --poll 2        # poll every 2 s instead of inotify
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from config import load_environment, configure_logging
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "frontend" / "docs"
+
+
+def read_document(path: Path, docs_dir: Path) -> Dict[str, Any]:
+    """doc_id, title and section of a page, derived the way index_book_content.py does"""
+    content = path.read_text(encoding="utf-8")
+    relative = path.relative_to(docs_dir)
+
+    title = None
+    lines = content.split("\n")
+    if lines and lines[0].strip() == "---":
+        for line in lines[1:]:
+            if line.strip() == "---":
+                break
+            if line.startswith("title:"):
+                title = line.split(":", 1)[1].strip().strip("\"'")
+                break
+    if title is None:
+        title = next((line[2:].strip() for line in lines if line.startswith("# ")),
+                     path.stem.replace("_", " ").title())
+
+    doc_id = str(relative).replace(os.sep, "_").replace(".md", "")
+    doc_id = doc_id.replace("..", "").replace("__", "_").strip("_")
+    section = str(relative.parent) if relative.parent != Path(".") else "main"
+    return {"doc_id": doc_id, "title": title, "section": section, "content": content}
+
+
+def scan(docs_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """(mtime_ns, size) of every markdown page, keyed by path relative to docs_dir"""
+    found = {}
+    for root, _, files in os.walk(docs_dir):
+        for name in files:
+            if name.endswith(".md"):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # deleted mid-scan
+                found[os.path.relpath(path, docs_dir)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+class DocsWatcher:
+    """
+    Re-indexes changed pages of a docs tree. The mtime/size/hash of every indexed page is kept in
+    WATCH_STATE_PATH, so a restart only re-indexes what changed while the watcher was down.
+    """
+
+    def __init__(self, docs_dir: Path = None, state_path: str = None,
+                 debounce_ms: int = None, poll_interval: Optional[float] = None):
+        self.docs_dir = Path(docs_dir or os.getenv("DOCS_DIR") or DOCS_DIR).resolve()
+        self.state_path = state_path or os.getenv("WATCH_STATE_PATH", "./docs_watch_state.json")
+        self.debounce_ms = debounce_ms if debounce_ms is not None else int(os.getenv("WATCH_DEBOUNCE_MS", "1500"))
+        self.poll_interval = poll_interval  # None: inotify when available
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    # ---------- indexing ----------
+
+    async def sync(self) -> Dict[str, int]:
+        """Re-index pages whose content changed and remove deleted ones"""
+        current = scan(self.docs_dir)
+        counts = {"indexed": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+        for relative, (mtime_ns, size) in sorted(current.items()):
+            known = self.state.get(relative)
+            if known and (known["mtime_ns"], known["size"]) == (mtime_ns, size):
+                continue
+            try:
+                document = read_document(self.docs_dir / relative, self.docs_dir)
+                digest = hashlib.sha1(document["content"].encode("utf-8")).hexdigest()
+                if not known or known["sha1"] != digest:
+                    await self.reindex(document)
+                    counts["indexed"] += 1
+                else:
+                    counts["unchanged"] += 1  # touched or saved without edits
+            except Exception:
+                # Not recorded, so the page is retried on the next pass
+                logger.exception(f"Could not index {relative}")
+                counts["failed"] += 1
+                continue
+            self.state[relative] = {"mtime_ns": mtime_ns, "size": size, "sha1": digest, "doc_id": document["doc_id"]}
+            self._save_state()
+
+        for relative in sorted(set(self.state) - set(current)):
+            try:
+                await self.remove(self.state[relative]["doc_id"])
+            except Exception:
+                logger.exception(f"Could not remove {relative}")
+                counts["failed"] += 1
+                continue
+            del self.state[relative]
+            counts["removed"] += 1
+            self._save_state()
+        return counts
+
+    async def reindex(self, document: Dict[str, Any]):
+        from answer_index import answer_index
+        from chunking import section_spans, chunk_metadata
+        from vector_store import qdrant_service
+
+        start = time.perf_counter()
+        content = document["content"]
+        spans = section_spans(content)
+        chunks = [content[a:b] for a, b in spans]
+        await asyncio.to_thread(self._store_row, document)
+        if chunks and qdrant_service.connected:
+            metadata = chunk_metadata(content, spans, section=document["section"], title=document["title"])
+            await qdrant_service.store_embeddings(chunks, [document["doc_id"]] * len(chunks), metadata, replace=True)
+        elif qdrant_service.connected:
+            await qdrant_service.remove_documents([document["doc_id"]])
+        answer_index.invalidate_docs([document["doc_id"]])
+        logger.info(f"Re-indexed {document['doc_id']} ({len(chunks)} chunks) "
+                    f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    async def remove(self, doc_id: str):
+        from answer_index import answer_index
+        from vector_store import qdrant_service
+
+        if qdrant_service.connected:
+            await qdrant_service.remove_documents([doc_id])
+        await asyncio.to_thread(self._delete_row, doc_id)
+        answer_index.invalidate_docs([doc_id])
+        logger.info(f"Removed {doc_id}")
+
+    @staticmethod
+    def _store_row(document: Dict[str, Any]):
+        from database import SessionLocal, upsert_document
+
+        db = SessionLocal()
+        try:
+            upsert_document(db, document["doc_id"], document["title"], document["content"], document["section"])
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _delete_row(doc_id: str):
+        from database import SessionLocal, Document
+
+        db = SessionLocal()
+        try:
+            db.query(Document).filter(Document.doc_id == doc_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- watching ----------
+
+    async def watch(self):
+        """Sync, then re-sync after every debounced burst of changes until cancelled"""
+        logger.info(f"Initial sync of {self.docs_dir}: {await self.sync()}")
+        if self.poll_interval is None:
+            try:
+                import watchfiles
+            except ImportError:
+                logger.info("watchfiles is not installed; polling for changes")
+                self.poll_interval = float(os.getenv("WATCH_POLL_INTERVAL", "2"))
+        if self.poll_interval is None:
+            await self._watch_events()
+        else:
+            await self._watch_polling()
+
+    async def _watch_events(self):
+        import watchfiles
+
+        logger.info(f"Watching {self.docs_dir} for changes (inotify)")
+        # watchfiles blocks in the kernel between events and groups a burst until it has been
+        # quiet for debounce_ms
+        async for changes in watchfiles.awatch(self.docs_dir, debounce=self.debounce_ms,
+                                               watch_filter=lambda change, path: path.endswith(".md")):
+            logger.info(f"{len(changes)} change(s) detected")
+            self._log_sync(await self.sync())
+
+    async def _watch_polling(self):
+        logger.info(f"Polling {self.docs_dir} every {self.poll_interval}s")
+        last = scan(self.docs_dir)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = scan(self.docs_dir)
+            if current == last:
+                continue
+            # Debounce: wait until the tree has stopped changing
+            while True:
+                await asyncio.sleep(self.debounce_ms / 1000)
+                settled = scan(self.docs_dir)
+                if settled == current:
+                    break
+                current = settled
+            last = current
+            self._log_sync(await self.sync())
+
+    @staticmethod
+    def _log_sync(counts: Dict[str, int]):
+        logger.info(f"Sync finished: {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", default=None, help=f"docs tree to watch (default: {DOCS_DIR})")
+    parser.add_argument("--once", action="store_true", help="sync changed pages and exit")
+    parser.add_argument("--poll", type=float, default=None, metavar="SECONDS", help="poll instead of inotify")
+    parser.add_argument("--debounce-ms", type=int, default=None)
+    args = parser.parse_args()
+
+    configure_logging()
+    from database import init_db
+    init_db()
+
+    watcher = DocsWatcher(args.docs, debounce_ms=args.debounce_ms, poll_interval=args.poll)
+    try:
+        if args.once:
+            print(asyncio.run(watcher.sync()))
+        else:
+            asyncio.run(watcher.watch())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Retrieval evaluation and regression suite over frontend/docs.
+
+Labels are generated from the book itself: every section heading below the page title is a
+question, and the section under it (heading to next heading) is what should be retrieved.
+Labels point at character spans of the pages, not at chunks, so the same set scores any
+chunking: a chunk is relevant to a question when at least a quarter of the shorter of the two
+(chunk, section) lies inside the other.
+
+Labelled spans start below their heading line, so a chunk holding little more than the heading
+(the question's own words) doesn't count as an answer.
+
+Each configuration is chunked, embedded (Gemini when configured, placeholder vectors
+otherwise, whose scores carry no meaning) and searched in memory with the stages
+RAGService.retrieve_context and query() run, in their order:
+
+    normalization      QueryNormalizer over the configuration's chunks (QUERY_NORMALIZATION_ENABLED)
+    vector search      cosine over the chunk embeddings, over-fetching for rerank and MMR as served
+    thresholds         vector_store.relevant_hits: --min-score, then the top --fallback regardless
+    fusion             weighted reciprocal rank fusion with BM25 over all chunks; --fusion is the
+                       vector share (1 = vector only, as served; 0 = BM25 only)
+    rerank             RerankService.rescore on k x RERANK_OVERFETCH candidates (--rerank on),
+                       without the serving time budget
+    diversity          DiversityService.select: MMR (--mmr, off as served) and merge_adjacent
+    adaptive policy    AdaptivePolicy.decide (--adaptive on): no_match retrieves nothing, confident
+                       keeps ADAPTIVE_CONFIDENT_SOURCES
+
+A span merged from several chunks is one result holding all of them. Results are reported per k
+as recall@k, MRR@k and nDCG@k, mean characters of context retrieved,
+per-query latency (p50/p95, search stages after the query embedding) and memory (index
+vectors plus text, and the peak RSS of the process that ran the configuration). Chunkings run
+in parallel, one process each; everything else is swept inside the process.
+
+    python evaluation.py labels --out eval_labels.json
+    python evaluation.py run --chunk-size 500 1000 1500 --overlap 0 100 200 --fusion 1 0.5 0 \\
+        --k 3 5 10 --processes 4 --out eval_report.json
+    python evaluation.py run --baseline eval_report.json --max-drop 0.02    # exits 1 on a regression
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from chunking import chunk_spans, scan_headings, section_spans
+
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = Path(__file__).resolve().parent.parent / "frontend" / "docs"
+
+# Parameters identifying a report row, in report order
+PARAMETERS = ["chunker", "chunk_size", "overlap", "min_score", "fallback", "fusion", "rerank", "mmr", "adaptive", "k"]
+METRICS = ["recall", "mrr", "ndcg"]
+
+Hit = namedtuple("Hit", "id score")
+
+
+def load_documents(docs_dir: Path = DOCS_DIR) -> Dict[str, str]:
+    """Markdown pages by path relative to docs_dir"""
+    return {str(path.relative_to(docs_dir)): path.read_text(encoding="utf-8")
+            for path in sorted(docs_dir.rglob("*.md*"))}
+
+
+def build_labels(documents: Dict[str, str], min_chars: int = 50) -> List[Dict[str, Any]]:
+    """
+    One question per section heading (page titles excluded) with the spans that answer it: the
+    section below the heading line, which would otherwise give the question away
+    """
+    labels: Dict[str, Dict[str, Any]] = {}
+    for doc_id, content in documents.items():
+        offsets, trails = scan_headings(content)
+        for i, (offset, trail) in enumerate(zip(offsets, trails)):
+            end = offsets[i + 1] if i + 1 < len(offsets) else len(content)
+            line_end = content.find("\n", offset, end)
+            start = end if line_end == -1 else line_end + 1
+            if len(trail) < 2 or len(content[start:end].strip()) < min_chars:
+                continue
+            # A heading repeated across pages is one question with several answers
+            label = labels.setdefault(trail[-1].lower(), {"question": trail[-1], "relevant": []})
+            label["relevant"].append([doc_id, start, end])
+    return list(labels.values())
+
+
+def chunk_corpus(documents: Dict[str, str], chunker: str, chunk_size: int,
+                 overlap: int) -> List[Tuple[str, int, int]]:
+    spans_of = section_spans if chunker == "section" else chunk_spans
+    return [(doc_id, start, end) for doc_id, content in documents.items()
+            for start, end in spans_of(content, chunk_size, overlap)]
+
+
+def relevant_chunks(label: Dict[str, Any], chunks: List[Tuple[str, int, int]]) -> set:
+    relevant = set()
+    for doc_id, start, end in label["relevant"]:
+        for i, (chunk_doc, chunk_start, chunk_end) in enumerate(chunks):
+            shared = min(end, chunk_end) - max(start, chunk_start)
+            if chunk_doc == doc_id and shared > 0 and shared >= 0.25 * min(end - start, chunk_end - chunk_start):
+                relevant.add(i)
+    return relevant
+
+
+def metrics(ranked: List[List[int]], relevant: set, k: int) -> Dict[str, float]:
+    """
+    recall@k, reciprocal rank and binary nDCG@k of one ranking of results, each a list of the
+    chunks it holds (several for merged spans); a result is relevant when any of them is
+    """
+    top = ranked[:k]
+    gains = [1.0 if relevant.intersection(group) else 0.0 for group in top]
+    dcg = sum(gain / np.log2(rank + 2) for rank, gain in enumerate(gains))
+    ideal = sum(1 / np.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return {
+        "recall": len(relevant.intersection(idx for group in top for idx in group)) / len(relevant),
+        "mrr": next((1 / (rank + 1) for rank, gain in enumerate(gains) if gain), 0.0),
+        "ndcg": float(dcg / ideal) if ideal else 0.0,
+    }
+
+
+def fuse_ranks(rankings: List[List[int]], weights: List[float], k: int = 60) -> List[int]:
+    """Weighted reciprocal rank fusion of several rankings of the same items"""
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, idx in enumerate(ranking, 1):
+            scores[idx] = scores.get(idx, 0.0) + weight / (k + rank)
+    return sorted(scores, key=lambda idx: -scores[idx])
+
+
+class CorpusTexts:
+    """The chunk texts of one configuration, read by QueryNormalizer in place of the chunk store"""
+
+    def __init__(self, texts: List[str]):
+        self._texts = texts
+
+    def count(self) -> int:
+        return len(self._texts)
+
+    def texts(self) -> List[str]:
+        return self._texts
+
+
+def rank(query: str, query_vector: np.ndarray, chunk_vectors: np.ndarray, texts: List[str],
+         chunks: List[Tuple[str, int, int]], variant: Dict[str, Any], limit: int,
+         lexical, reranker, diversity, policy) -> List[List[int]]:
+    """
+    Results in the order the configured stages return them, each the chunk indices it holds.
+    `query` is the normalized question, as retrieval sees it
+    """
+    from retrieval_policy import NO_MATCH
+    from vector_store import relevant_hits
+
+    diversity.enabled = variant["mmr"]
+    reranker.enabled = variant["rerank"]
+    policy.enabled = variant["adaptive"]
+    candidates = max(reranker.candidate_limit(limit), diversity.candidate_limit(limit))
+    scores = chunk_vectors @ query_vector
+    order = np.argsort(-scores)[:candidates]
+    hits = relevant_hits([Hit(int(i), float(scores[i])) for i in order], variant["min_score"], variant["fallback"])
+    ranked = [hit.id for hit in hits]
+
+    if variant["fusion"] < 1:
+        bm25 = lexical.score(query, texts)
+        lexical_order = [int(i) for i in np.argsort(-bm25)[:candidates] if bm25[i] > 0]
+        ranked = fuse_ranks([ranked, lexical_order], [variant["fusion"], 1 - variant["fusion"]])[:candidates]
+
+    results = [{"id": i, "text": texts[i], "doc_id": chunks[i][0], "score": float(scores[i]),
+                "vector": chunk_vectors[i], "metadata": {"start": chunks[i][1], "end": chunks[i][2]}}
+               for i in ranked]
+    if variant["rerank"] and len(results) > 1:
+        results = [{**hit, "rerank_score": score}
+                   for score, hit in reranker.rescore(query, results)[:diversity.candidate_limit(limit)]]
+    else:
+        results = results[:diversity.candidate_limit(limit)]
+
+    selected = diversity.select(results, limit)
+    decision = policy.decide(selected, limit, sum(len(hit["text"]) for hit in selected))
+    if decision.branch == NO_MATCH:
+        return []
+    return [hit.get("merged_ids", [hit["id"]]) for hit in selected[:decision.sources]]
+
+
+def evaluate_chunking(task: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every variant and k for one chunking; runs in its own process"""
+    from diversity import DiversityService
+    from gemini_service import gemini_service
+    from query_normalizer import QueryNormalizer
+    from reranker import LexicalScorer, RerankService
+    from retrieval_policy import AdaptivePolicy
+    from vector_store import qdrant_service
+
+    documents, labels, ks = task["documents"], task["labels"], task["ks"]
+    chunks = chunk_corpus(documents, task["chunker"], task["chunk_size"], task["overlap"])
+    texts = [documents[doc_id][start:end] for doc_id, start, end in chunks]
+    labelled = [(label["question"], relevant_chunks(label, chunks)) for label in labels]
+    labelled = [(question, relevant) for question, relevant in labelled if relevant]
+    # Retrieval sees the question as normalized against this configuration's vocabulary
+    normalizer = QueryNormalizer(CorpusTexts(texts))
+    labelled = [(normalizer.normalize_sync(question), relevant) for question, relevant in labelled]
+
+    async def embed():
+        chunk_vectors = await qdrant_service.generate_embeddings(texts)
+        started = time.perf_counter()
+        query_vectors = await qdrant_service.generate_embeddings([question for question, _ in labelled])
+        return chunk_vectors, query_vectors, (time.perf_counter() - started) * 1000 / max(len(labelled), 1)
+
+    chunk_vectors, query_vectors, embed_ms = asyncio.run(embed())
+    chunk_vectors = np.asarray(chunk_vectors, dtype=np.float32)
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    index_mb = (chunk_vectors.nbytes + sum(len(text.encode("utf-8")) for text in texts)) / 1e6
+
+    lexical = LexicalScorer()
+    reranker, diversity, policy = RerankService(), DiversityService(), AdaptivePolicy()
+    limit = max(ks)
+
+    rows = []
+    for variant in task["variants"]:
+        rankings, latencies = [], []
+        for (question, _), vector in zip(labelled, query_vectors):
+            started = time.perf_counter()
+            rankings.append(rank(question, vector, chunk_vectors, texts, chunks, variant, limit,
+                                 lexical, reranker, diversity, policy))
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        for k in ks:
+            scored = [metrics(ranking, relevant, k) for ranking, (_, relevant) in zip(rankings, labelled)]
+            rows.append({
+                "chunker": task["chunker"], "chunk_size": task["chunk_size"], "overlap": task["overlap"],
+                **variant, "k": k,
+                **{name: round(statistics.mean(row[name] for row in scored), 4) for name in METRICS},
+                "context_chars": round(statistics.mean(sum(span_chars(chunks, group) for group in ranking[:k])
+                                                       for ranking in rankings)),
+                "p50_ms": round(latencies[len(latencies) // 2], 3),
+                "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+                "embed_ms": round(embed_ms, 3),
+                "chunks": len(chunks), "questions": len(labelled),
+                "index_mb": round(index_mb, 2),
+                "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "embeddings": "gemini" if gemini_service.available else "placeholder",
+            })
+    return rows
+
+
+def span_chars(chunks: List[Tuple[str, int, int]], group: List[int]) -> int:
+    """Characters of a result: merged chunks are one contiguous span of their document"""
+    return max(chunks[i][2] for i in group) - min(chunks[i][1] for i in group)
+
+
+def sweep(documents: Dict[str, str], labels: List[Dict[str, Any]], args) -> List[Dict[str, Any]]:
+    variants = [{"min_score": min_score, "fallback": fallback, "fusion": fusion, "rerank": rerank == "on",
+                 "mmr": mmr == "on", "adaptive": adaptive == "on"}
+                for min_score, fallback, fusion, rerank, mmr, adaptive
+                in itertools.product(args.min_score, args.fallback, args.fusion, args.rerank, args.mmr, args.adaptive)]
+    tasks = [{"documents": documents, "labels": labels, "ks": sorted(args.k), "variants": variants,
+              "chunker": chunker, "chunk_size": size, "overlap": overlap}
+             for chunker, size, overlap in itertools.product(args.chunker, args.chunk_size, args.overlap)
+             if overlap < size]
+    if args.processes <= 1 or len(tasks) == 1:
+        results = map(evaluate_chunking, tasks)
+    else:
+        # A process per chunking, so each reports its own peak memory
+        with ProcessPoolExecutor(max_workers=min(args.processes, len(tasks)), max_tasks_per_child=1) as pool:
+            results = list(pool.map(evaluate_chunking, tasks))
+    return [row for rows in results for row in rows]
+
+
+def key(row: Dict[str, Any]) -> tuple:
+    return tuple(row[name] for name in PARAMETERS)
+
+
+def print_report(rows: List[Dict[str, Any]], baseline: List[Dict[str, Any]] = None):
+    before = {key(row): row for row in baseline or []}
+    header = (f"{'chunker':<8} {'size':>5} {'ovl':>4} {'min':>5} {'fb':>3} {'fuse':>5} {'rr':>3} {'mmr':>3} "
+              f"{'ad':>3} {'k':>3} "
+              f"{'chunks':>6} {'recall':>7} {'MRR':>6} {'nDCG':>6} {'ctx ch':>7} {'p50 ms':>7} {'p95 ms':>7} "
+              f"{'idx MB':>6} {'rss MB':>6}")
+    print(header)
+    for row in sorted(rows, key=key):
+        line = (f"{row['chunker']:<8} {row['chunk_size']:>5} {row['overlap']:>4} {row['min_score']:>5} "
+                f"{row['fallback']:>3} {row['fusion']:>5} {'on' if row['rerank'] else 'off':>3} "
+                f"{'on' if row['mmr'] else 'off':>3} {'on' if row['adaptive'] else 'off':>3} {row['k']:>3} "
+                f"{row['chunks']:>6} {row['recall']:>7.3f} {row['mrr']:>6.3f} {row['ndcg']:>6.3f} "
+                f"{row['context_chars']:>7} {row['p50_ms']:>7.3f} {row['p95_ms']:>7.3f} "
+                f"{row['index_mb']:>6.2f} {row['rss_mb']:>6.0f}")
+        old = before.get(key(row))
+        if old is not None:
+            line += "  " + " ".join(f"{name} {row[name] - old[name]:+.3f}" for name in METRICS)
+        print(line)
+
+
+def regressions(rows: List[Dict[str, Any]], baseline: List[Dict[str, Any]], max_drop: float) -> List[str]:
+    before = {key(row): row for row in baseline}
+    found = []
+    for row in rows:
+        old = before.get(key(row))
+        for name in METRICS:
+            if old is not None and old[name] - row[name] > max_drop:
+                found.append(f"{dict(zip(PARAMETERS, key(row)))}: {name} {old[name]:.3f} -> {row[name]:.3f}")
+    return found
+
+
+def main():
+    from config import load_environment, configure_logging
+
+    load_environment()
+    configure_logging()
+    logging.getLogger().setLevel(logging.WARNING)  # per-search INFO lines drown the report
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    labels_parser = commands.add_parser("labels", help="write the generated question -> span labels")
+    labels_parser.add_argument("--out", default="eval_labels.json")
+
+    run_parser = commands.add_parser("run", help="evaluate a grid of configurations")
+    run_parser.add_argument("--labels", help="labels file (default: generated from frontend/docs)")
+    run_parser.add_argument("--chunker", nargs="+", choices=["section", "fixed"], default=["section"])
+    run_parser.add_argument("--chunk-size", type=int, nargs="+", default=[1000])
+    run_parser.add_argument("--overlap", type=int, nargs="+", default=[100])
+    run_parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    run_parser.add_argument("--min-score", type=float, nargs="+", default=[0.05])
+    run_parser.add_argument("--fallback", type=int, nargs="+", default=[2])
+    run_parser.add_argument("--fusion", type=float, nargs="+", default=[1.0])
+    run_parser.add_argument("--rerank", nargs="+", choices=["off", "on"], default=["off"])
+    run_parser.add_argument("--mmr", nargs="+", choices=["off", "on"], default=["off"])
+    run_parser.add_argument("--adaptive", nargs="+", choices=["off", "on"], default=["off"])
+    run_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument("--out", help="write the report rows as JSON")
+    run_parser.add_argument("--baseline", help="report to compare against")
+    run_parser.add_argument("--max-drop", type=float, help="exit 1 if any metric drops more than this below the baseline")
+    args = parser.parse_args()
+
+    documents = load_documents()
+    if args.command == "labels":
+        labels = build_labels(documents)
+        Path(args.out).write_text(json.dumps(labels, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Wrote {len(labels)} questions over {len(documents)} pages to {args.out}")
+        return 0
+
+    labels = (json.loads(Path(args.labels).read_text(encoding="utf-8")) if args.labels
+              else build_labels(documents))
+    started = time.perf_counter()
+    rows = sweep(documents, labels, args)
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+
+    print(f"{len(labels)} questions over {len(documents)} pages, {rows[0]['embeddings']} embeddings, "
+          f"{len(rows)} rows in {time.perf_counter() - started:.1f}s")
+    print_report(rows, baseline)
+    if args.out:
+        Path(args.out).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+
+    if baseline is not None and args.max_drop is not None:
+        found = regressions(rows, baseline, args.max_drop)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,52 @@
 import os
+import importlib.util
 import logging
+import random
+import time
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import asyncio
 
+from config import load_environment
+from usage import usage_service
+
 # Load environment variables from .env file
-from dotenv import load_dotenv
-load_dotenv()
+load_environment()
 
 logger = logging.getLogger(__name__)
 
-# Try to import Google Generative AI, with fallback
-GOOGLE_GENAI_AVAILABLE = False
+# google.generativeai costs most of a second to import, so only check that it is installed
+# here and import/configure it the first time a model is needed
 try:
-    import google.generativeai as genai
-    GOOGLE_GENAI_AVAILABLE = True
-    logger.info("Google Generative AI library (google.generativeai) imported successfully")
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    GOOGLE_GENAI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
 except ImportError:
+    GOOGLE_GENAI_AVAILABLE = False
+if not GOOGLE_GENAI_AVAILABLE:
     logger.warning("Google Generative AI library not available")
-except Exception as e:
-    logger.warning(f"Could not configure Google Generative AI: {e}")
+
+_genai = None
+
+def load_genai():
+    """Import and configure google.generativeai once; returns None if that fails"""
+    global _genai
+    if _genai is None and GOOGLE_GENAI_AVAILABLE:
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _genai = genai
+            logger.info("Google Generative AI library (google.generativeai) imported successfully")
+        except Exception as e:
+            logger.warning(f"Could not configure Google Generative AI: {e}")
+    return _genai
+
+# Status codes worth another attempt: quota/rate limits and transient server errors
+RETRYABLE_CODES = {429, 500, 503, 504}
+SAFETY_CATEGORIES = [
+    "HARM_CATEGORY_DANGEROUS_CONTENT",
+    "HARM_CATEGORY_HATE_SPEECH",
+    "HARM_CATEGORY_HARASSMENT",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+]
 
 class ChatCompletionRequest(BaseModel):
     messages: List[Dict[str, str]]
@@ -31,30 +57,128 @@ class ChatCompletionRequest(BaseModel):
 class ChatCompletionResponse(BaseModel):
     response: str
     tokens_used: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    finish_reason: Optional[str] = None
+
+
+def error_code(error: Exception) -> Optional[int]:
+    """HTTP status of a Google API error (google.api_core maps gRPC errors onto these too)"""
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay the server asked for in a RetryInfo error detail, in seconds"""
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    return None
+
 
 class GeminiService:
+    """
+    Gemini chat completions through the SDK's shared async client: the model is a field of each
+    request, so any model can be used per call without building GenerativeModel objects.
+
+    At most GEMINI_MAX_CONCURRENCY calls are in flight per worker process (so WEB_CONCURRENCY
+    times that under serve.py), so bursts queue here instead of
+    exhausting the per-minute quota; 429s and transient server errors are retried with full
+    jitter backoff (or after the delay the server asks for, when it is short enough).
+    """
+
     def __init__(self):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+        self.retry_base_delay = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8"))
+        self.timeout = float(os.getenv("GEMINI_TIMEOUT", "30"))
 
         if not self.api_key:
             logger.warning("GOOGLE_API_KEY environment variable is not set. Some features may not work.")
 
-        self.model = None
-        if GOOGLE_GENAI_AVAILABLE and self.api_key:
-            try:
-                self.model = genai.GenerativeModel(self.model_name)
-                logger.info(f"Initialized Gemini model: {self.model_name}")
-            except Exception as e:
-                logger.error(f"Error initializing Gemini model: {e}")
-                self.model = None
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def available(self) -> bool:
+        """Whether calls can be made: an API key is set and the SDK imports (imported on first access)"""
+        return bool(self.api_key) and load_genai() is not None
+
+    @property
+    def client(self):
+        """The SDK's GenerativeServiceAsyncClient, created on first use (inside the event loop)"""
+        if self._client is None:
+            self._client = load_genai().client.get_default_generative_async_client()
+        return self._client
+
+    @staticmethod
+    def build_request(messages: List[Dict[str, Any]], model: str, temperature: float, max_tokens: int):
+        """GenerateContentRequest for OpenAI-style messages; system messages become the system instruction"""
+        protos = load_genai().protos
+
+        system, contents = [], []
+        for msg in messages:
+            text = msg["content"]
+            # OpenAI-style content parts (e.g. a cache breakpoint) map onto Gemini parts
+            parts = [protos.Part(text=part.get("text", "")) for part in text] if isinstance(text, list) \
+                else [protos.Part(text=text)]
+            if msg["role"] == "system":
+                system.extend(parts)
+            else:
+                contents.append(protos.Content(role="user" if msg["role"] == "user" else "model", parts=parts))
+
+        return protos.GenerateContentRequest(
+            model=model if model.startswith("models/") else f"models/{model}",
+            contents=contents,
+            system_instruction=protos.Content(parts=system) if system else None,
+            generation_config=protos.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens),
+            safety_settings=[protos.SafetySetting(category=category, threshold="BLOCK_NONE")
+                             for category in SAFETY_CATEGORIES],
+        )
+
+    def _backoff(self, attempt: int, error: Exception) -> Optional[float]:
+        """Seconds to wait before retrying `error`, or None if it should not be retried"""
+        if attempt >= self.max_retries or error_code(error) not in RETRYABLE_CODES:
+            return None
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            if requested > self.retry_max_delay:
+                return None  # e.g. the per-minute quota is spent; don't hold the request that long
+            delay = max(delay, requested)
+        return delay
+
+    async def generate(self, request):
+        """Send one GenerateContentRequest within the concurrency limit, retrying transient errors"""
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    # The SDK's own retry is off; retries and their pacing are decided here
+                    return await self.client.generate_content(request, timeout=self.timeout, retry=None)
+                except Exception as e:
+                    error = e
+            # Back off outside the semaphore so queued calls can use the slot meanwhile
+            delay = self._backoff(attempt, error)
+            if delay is None:
+                raise error
+            attempt += 1
+            logger.warning(f"Gemini call failed with {error_code(error)}; retry {attempt}/{self.max_retries} "
+                           f"in {delay:.2f}s")
+            await asyncio.sleep(delay)
 
     async def get_chat_completion(self, messages: List[Dict[str, str]],
                                   model: str = None,
                                   temperature: float = 0.7,
-                                  max_tokens: int = 1024) -> ChatCompletionResponse:
+                                  max_tokens: int = 1024,
+                                  purpose: str = "chat") -> ChatCompletionResponse:
         """
-        Get chat completion from Google Gemini API
+        Get chat completion from Google Gemini API.
+        Raises usage.BudgetExceeded when the request or daily token limit leaves no room for the call.
         """
         if not GOOGLE_GENAI_AVAILABLE:
             logger.warning("Google Generative AI library not available. Returning mock response.")
@@ -63,90 +187,62 @@ class GeminiService:
                 tokens_used=0
             )
 
-        if not self.api_key or not self.model:
-            logger.warning("Google Gemini API key not set or model not initialized. Returning mock response.")
+        if not self.available:
+            logger.warning("Google Gemini API key not set or SDK not configured. Returning mock response.")
             return ChatCompletionResponse(
                 response="I'm the AI assistant. The Google Gemini API is not configured properly. Please check the API key.",
                 tokens_used=0
             )
 
-        try:
-            if not model:
-                model = self.model_name
-
-            # Convert messages to Gemini format
-            contents = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    # Add system message as context to the first user message
-                    if contents and contents[-1]["role"] == "user":
-                        contents[-1]["parts"] = [msg["content"] + "\n\n" + contents[-1]["parts"][0]]
-                    else:
-                        contents.append({"role": "user", "parts": [msg["content"]]})
-                elif msg["role"] == "user":
-                    contents.append({"role": "user", "parts": [msg["content"]]})
-                else:  # assistant role
-                    contents.append({"role": "model", "parts": [msg["content"]]})
-
-            # Prepare generation config
-            generation_config = {
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-            }
-
-            # Generate response using the model
-            response = await self.model.generate_content_async(
-                contents,
-                generation_config=generation_config,
-                safety_settings={
-                    'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
-                    'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
-                    'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
-                    'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE'
-                }
-            )
-
-            if response.text:
-                content = response.text
-                tokens_used = len(content.split())
-
-                logger.info(f"Chat completion generated, tokens used: {tokens_used}")
-                return ChatCompletionResponse(
-                    response=content,
-                    tokens_used=tokens_used
-                )
-            else:
-                logger.warning("Gemini returned empty response")
-                return ChatCompletionResponse(
-                    response="I'm the AI assistant. The response from Gemini was empty. Please try again.",
-                    tokens_used=0
-                )
+        route = usage_service.route("gemini", messages, max_tokens)
+        max_tokens = route.max_tokens
+        model = model or route.model or self.model_name
 
+        start = time.perf_counter()
+        try:
+            response = await self.generate(self.build_request(messages, model, temperature, max_tokens))
         except Exception as e:
-            error_msg = str(e).lower()
-            # Check if the error is related to quota limits
-            if "quota" in error_msg or "exceeded" in error_msg or "429" in error_msg or "rate limit" in error_msg:
+            if error_code(e) == 429:
                 logger.error(f"Gemini API quota exceeded: {e}")
-                # Provide a more helpful response that can still process the query using local methods
-                # Extract the user's question from the messages
-                user_question = ""
-                for msg in messages:
-                    if msg["role"] == "user":
-                        user_question = msg["content"]
-                        break
-
-                # Return a response that acknowledges the quota issue but still tries to help
+                user_question = next((msg["content"] for msg in messages if msg["role"] == "user"), "")
+                # Acknowledge the quota issue but still try to help
                 return ChatCompletionResponse(
                     response=f"I'm the AI assistant. The API quota has been exceeded. However, I can still try to help based on the context provided. User question: {user_question}",
                     tokens_used=0
                 )
-            else:
-                logger.error(f"Error in Gemini chat completion: {e}")
-                # Return a mock response as fallback
-                return ChatCompletionResponse(
-                    response="I'm the AI assistant. There was an issue with the Google Gemini API. Please try again later.",
-                    tokens_used=0
-                )
+            logger.error(f"Error in Gemini chat completion: {e}")
+            return ChatCompletionResponse(
+                response="I'm the AI assistant. There was an issue with the Google Gemini API. Please try again later.",
+                tokens_used=0
+            )
+
+        candidate = response.candidates[0] if response.candidates else None
+        content = "".join(part.text for part in candidate.content.parts) if candidate else ""
+        if not content:
+            logger.warning(f"Gemini returned empty response (block reason {response.prompt_feedback.block_reason}, "
+                           f"finish reason {candidate.finish_reason if candidate else None})")
+            return ChatCompletionResponse(
+                response="I'm the AI assistant. The response from Gemini was empty. Please try again.",
+                tokens_used=0
+            )
+
+        usage = response.usage_metadata
+        event = usage_service.record(
+            "gemini", model, messages, content,
+            prompt_tokens=usage.prompt_token_count,
+            completion_tokens=usage.candidates_token_count,
+            purpose=purpose
+        )
+        logger.info(f"Chat completion generated with {model} in {time.perf_counter() - start:.2f}s, "
+                    f"tokens used: {event.total_tokens} (prompt {event.prompt_tokens}, completion "
+                    f"{event.completion_tokens}, max_tokens {max_tokens}; {route.reason})")
+        return ChatCompletionResponse(
+            response=content,
+            tokens_used=event.total_tokens,
+            prompt_tokens=event.prompt_tokens,
+            completion_tokens=event.completion_tokens,
+            finish_reason=getattr(candidate.finish_reason, "name", str(candidate.finish_reason))
+        )
 
     async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -166,27 +262,9 @@ class GeminiService:
         """
         Generate placeholder embeddings when API is unavailable
         """
-        import numpy as np
-        embeddings = []
-
-        for text in texts:
-            # Create a simple hash-based embedding to ensure some similarity for similar texts
-            text_hash = hash(text) % (2**32)
-            embedding = []
-
-            # Generate a 768-dim vector based on the text content (common dimension for embeddings)
-            for i in range(768):
-                val = (text_hash + i * 1337) % 10000
-                val = (val - 5000) / 5000.0  # Normalize between -1 and 1
-                embedding.append(val)
-
-            # Normalize the embedding vector to unit length (standard for embeddings)
-            magnitude = sum(x**2 for x in embedding) ** 0.5
-            if magnitude > 0:
-                embedding = [x / magnitude for x in embedding]
-
-            embeddings.append(embedding)
+        from vector_store import placeholder_embeddings
 
+        embeddings = placeholder_embeddings(texts)
         logger.info(f"Generated placeholder embeddings for {len(texts)} text(s)")
         return embeddings
 
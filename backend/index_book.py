@@ -6,9 +6,9 @@ from pathlib import Path
 # Add the backend directory to the path so we can import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from main import chunk_document
+from chunking import section_spans, chunk_metadata
 from vector_store import qdrant_service
-from database import SessionLocal, Document
+from database import SessionLocal, Document, init_db
 from datetime import datetime
 
 def read_book_content():
@@ -61,6 +61,7 @@ def read_book_content():
 async def index_book_content():
     """Index the book content into the database and vector store"""
     print("Starting book content indexing...")
+    init_db()
     
     # Read all book content
     book_content = read_book_content()
@@ -70,14 +71,15 @@ async def index_book_content():
         print(f"Indexing: {doc_data['title']} (ID: {doc_data['doc_id']})")
         
         # Chunk the document content
-        chunks = chunk_document(doc_data['content'])
+        spans = section_spans(doc_data['content'])
+        chunks = [doc_data['content'][start:end] for start, end in spans]
         print(f"  - Created {len(chunks)} chunks")
         
         # Store document metadata in database
         db = SessionLocal()
         try:
             # Check if document already exists
-            existing_doc = db.query(Document).filter(Document.doc_id == doc_data['doc_id']).first()
+            existing_doc = db.query(Document.id).filter(Document.doc_id == doc_data['doc_id']).first()
             if existing_doc:
                 print(f"  - Document {doc_data['doc_id']} already exists, skipping database entry")
             else:
@@ -102,20 +104,25 @@ async def index_book_content():
         # Store embeddings in Qdrant
         if chunks:
             doc_ids = [doc_data['doc_id']] * len(chunks)
-            metadata_list = [{"section": doc_data['section'], "title": doc_data['title']} for _ in chunks]
+            metadata_list = chunk_metadata(
+                doc_data['content'], spans,
+                section=doc_data['section'],
+                title=doc_data['title']
+            )
             
             try:
-                vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list)
+                vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list, replace=True)
                 print(f"  - Stored {len(vector_ids)} embeddings in vector store")
                 
                 # Update document record with embedding reference
                 db = SessionLocal()
                 try:
-                    doc = db.query(Document).filter(Document.doc_id == doc_data['doc_id']).first()
-                    if doc:
-                        doc.embedding_vector_id = ",".join(vector_ids)
-                        doc.updated_at = datetime.utcnow()
-                        db.commit()
+                    updated = db.query(Document).filter(Document.doc_id == doc_data['doc_id']).update(
+                        {"embedding_vector_id": ",".join(vector_ids), "updated_at": datetime.utcnow()},
+                        synchronize_session=False
+                    )
+                    db.commit()
+                    if updated:
                         print(f"  - Updated document with vector IDs")
                 except Exception as e:
                     print(f"  - Error updating document with vector IDs: {e}")
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Blue/green rebuilds of the book index.
+
+QDRANT_COLLECTION_NAME (book_embeddings) is a Qdrant alias for a versioned collection
+(book_embeddings_v<timestamp>). A rebuild fills a new version while searches keep reading the
+live one through the alias:
+
+    1. create the version with HNSW indexing off, so points are written at full speed
+    2. index every page of the docs tree into it; vectors of unchanged chunks are copied from
+       the live collection, only new text is embedded. Chunk texts, provenance and document rows
+       go to a staging directory (REBUILD_STAGING_DIR), not to the live chunk store and database
+    3. turn indexing on and wait for the collection to be ready
+    4. validate: every page has points, and the smoke queries (section headings, or --smoke)
+       find their page at least as often as on the live collection, within a tolerance
+    5. switch the alias in one atomic request, replace the live chunk store and upsert the
+       document rows from the staging directory, re-index pages edited during the build, and
+       drop old versions
+
+A failed rebuild deletes its version and staging directory. With --no-switch both are kept, and
+`switch` applies the staging directory along with the alias.
+
+A deployment still on a plain book_embeddings collection is moved onto the alias by its first
+rebuild; deleting the plain collection leaves searches without it for the one request that
+takes.
+
+Usage:
+    python index_versions.py rebuild [--docs DIR] [--no-switch] [--smoke queries.json]
+    python index_versions.py list
+    python index_versions.py switch book_embeddings_v20260101120000
+    python index_versions.py gc [--keep 2]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import List, Dict, Any, Optional
+
+from config import load_environment, configure_logging
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+
+class RebuildFailed(Exception):
+    """Raised when a new version fails validation; the live version is left untouched"""
+
+
+class IndexVersions:
+    """Versioned collections behind the collection alias searches read"""
+
+    def __init__(self, service=None):
+        if service is None:
+            from vector_store import qdrant_service
+            service = qdrant_service
+        self.service = service
+        self.alias = service.collection_name
+        self.keep = int(os.getenv("REBUILD_KEEP_VERSIONS", "2"))
+        self.indexing_threshold = int(os.getenv("REBUILD_INDEXING_THRESHOLD", "20000"))
+        self.index_timeout = float(os.getenv("REBUILD_INDEX_TIMEOUT", "600"))
+        self.max_regression = float(os.getenv("REBUILD_MAX_REGRESSION", "0.1"))
+        self.staging_dir = os.getenv("REBUILD_STAGING_DIR", "./rebuild_staging")
+        self.smoke_limit = 5
+
+    @property
+    def client(self):
+        return self.service.client
+
+    # ---------- versions ----------
+
+    def versions(self) -> List[str]:
+        """Versioned collections, oldest first"""
+        prefix = f"{self.alias}_v"
+        names = [c.name for c in self.client.get_collections().collections if c.name.startswith(prefix)]
+        return sorted(names, key=lambda name: int(name[len(prefix):]) if name[len(prefix):].isdigit() else -1)
+
+    def active(self) -> Optional[str]:
+        """Collection the alias points at; the alias name itself for a plain (pre-alias) collection"""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.alias:
+                return alias.collection_name
+        if any(c.name == self.alias for c in self.client.get_collections().collections):
+            return self.alias
+        return None
+
+    def create_version(self) -> str:
+        name = f"{self.alias}_v{time.strftime('%Y%m%d%H%M%S', time.gmtime())}"
+        self.service.create_versioned_collection(name, bulk=True)
+        logger.info(f"Created {name} with indexing off for the bulk load")
+        return name
+
+    def finish_indexing(self, name: str):
+        """Turn HNSW indexing back on and wait until the collection is ready"""
+        from qdrant_client.http import models
+
+        self.client.update_collection(
+            collection_name=name,
+            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=self.indexing_threshold)
+        )
+        deadline = time.monotonic() + self.index_timeout
+        while self.client.get_collection(name).status != models.CollectionStatus.GREEN:
+            if time.monotonic() > deadline:
+                raise RebuildFailed(f"{name} was not indexed within {self.index_timeout:.0f}s")
+            time.sleep(1)
+
+    def switch(self, name: str):
+        """Point the alias at `name` in one atomic request, then apply its staged chunks and documents"""
+        from qdrant_client.http import models
+
+        current = self.active()
+        if current == self.alias:
+            logger.warning(f"Replacing plain collection {self.alias} with an alias; "
+                           f"searches fail until the alias exists")
+            self.client.delete_collection(self.alias)
+            current = None
+
+        operations = []
+        if current is not None:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.alias)))
+        operations.append(models.CreateAliasOperation(create_alias=models.CreateAlias(
+            collection_name=name, alias_name=self.alias
+        )))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Alias {self.alias} now points at {name} (was {current})")
+        self.apply_staged(name)
+
+    def staging(self, name: str) -> str:
+        """Directory holding the chunk store and document rows of version `name` until it goes live"""
+        return os.path.join(self.staging_dir, name)
+
+    def apply_staged(self, name: str) -> bool:
+        """
+        Replace the live chunk store and upsert the document rows with those staged for `name`,
+        then retire precomputed answers citing documents that changed
+        """
+        from answer_index import answer_index
+        from chunk_store import ChunkStore, chunk_store
+        from database import SessionLocal, upsert_document
+
+        directory = self.staging(name)
+        if not os.path.isdir(directory):
+            logger.info(f"Nothing staged for {name}; the chunk store and documents are unchanged")
+            return False
+        staged = ChunkStore(os.path.join(directory, "chunks.db"))
+        try:
+            chunk_store.load(*staged.dump())
+        finally:
+            staged.close()
+        with open(os.path.join(directory, "documents.json"), encoding="utf-8") as f:
+            documents = json.load(f)
+        db = SessionLocal()
+        try:
+            for document in documents:
+                upsert_document(db, document["doc_id"], document["title"], document["content"], document["section"])
+            db.commit()
+        finally:
+            db.close()
+        answer_index.invalidate_outdated()
+        shutil.rmtree(directory, ignore_errors=True)
+        logger.info(f"Applied {len(documents)} staged document(s) of {name}")
+        return True
+
+    def gc(self, keep: Optional[int] = None) -> List[str]:
+        """Delete old versions, keeping the live one and the newest `keep` - 1 before it"""
+        keep = self.keep if keep is None else keep
+        active = self.active()
+        older = [name for name in self.versions() if name != active]
+        doomed = older[:max(len(older) - (keep - 1), 0)]
+        for name in doomed:
+            self.client.delete_collection(name)
+            shutil.rmtree(self.staging(name), ignore_errors=True)
+            logger.info(f"Deleted old version {name}")
+        return doomed
+
+    # ---------- rebuild ----------
+
+    async def build(self, name: str, documents: List[Dict[str, Any]]):
+        """Index the documents into `name`, staging their chunks and document rows (see apply_staged)"""
+        from chunk_store import ChunkStore
+        from chunking import section_spans, chunk_metadata
+
+        directory = self.staging(name)
+        os.makedirs(directory, exist_ok=True)
+        staged = ChunkStore(os.path.join(directory, "chunks.db"))
+        try:
+            for document in documents:
+                content = document["content"]
+                spans = section_spans(content)
+                chunks = [content[a:b] for a, b in spans]
+                if not chunks:
+                    continue
+                metadata = chunk_metadata(content, spans, section=document["section"], title=document["title"])
+                await self.service.store_embeddings(chunks, [document["doc_id"]] * len(chunks), metadata,
+                                                    collection=name, store=staged)
+        finally:
+            staged.close()
+        with open(os.path.join(directory, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump([{key: document[key] for key in ("doc_id", "title", "section", "content")}
+                       for document in documents], f)
+
+    async def hit_rate(self, collection: str, smoke: List[Dict[str, str]]) -> float:
+        """Share of smoke queries whose expected document is in the top results"""
+        if not smoke:
+            return 1.0
+        embeddings = await self.service.generate_embeddings([item["query"] for item in smoke])
+        hits = 0
+        for item, embedding in zip(smoke, embeddings):
+            points = self.client.query_points(collection_name=collection, query=embedding,
+                                              limit=self.smoke_limit, with_payload=["doc_id"]).points
+            found = set()
+            for point in points:
+                doc_id = (point.payload or {}).get("doc_id")
+                found.update(doc_id if isinstance(doc_id, list) else [doc_id])
+            hits += item["doc_id"] in found
+        return hits / len(smoke)
+
+    async def validate(self, name: str, documents: List[Dict[str, Any]], smoke: List[Dict[str, str]]):
+        from qdrant_client.http import models
+
+        missing = [
+            document["doc_id"] for document in documents
+            if document["content"].strip() and self.client.count(name, count_filter=models.Filter(must=[
+                models.FieldCondition(key="doc_id", match=models.MatchValue(value=document["doc_id"]))
+            ])).count == 0
+        ]
+        if missing:
+            raise RebuildFailed(f"{len(missing)} page(s) have no points in {name}: {missing[:5]}")
+
+        candidate = await self.hit_rate(name, smoke)
+        live = self.active()
+        baseline = await self.hit_rate(live, smoke) if live else 0.0
+        logger.info(f"Smoke queries: {candidate:.0%} found on {name}, {baseline:.0%} on {live}")
+        if candidate < baseline - self.max_regression:
+            raise RebuildFailed(f"smoke hit rate fell from {baseline:.0%} to {candidate:.0%}")
+
+    async def rebuild(self, docs_dir: Optional[str] = None, smoke: Optional[List[Dict[str, str]]] = None,
+                      switch: bool = True) -> str:
+        from docs_watcher import DocsWatcher, read_document, scan
+
+        watcher = DocsWatcher(docs_dir)
+        files = scan(watcher.docs_dir)
+        documents = [read_document(watcher.docs_dir / relative, watcher.docs_dir) for relative in sorted(files)]
+        smoke = smoke if smoke is not None else smoke_queries(documents)
+
+        start = time.perf_counter()
+        name = self.create_version()
+        try:
+            await self.build(name, documents)
+            await asyncio.to_thread(self.finish_indexing, name)
+            await self.validate(name, documents, smoke)
+        except Exception:
+            self.client.delete_collection(name)
+            shutil.rmtree(self.staging(name), ignore_errors=True)
+            raise
+        logger.info(f"Built and validated {name} in {time.perf_counter() - start:.1f}s")
+        if not switch:
+            logger.info(f"{name} and its staged chunks are kept; `switch {name}` makes them live")
+            return name
+
+        self.switch(name)
+
+        # Pages edited while the build ran go straight into the new live version
+        digests = {document["doc_id"]: _digest(document["content"]) for document in documents}
+        for relative, (mtime_ns, size) in sorted(scan(watcher.docs_dir).items()):
+            document = read_document(watcher.docs_dir / relative, watcher.docs_dir)
+            if digests.get(document["doc_id"]) != _digest(document["content"]):
+                await watcher.reindex(document)
+            watcher.state[relative] = {"mtime_ns": mtime_ns, "size": size,
+                                       "sha1": _digest(document["content"]), "doc_id": document["doc_id"]}
+        watcher._save_state()
+
+        self.gc()
+        return name
+
+
+def _digest(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def smoke_queries(documents: List[Dict[str, Any]], per_document: int = 3) -> List[Dict[str, str]]:
+    """Section headings as queries, each expected to find its own page"""
+    from chunking import scan_headings
+
+    queries = []
+    for document in documents:
+        _, trails = scan_headings(document["content"])
+        headings = [trail[-1] for trail in trails if len(trail) >= 2]
+        queries.extend({"query": heading, "doc_id": document["doc_id"]} for heading in headings[:per_document])
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild", help="build, validate and switch to a new version")
+    rebuild.add_argument("--docs", default=None)
+    rebuild.add_argument("--no-switch", action="store_true", help="build and validate only")
+    rebuild.add_argument("--smoke", default=None, help='JSON list of {"query", "doc_id"} to validate with')
+    commands.add_parser("list", help="show versions and the live one")
+    switch = commands.add_parser("switch", help="point the alias at an existing version")
+    switch.add_argument("name")
+    gc = commands.add_parser("gc", help="delete old versions")
+    gc.add_argument("--keep", type=int, default=None)
+    args = parser.parse_args()
+
+    configure_logging()
+    versions = IndexVersions()
+    if not versions.service.connected:
+        raise SystemExit("Qdrant is not reachable")
+
+    if args.command == "rebuild":
+        from database import init_db
+        init_db()
+        smoke = None
+        if args.smoke:
+            with open(args.smoke, encoding="utf-8") as f:
+                smoke = json.load(f)
+        try:
+            print(asyncio.run(versions.rebuild(args.docs, smoke, switch=not args.no_switch)))
+        except RebuildFailed as e:
+            raise SystemExit(f"Rebuild failed, live version unchanged: {e}")
+    elif args.command == "list":
+        active = versions.active()
+        for name in versions.versions() + ([active] if active == versions.alias else []):
+            print(f"{'*' if name == active else ' '} {name}  {versions.client.count(name).count} points")
+    elif args.command == "switch":
+        versions.switch(args.name)
+    elif args.command == "gc":
+        print(versions.gc(args.keep))
+
+
+if __name__ == "__main__":
+    main()
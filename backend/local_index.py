@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Read-only, memory-mapped vector index that can serve searches without a Qdrant round trip.
+
+Layout of an index directory:
+    vectors-<n>.f32   float32 matrix (count x dim), rows L2-normalised
+    index.json        {"dim", "count", "vectors", "ids", "payloads"}; "vectors" names the matrix file
+
+Build one from the live collection with:
+    python local_index.py build --out ./local_index
+
+The index is a snapshot: rebuild it after re-indexing. A rebuild writes a new matrix file and
+then replaces index.json, so a reader sees either the old index or the new one, never a mix.
+Workers reload it when index.json is replaced, and search hits whose chunks were released since
+are dropped at hydration.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"  # matrix file of indexes written before index.json named its own
+META_FILE = "index.json"
+FILTER_FIELDS = ["section", "doc_id", "heading_path"]
+
+
+@dataclass
+class LocalHit:
+    """Mirrors the attributes of a Qdrant ScoredPoint that search code reads"""
+    id: str
+    score: float
+    payload: Dict[str, Any]
+    vector: Optional[List[float]] = None
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str):
+        self.path = path
+        # Taken before reading, so a rebuild that lands while loading is picked up next time
+        self._stamp = self._meta_stamp()
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.ids: List[str] = meta["ids"]
+        self.payloads: List[Dict[str, Any]] = meta["payloads"]
+        if meta["count"] == 0:
+            # An empty vector file can't be memory-mapped
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        else:
+            # Pages are shared between forked workers through the OS page cache
+            self.vectors = np.memmap(os.path.join(path, meta.get("vectors", VECTORS_FILE)), dtype=np.float32,
+                                     mode="r", shape=(meta["count"], self.dim))
+
+        # Inverted lists per filter field, so filtered searches only score matching rows
+        postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in FILTER_FIELDS}
+        for row, payload in enumerate(self.payloads):
+            for field in FILTER_FIELDS:
+                values = payload.get(field)
+                for value in values if isinstance(values, list) else [values]:
+                    if value is not None:
+                        postings[field].setdefault(value, []).append(row)
+        self._postings = {
+            field: {value: np.asarray(rows, dtype=np.int64) for value, rows in by_value.items()}
+            for field, by_value in postings.items()
+        }
+        logger.info(f"Loaded local vector index with {len(self.ids)} points from {path}")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _meta_stamp(self):
+        try:
+            stat = os.stat(os.path.join(self.path, META_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def rebuilt(self) -> bool:
+        """True once index.json has been replaced since this index was loaded"""
+        return self._meta_stamp() != self._stamp
+
+    def _candidate_rows(self, filters) -> Optional[np.ndarray]:
+        rows = None
+        for field, value in (filters.model_dump().items() if filters is not None else []):
+            if not value:
+                continue
+            matched = self._postings.get(field, {}).get(value, np.empty(0, dtype=np.int64))
+            rows = matched if rows is None else np.intersect1d(rows, matched)
+        return rows
+
+    def search(self, vector: List[float], limit: int, filters=None, with_vectors: bool = False) -> List[LocalHit]:
+        if not self.ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        rows = self._candidate_rows(filters)
+        if rows is None:
+            scores = self.vectors @ query
+            rows = np.arange(len(self.ids))
+        else:
+            scores = self.vectors[rows] @ query
+        if len(rows) == 0:
+            return []
+
+        top = np.argpartition(-scores, min(limit, len(rows)) - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [
+            LocalHit(
+                id=self.ids[rows[i]],
+                score=float(scores[i]),
+                payload=self.payloads[rows[i]],
+                vector=self.vectors[rows[i]].tolist() if with_vectors else None
+            )
+            for i in top
+        ]
+
+    @staticmethod
+    def write(path: str, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        """
+        Write an index directory. The matrix goes to a file of its own and index.json, which names
+        it, is replaced last, so the swap is atomic. The previous matrix is kept for readers that
+        have just read the old index.json; older ones are removed.
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        meta_path = os.path.join(path, META_FILE)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                previous = json.load(f).get("vectors", VECTORS_FILE)
+        except (FileNotFoundError, ValueError):
+            previous = None
+        vectors_file = f"vectors-{time.time_ns()}.f32"
+        tmp_vectors = os.path.join(path, vectors_file + ".tmp")
+        vectors.tofile(tmp_vectors)
+        os.replace(tmp_vectors, os.path.join(path, vectors_file))
+        tmp_meta = meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"dim": int(vectors.shape[1]) if len(vectors) else 0, "count": len(ids),
+                       "vectors": vectors_file, "ids": ids, "payloads": payloads}, f)
+        os.replace(tmp_meta, meta_path)
+
+        for name in os.listdir(path):
+            if name.startswith("vectors") and name.endswith(".f32") and name not in (vectors_file, previous):
+                os.remove(os.path.join(path, name))
+
+
+def build_from_qdrant(out: str, batch_size: int = 1000) -> int:
+    """Scroll the live collection (vectors and payloads) into a local index directory"""
+    from vector_store import qdrant_service
+
+    if not qdrant_service.connected:
+        raise RuntimeError("Qdrant is not connected")
+
+    ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        points, offset = qdrant_service.client.scroll(
+            collection_name=qdrant_service.collection_name, limit=batch_size,
+            offset=offset, with_payload=True, with_vectors=True
+        )
+        for point in points:
+            ids.append(str(point.id))
+            vectors.append(point.vector)
+            payloads.append(point.payload or {})
+        if offset is None:
+            break
+
+    LocalVectorIndex.write(out, ids, np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1), payloads)
+    return len(ids)
+
+
+if __name__ == "__main__":
+    from config import configure_logging
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="export the Qdrant collection to a local index")
+    build.add_argument("--out", default=os.getenv("LOCAL_INDEX_PATH", "./local_index"))
+    args = parser.parse_args()
+
+    count = build_from_qdrant(args.out)
+    print(f"Wrote {count} points to {args.out}")
@@ -1,45 +1,114 @@
 import os
+import asyncio
+import json
 import logging
-from typing import List, Optional, Dict, Any
+import secrets
+from typing import List, Optional, Dict, Any, Literal
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 # Load environment variables locally (Render will use actual env vars)
-from dotenv import load_dotenv
-load_dotenv()
+from config import load_environment, configure_logging
+load_environment()
 
-from database import SessionLocal, Document
-from rag import rag_service
-from vector_store import qdrant_service
+import async_db
+from database import ChatMessage as ChatMessageRecord, init_db
+from rag import rag_service, shape_sources
+from answer_index import answer_index
+from retrieval_policy import adaptive_policy
+from usage import usage_service
+from vector_store import qdrant_service, SearchFilters
 from translation_service import translation_service
+from gemini_service import gemini_service
+from openrouter import openrouter_service
+from warmup import warmup_service
+from chunking import section_spans, chunk_metadata
 
 # ===================== LOGGING =====================
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # ===================== APP LIFESPAN =====================
+STARTUP_PROBE_TIMEOUT = float(os.getenv("STARTUP_PROBE_TIMEOUT", "5"))
+
+async def _init_database() -> bool:
+    try:
+        await asyncio.to_thread(init_db)
+        return True
+    except Exception as e:
+        logger.error(f"Database initialization failed: {e}")
+        return False
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting RAG Chatbot API...")
 
-    if not qdrant_service.connected:
+    # Probe backing services concurrently instead of at import time; a slow or
+    # unreachable service delays boot by at most STARTUP_PROBE_TIMEOUT
+    probes = asyncio.gather(qdrant_service.probe(), _init_database())
+    try:
+        qdrant_ok, db_ok = await asyncio.wait_for(probes, timeout=STARTUP_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ Startup probes did not finish within {STARTUP_PROBE_TIMEOUT}s; continuing in degraded mode")
+        qdrant_ok, db_ok = False, False
+
+    if not qdrant_ok:
         logger.warning("⚠️ Qdrant vector database is not connected. RAG functionality will be limited.")
     else:
         logger.info("✅ Successfully connected to Qdrant vector database")
+    if not db_ok:
+        logger.warning("⚠️ Database is not initialized")
+
+    if warmup_service.enabled:
+        # Connections, lazily loaded state and caches are warmed in the background;
+        # /health/ready reports when the instance is hot
+        preload = asyncio.create_task(warmup_service.run())
+    else:
+        # The Gemini SDK import is the slowest left; load it off the boot path
+        preload = asyncio.create_task(asyncio.to_thread(lambda: gemini_service.available))
+
+    # Token usage is aggregated in memory and written to the database in batches
+    usage_service.start()
 
     yield
+    preload.cancel()
+    await usage_service.stop()
+    await openrouter_service.close()
+    await async_db.dispose()
     logger.info("🛑 Shutting down RAG Chatbot API...")
 
 # ===================== FASTAPI APP =====================
+try:
+    # orjson serializes responses several times faster than the json module
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
 app = FastAPI(
     title="RAG Chatbot API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=DefaultResponse
 )
 
+# ===================== COMPRESSION =====================
+# Responses above the threshold are compressed for clients that accept it: Brotli when
+# brotli-asgi is installed (gzip for clients without br), gzip otherwise
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, quality=int(os.getenv("BROTLI_QUALITY", "4")),
+                       minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE,
+                       compresslevel=int(os.getenv("GZIP_LEVEL", "6")))
+
 # ===================== CORS =====================
 app.add_middleware(
     CORSMiddleware,
@@ -54,12 +123,22 @@ class ChatMessage(BaseModel):
     message: str
     chat_history: Optional[List[Dict[str, str]]] = []
     selected_text: Optional[str] = None
-    target_language: Optional[str] = "en"
+    target_language: Optional[str] = None  # None: the language the question is written in
+    filters: Optional[SearchFilters] = None  # restrict retrieval to a section / doc / heading path
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
     sources: List[Dict[str, Any]]
     tokens_used: int
+    citations: List[Dict[str, Any]] = []
+
+class PrefetchRequest(BaseModel):
+    selected_text: str
+    filters: Optional[SearchFilters] = None
+
+class PrefetchResponse(BaseModel):
+    scheduled: bool
 
 class DocumentIndexRequest(BaseModel):
     content: str
@@ -94,28 +173,82 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving"""
     return {
         "status": "healthy",
+        "ready": warmup_service.ready,
         "qdrant_connected": qdrant_service.connected
     }
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: 503 until the boot warm-up (warmup.py) has finished, then its per-step report"""
+    return DefaultResponse(warmup_service.report(), status_code=200 if warmup_service.ready else 503)
+
+@app.get("/admin/usage")
+async def admin_usage(days: int = 7, x_admin_key: Optional[str] = Header(None)):
+    """Token and cost totals per day, provider, model and purpose (requires ADMIN_API_KEY)"""
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key or not x_admin_key or not secrets.compare_digest(x_admin_key, admin_key):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return await asyncio.to_thread(usage_service.summary, days)
+
+async def _log_exchange(session_id: str, question: str, answer: str, sources: List[Dict[str, Any]]):
+    """Record the exchange in chat_messages; answer_index.py mines frequent questions from it"""
+    try:
+        async with async_db.session_factory()() as db:
+            db.add(ChatMessageRecord(session_id=session_id, role="user", content=question))
+            db.add(ChatMessageRecord(
+                session_id=session_id, role="assistant", content=answer,
+                sources=json.dumps([source.get("doc_id") for source in sources])
+            ))
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Could not log chat exchange: {e}")
+
+@app.get("/stats")
+async def stats():
+    """Per-branch request counts, token savings and latency of the adaptive retrieval policy"""
+    return {"adaptive_policy": adaptive_policy.stats()}
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(payload: ChatMessage):
+async def chat_endpoint(payload: ChatMessage, background_tasks: BackgroundTasks,
+                        sources: Literal["compact", "full", "none"] = "compact"):
+    """`sources`: compact (IDs, score and metadata; the default), full (with chunk text) or none"""
     try:
         result = await rag_service.query(
             query=payload.message,
             selected_context=payload.selected_text,
-            target_language=payload.target_language
+            target_language=payload.target_language,
+            filters=payload.filters
+        )
+        background_tasks.add_task(
+            _log_exchange, payload.session_id or "anonymous", payload.message, result.response, result.sources
         )
         return ChatResponse(
             response=result.response,
-            sources=result.sources,
-            tokens_used=result.tokens_used
+            sources=shape_sources(result.sources, sources),
+            tokens_used=result.tokens_used,
+            citations=result.citations
         )
     except Exception as e:
         logger.exception("Chat endpoint failed")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+async def _run_prefetch(selected_text: str, filters: Optional[SearchFilters]):
+    try:
+        await rag_service.prefetch(selected_text, filters)
+    except Exception:
+        logger.exception("Prefetch failed")
+
+@app.post("/prefetch", response_model=PrefetchResponse, status_code=202)
+async def prefetch_endpoint(payload: PrefetchRequest, background_tasks: BackgroundTasks):
+    """Called by the frontend when text is highlighted, so the follow-up /chat finds its search by the selection cached"""
+    if not payload.selected_text.strip():
+        return PrefetchResponse(scheduled=False)
+    background_tasks.add_task(_run_prefetch, payload.selected_text, payload.filters)
+    return PrefetchResponse(scheduled=True)
+
 @app.post("/translate", response_model=TranslationResponse)
 async def translate_endpoint(request: TranslationRequest):
     try:
@@ -130,34 +263,25 @@ async def translate_endpoint(request: TranslationRequest):
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 @app.post("/index-document", response_model=DocumentIndexResponse)
-async def index_document_endpoint(request: DocumentIndexRequest):
+async def index_document_endpoint(request: DocumentIndexRequest, db=Depends(async_db.get_db)):
     try:
-        chunks = chunk_document(request.content)
-        db = SessionLocal()
-        try:
-            existing_doc = db.query(Document).filter(Document.doc_id == request.doc_id).first()
-            if existing_doc:
-                existing_doc.title = request.doc_title
-                existing_doc.content = request.content
-                existing_doc.section = request.doc_section or "unknown"
-                existing_doc.is_indexed = True
-            else:
-                document = Document(
-                    doc_id=request.doc_id,
-                    title=request.doc_title,
-                    content=request.content,
-                    section=request.doc_section or "unknown",
-                    is_indexed=True
-                )
-                db.add(document)
-            db.commit()
-        finally:
-            db.close()
+        spans = section_spans(request.content)
+        chunks = [request.content[start:end] for start, end in spans]
+        # Committed before embedding so the row exists even if indexing fails part-way
+        await async_db.upsert_document(db, request.doc_id, request.doc_title, request.content,
+                                       request.doc_section or "unknown")
+        await db.commit()
 
         if chunks and qdrant_service.connected:
             doc_ids = [request.doc_id] * len(chunks)
-            metadata_list = [{"section": request.doc_section or "unknown", "title": request.doc_title} for _ in chunks]
-            vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list)
+            metadata_list = chunk_metadata(
+                request.content, spans,
+                section=request.doc_section or "unknown",
+                title=request.doc_title
+            )
+            vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list, replace=True)
+            # Precomputed answers citing the old text are retired until `answer_index.py refresh`
+            answer_index.invalidate_docs([request.doc_id])
         else:
             vector_ids = []
 
@@ -166,30 +290,6 @@ async def index_document_endpoint(request: DocumentIndexRequest):
         logger.exception("Document indexing failed")
         raise HTTPException(status_code=500, detail=f"Document indexing failed: {str(e)}")
 
-# ===================== UTIL =====================
-def chunk_document(content: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
-    if not content:
-        return []
-
-    chunks = []
-    start = 0
-    length = len(content)
-    max_chunks = len(content) // 100
-    chunk_count = 0
-
-    while start < length and chunk_count < max_chunks:
-        end = min(start + chunk_size, length)
-        chunk = content[start:end]
-        if chunk.strip():
-            chunks.append(chunk)
-            chunk_count += 1
-        start = end - overlap
-        if start <= 0:
-            start += chunk_size
-        if start >= length:
-            break
-    return chunks
-
 # ===================== RUN ON RENDER =====================
 if __name__ == "__main__":
     import uvicorn
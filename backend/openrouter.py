@@ -1,15 +1,16 @@
+import asyncio
 import os
 import logging
 import httpx
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
+from config import load_environment
+from usage import usage_service
+
 # Load environment variables from .env file
-from dotenv import load_dotenv
-load_dotenv()
+load_environment()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ChatCompletionRequest(BaseModel):
@@ -21,6 +22,9 @@ class ChatCompletionRequest(BaseModel):
 class ChatCompletionResponse(BaseModel):
     response: str
     tokens_used: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    finish_reason: Optional[str] = None
 
 class OpenRouterService:
     def __init__(self):
@@ -30,13 +34,44 @@ class OpenRouterService:
 
         self.base_url = "https://openrouter.ai/api/v1"
         self.timeout = httpx.Timeout(30.0)  # 30 second timeout
+        # One pooled client per process: completions reuse warm TLS connections instead of
+        # opening one each. Idle connections are kept long enough to outlast gaps between requests
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("OPENROUTER_KEEPALIVE", "60"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the event loop that opened them (scripts may run several)
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._client_loop = loop
+        return self._client
+
+    async def warm(self) -> bool:
+        """Open a pooled connection to the API ahead of the first completion"""
+        if not self.api_key:
+            return False
+        await self.client.head(self.base_url)
+        return True
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def get_chat_completion(self, messages: List[Dict[str, str]],
                                   model: str = None,
                                   temperature: float = 0.7,
-                                  max_tokens: int = 1024) -> ChatCompletionResponse:
+                                  max_tokens: int = 1024,
+                                  purpose: str = "chat") -> ChatCompletionResponse:
         """
-        Get chat completion from OpenRouter API
+        Get chat completion from OpenRouter API.
+        Raises usage.BudgetExceeded when the request or daily token limit leaves no room for the call.
         """
         # Check if API key is available
         if not self.api_key:
@@ -47,9 +82,12 @@ class OpenRouterService:
                 tokens_used=0
             )
 
+        route = usage_service.route("openrouter", messages, max_tokens)
+        max_tokens = route.max_tokens
+
         try:
             if not model:
-                model = os.getenv("OPENROUTER_MODEL", "openai/gpt-3.5-turbo")
+                model = route.model or os.getenv("OPENROUTER_MODEL", "openai/gpt-3.5-turbo")
 
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -63,30 +101,40 @@ class OpenRouterService:
                 "max_tokens": max_tokens
             }
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data
+            )
 
-                if response.status_code != 200:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                    # Return a mock response as fallback
-                    return ChatCompletionResponse(
-                        response="I'm the AI assistant. There was an issue with the OpenRouter API. Please try again later.",
-                        tokens_used=0
-                    )
+            if response.status_code != 200:
+                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                # Return a mock response as fallback
+                return ChatCompletionResponse(
+                    response="I'm the AI assistant. There was an issue with the OpenRouter API. Please try again later.",
+                    tokens_used=0
+                )
 
-                result = response.json()
+            result = response.json()
 
-                content = result["choices"][0]["message"]["content"]
-                tokens_used = result.get("usage", {}).get("total_tokens", 0)
+            content = result["choices"][0]["message"]["content"]
+            usage = result.get("usage") or {}
+            event = usage_service.record(
+                "openrouter", model, messages, content,
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                purpose=purpose
+            )
 
-            logger.info(f"Chat completion generated, tokens used: {tokens_used}")
+            logger.info(f"Chat completion generated with {model}, tokens used: {event.total_tokens} "
+                        f"(prompt {event.prompt_tokens}, completion {event.completion_tokens}, "
+                        f"max_tokens {max_tokens}; {route.reason})")
             return ChatCompletionResponse(
                 response=content,
-                tokens_used=tokens_used
+                tokens_used=event.total_tokens,
+                prompt_tokens=event.prompt_tokens,
+                completion_tokens=event.completion_tokens,
+                finish_reason=result["choices"][0].get("finish_reason")
             )
 
         except Exception as e:
@@ -0,0 +1,177 @@
+"""
+Prompt construction for RAG answers and translations.
+
+Every request starts with the same byte-identical system message, and everything that varies
+(context, question) comes after it. That lets providers with prefix caching (OpenAI, Gemini,
+DeepSeek through OpenRouter) reuse the cached prefix; with PROMPT_CACHE_CONTROL=true the
+prefix also carries an explicit cache breakpoint for providers that need one (Anthropic).
+
+Retrieved context is compressed before it is budgeted: frontmatter, markdown markup and
+redundant whitespace cost tokens without telling the model anything.
+"""
+import functools
+import math
+import os
+import re
+from typing import List, Dict, Any, Optional
+
+from tokens import count_tokens
+
+RAG_SYSTEM_PROMPT = (
+    "You are an expert assistant for the 'Physical AI & Humanoid Robotics' book. "
+    "Answer ONLY from the numbered book excerpts in the user message. "
+    "If they do not contain the answer, say that the information is not available in the book. "
+    "Never add information that is not in the excerpts or make anything up. "
+    "Cite the sections you use and be precise."
+)
+
+TRANSLATION_SYSTEM_PROMPT = (
+    "You are a professional translator. Accurately translate between English and Urdu. "
+    "Only return the translated text without any additional commentary."
+)
+
+# Completion budgets by question type: definitions are short, walkthroughs and comparisons long
+_QUERY_TYPES = [
+    ("walkthrough", re.compile(r"\b(steps?|how (do|can|to) i|set ?up|install|configure|implement|code|example|write)\b"), 1024),
+    ("comparison", re.compile(r"\b(compare|comparison|difference|differ|versus|vs\.?|pros|cons|advantages)\b"), 768),
+    ("list", re.compile(r"\b(list|which|what are|types of|kinds of|examples of)\b"), 640),
+    ("explanation", re.compile(r"\b(why|how|explain|describe)\b"), 512),
+    ("definition", re.compile(r"\b(what is|what's|define|definition|meaning|who)\b"), 256),
+]
+DEFAULT_COMPLETION_TOKENS = 512
+
+_FRONTMATTER = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_HTML_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_ADMONITION = re.compile(r"^:::\s*\w*.*$", re.MULTILINE)
+_HEADING = re.compile(r"^#{1,6}\s+", re.MULTILINE)
+_EMPHASIS = re.compile(r"(\*\*|__|~~)(.+?)\1")
+_TABLE_RULE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$", re.MULTILINE)
+_HORIZONTAL_RULE = re.compile(r"^\s*([-*_])\s*(\1\s*){2,}$", re.MULTILINE)
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def _compress_prose(text: str) -> str:
+    text = _HTML_COMMENT.sub("", text)
+    text = _IMAGE.sub(lambda m: m.group(1), text)
+    text = _LINK.sub(lambda m: m.group(1), text)
+    text = _HTML_TAG.sub("", text)
+    text = _ADMONITION.sub("", text)
+    text = _TABLE_RULE.sub("", text)
+    text = _HORIZONTAL_RULE.sub("", text)
+    text = _HEADING.sub("", text)
+    text = _EMPHASIS.sub(lambda m: m.group(2), text)
+    text = _SPACES.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n", text).strip()
+
+
+def compress_context(text: str) -> str:
+    """Strip markup that costs tokens without carrying content; fenced code is kept verbatim"""
+    segments = _FRONTMATTER.sub("", text.lstrip()).split("```")
+    parts = []
+    for i, segment in enumerate(segments):
+        if i % 2:
+            # Between fences; a chunk may end inside a block that is never closed
+            parts.append("```" + segment + ("```" if i + 1 < len(segments) else ""))
+        else:
+            prose = _compress_prose(segment)
+            if prose:
+                parts.append(prose)
+    return "\n".join(parts)
+
+
+def query_type(query: str) -> str:
+    lowered = query.lower()
+    for name, pattern, _ in _QUERY_TYPES:
+        if pattern.search(lowered):
+            return name
+    return "other"
+
+
+def completion_budget(query: str, cap: int = 1024, selected_context: Optional[str] = None) -> int:
+    """
+    max_tokens for an answer, from the kind of question asked and the input it is about: long or
+    multi-part questions and explanations of selected text get up to twice the type's budget.
+    Retrieved excerpts are not counted; they bound what the answer can say, not its length.
+    """
+    budgets = {name: budget for name, _, budget in _QUERY_TYPES}
+    budget = budgets.get(query_type(query), DEFAULT_COMPLETION_TOKENS)
+    extra = 4 * max(0, count_tokens(query) - 32) + count_tokens(selected_context or "") // 4
+    return min(cap, budget + min(budget, extra))
+
+
+def translation_budget(text: str, source_lang: str, target_lang: str) -> int:
+    """max_tokens for a translation: Urdu needs roughly twice the tokens of the same English text"""
+    ratio = 2.2 if target_lang == "ur" and source_lang != "ur" else 1.2
+    limit = int(os.getenv("TRANSLATION_MAX_TOKENS", "4096"))
+    return min(limit, max(64, math.ceil(count_tokens(text) * ratio) + 32))
+
+
+@functools.lru_cache(maxsize=None)
+def _system_message(content: str, cache_control: bool) -> Dict[str, Any]:
+    if cache_control:
+        return {"role": "system",
+                "content": [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]}
+    return {"role": "system", "content": content}
+
+
+def system_message(content: str) -> Dict[str, Any]:
+    """The static prefix, built once per process so every request sends identical bytes"""
+    return _system_message(content, os.getenv("PROMPT_CACHE_CONTROL", "false").lower() == "true")
+
+
+def build_context(context_docs: List[Dict[str, Any]], selected_context: Optional[str],
+                  max_context_length: int) -> str:
+    """Selected text first, then numbered, compressed excerpts up to max_context_length characters"""
+    parts, total = [], 0
+    if selected_context:
+        selected = compress_context(selected_context)
+        parts.append(f"SELECTED TEXT:\n{selected}")
+        total += len(selected)
+
+    for number, doc in enumerate(context_docs, start=1):
+        text = compress_context(doc.get("text", ""))
+        if not text:
+            continue
+        remaining = max_context_length - total
+        if remaining <= 0:
+            break
+        part = f"[{number}] {text[:remaining]}"
+        parts.append(part)
+        total += len(part)
+
+    return "\n\n".join(parts)
+
+
+def build_rag_messages(query: str, context_docs: List[Dict[str, Any]], selected_context: Optional[str] = None,
+                       max_context_length: int = 4096) -> List[Dict[str, Any]]:
+    context = build_context(context_docs, selected_context, max_context_length)
+    return [
+        system_message(RAG_SYSTEM_PROMPT),
+        {
+            "role": "user",
+            "content": f"BOOK EXCERPTS:\n{context or 'NO RELEVANT CONTENT FOUND IN THE BOOK.'}\n\nQUESTION: {query}"
+        }
+    ]
+
+
+def build_translation_messages(text: str, source_name: str, target_name: str) -> List[Dict[str, Any]]:
+    return [
+        system_message(TRANSLATION_SYSTEM_PROMPT),
+        {"role": "user", "content": f"Translate this {source_name} text to {target_name}:\n\n{text}"}
+    ]
+
+
+def prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Local estimate of the prompt size, for logging when the provider doesn't report usage"""
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content)
+        total += count_tokens(content) + 4  # role and message framing
+    return total
@@ -0,0 +1,132 @@
+import logging
+import os
+import re
+from typing import List, Dict, Any
+
+from cache import get_cache, make_key
+from reranker import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Book terms that appear both spelled out and abbreviated
+SYNONYMS = {
+    "ros": "robot operating system",
+    "ros 2": "robot operating system 2",
+    "vla": "vision language action",
+    "llm": "large language model",
+    "llms": "large language models",
+    "sim": "simulation",
+    "urdf": "unified robot description format",
+    "slam": "simultaneous localization and mapping",
+    "rl": "reinforcement learning",
+    "hri": "human robot interaction",
+    "dof": "degrees of freedom",
+    "imu": "inertial measurement unit",
+    "physical ai": "embodied intelligence",
+    "digital twin": "simulated environment",
+}
+_REVERSE = {expansion: term for term, expansion in SYNONYMS.items()}
+_DEFINITION = re.compile(r"^\s*(what|who)\s+(is|are)\s+(an?\s+|the\s+)?(?P<subject>.+?)\s*\??\s*$", re.IGNORECASE)
+
+
+def _swap_terms(query: str) -> str:
+    """Spell out abbreviations and abbreviate spelled-out terms (longest match first)"""
+    lowered = f" {query.lower().rstrip('?')} "
+    for table in (SYNONYMS, _REVERSE):
+        for term in sorted(table, key=len, reverse=True):
+            if f" {term} " in lowered:
+                return lowered.replace(f" {term} ", f" {table[term]} ", 1).strip()
+    return lowered.strip()
+
+
+def heuristic_variants(query: str) -> List[str]:
+    """Cheap local rewrites: abbreviation swaps, a keyword-only form and a statement form"""
+    variants = [_swap_terms(query), " ".join(tokenize(query))]
+    match = _DEFINITION.match(query)
+    if match:
+        # Definitions in the book read "X is ...", closer to that than to the question
+        variants.append(f"{match.group('subject')} is")
+    return variants
+
+
+def fuse(result_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Reciprocal rank fusion: each hit scores sum(1 / (k + rank)) over the lists it appears in.
+    Fused hits keep their best vector score under "score" and carry "rrf_score".
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            key = hit.get("id") or hit.get("text")
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**hit, "rrf_score": 0.0}
+            entry["rrf_score"] += 1.0 / (k + rank)
+            entry["score"] = max(entry.get("score", 0.0), hit.get("score", 0.0))
+    return sorted(fused.values(), key=lambda hit: hit["rrf_score"], reverse=True)
+
+
+class QueryExpansionService:
+    """
+    Optional multi-query retrieval: the question plus a few rewrites are embedded in one batch,
+    searched in one batch round trip and fused by rank.
+
+    QUERY_EXPANSION_MODE=heuristic rewrites locally; =llm asks the LLM for paraphrases with one
+    short completion (cached per question), falling back to the heuristic when that fails.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("QUERY_EXPANSION_ENABLED", "false").lower() == "true"
+        self.mode = os.getenv("QUERY_EXPANSION_MODE", "heuristic")
+        self.max_variants = int(os.getenv("QUERY_EXPANSION_VARIANTS", "3"))
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+
+    async def expand(self, query: str) -> List[str]:
+        """The query followed by up to max_variants distinct rewrites"""
+        variants = await self._llm_variants(query) if self.mode == "llm" else []
+        if not variants:
+            variants = heuristic_variants(query)
+
+        queries, seen = [query], {query.lower().strip(" ?")}
+        for variant in variants:
+            normalized = variant.lower().strip(" ?")
+            if normalized and normalized not in seen and len(queries) <= self.max_variants:
+                seen.add(normalized)
+                queries.append(variant)
+        return queries
+
+    async def _llm_variants(self, query: str) -> List[str]:
+        cache = get_cache("expansions")
+        key = make_key("expansion", query)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        from openrouter import openrouter_service
+
+        messages = [
+            {"role": "system", "content": "Rewrite search queries for a robotics textbook. Reply with one rewrite per line, nothing else."},
+            {"role": "user", "content": f"Give {self.max_variants} short rewrites of this question using different wording or keywords:\n{query}"},
+        ]
+        try:
+            completion = await openrouter_service.get_chat_completion(
+                messages, temperature=0.3, max_tokens=24 * self.max_variants, purpose="expansion"
+            )
+        except Exception as e:
+            logger.warning(f"Query expansion call failed: {e}")
+            return []
+        if completion.tokens_used == 0:  # mock/fallback text, not rewrites
+            return []
+
+        variants = [re.sub(r"^\s*(\d+[.)]|[-*])\s*", "", line).strip()
+                    for line in completion.response.splitlines()]
+        variants = [variant for variant in variants if variant][:self.max_variants]
+        cache.set(key, variants)
+        return variants
+
+    def fuse(self, result_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return fuse(result_lists, self.rrf_k)
+
+
+# Singleton instance
+query_expansion_service = QueryExpansionService()
@@ -0,0 +1,211 @@
+"""
+Query normalization in front of retrieval, so near-duplicate questions share cache entries.
+
+"What is Physical AI?", "what is physcial ai" and "physical ai??" all become "what is
+physical ai" before anything is embedded or looked up: Unicode NFKC, Urdu letter variants and
+diacritics folded, case folded, punctuation stripped, whitespace collapsed, and words missing
+from the book's vocabulary corrected to the closest frequent word in it.
+
+Spelling correction is a symmetric-delete lookup (as in SymSpell): every word of the vocabulary
+is stored under each string obtained by deleting up to `max_distance` characters from its
+prefix, so a misspelling only has to generate its own deletes and check them against a dict;
+no distance is computed against words that don't share a delete. The vocabulary is mined from
+the chunk store, built on first use and rebuilt when the indexed chunks change.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from chunk_store import chunk_store
+
+logger = logging.getLogger(__name__)
+
+# Arabic-script letters typed in place of their Urdu forms, and digits in either numeral set
+_FOLD = str.maketrans({
+    "\u064a": "\u06cc",  # Arabic yeh -> Farsi/Urdu yeh
+    "\u0649": "\u06cc",  # alef maksura -> Farsi/Urdu yeh
+    "\u0643": "\u06a9",  # Arabic kaf -> keheh
+    "\u0647": "\u06c1",  # Arabic heh -> heh goal
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06f0 + i): str(i) for i in range(10)},
+})
+# Harakat, superscript alef and tatweel; zero-width space, (non-)joiners and BOM
+_IGNORED = re.compile("[\u064b-\u065f\u0670\u0640\u200b-\u200d\ufeff]")
+# Punctuation, Urdu ؟ ۔ ، included; + and # are kept for C++ and C#
+_PUNCTUATION = re.compile(r"[^\w\s+#]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Question words a textbook rarely uses often enough to be in its vocabulary
+QUESTION_WORDS = frozenset(
+    "what which when where who whom whose why how does explain describe define difference between "
+    "compare example examples meaning mean tell give list show work works please".split()
+)
+
+
+def fold(text: str) -> str:
+    """Unicode-, case-, punctuation- and whitespace-insensitive form of the text"""
+    text = unicodedata.normalize("NFKC", text).translate(_FOLD)
+    text = _IGNORED.sub("", text).casefold()
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count once), or limit + 1 beyond it"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and cost and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """Every string obtained by deleting up to `distance` characters from the word"""
+    found, frontier = set(), {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+class SpellIndex:
+    """Symmetric-delete index over a word -> frequency vocabulary"""
+
+    def __init__(self, frequencies: Dict[str, int], max_distance: int = 2, prefix_length: int = 7,
+                 min_frequency: int = 1):
+        self.frequencies = frequencies
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Most keys belong to a single word, held as the word itself rather than a one-item list
+        self._deletes: Dict[str, Union[str, List[str]]] = {}
+        for word, count in frequencies.items():
+            if count < min_frequency or not word.isalpha():
+                continue
+            prefix = word[:prefix_length]
+            for key in deletes(prefix, max_distance) | {prefix}:
+                words = self._deletes.get(key)
+                if words is None:
+                    self._deletes[key] = word
+                elif isinstance(words, str):
+                    self._deletes[key] = [words, word]
+                else:
+                    words.append(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.frequencies
+
+    def correct(self, word: str, max_distance: int) -> Optional[str]:
+        """Closest vocabulary word within max_distance (most frequent on ties), or None"""
+        max_distance = min(max_distance, self.max_distance)
+        prefix = word[:self.prefix_length]
+        best, best_key = None, None
+        seen = set()
+        for key in deletes(prefix, max_distance) | {prefix}:
+            words = self._deletes.get(key, ())
+            for candidate in (words,) if isinstance(words, str) else words:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                rank = (distance, -self.frequencies[candidate])
+                if best_key is None or rank < best_key:
+                    best, best_key = candidate, rank
+        return best
+
+
+def mine_vocabulary(texts: Iterable[str]) -> Dict[str, int]:
+    """Frequency of every folded word in the texts"""
+    counts = Counter()
+    for text in texts:
+        counts.update(fold(text).split())
+    return dict(counts)
+
+
+class QueryNormalizer:
+    def __init__(self, store=None):
+        self.store = store or chunk_store
+        self.enabled = os.getenv("QUERY_NORMALIZATION_ENABLED", "true").lower() == "true"
+        self.spelling = os.getenv("SPELL_CORRECTION_ENABLED", "true").lower() == "true"
+        self.max_distance = int(os.getenv("SPELL_MAX_DISTANCE", "2"))
+        # Shorter words have too many neighbours one edit away to be corrected safely
+        self.min_length = int(os.getenv("SPELL_MIN_LENGTH", "4"))
+        # Words seen fewer times in the book are known, but never suggested (raise it for
+        # sources with typos of their own)
+        self.min_frequency = int(os.getenv("SPELL_MIN_FREQUENCY", "1"))
+        # How often the chunk count is compared to the one the vocabulary was built from
+        self.check_interval = float(os.getenv("SPELL_VOCABULARY_CHECK_INTERVAL", "60"))
+        self._index: Optional[SpellIndex] = None
+        self._built_from = -1
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Rebuild the vocabulary on next use (call after indexing)"""
+        self._index = None
+
+    def index(self) -> Optional[SpellIndex]:
+        """The spelling index, (re)built from the chunk store when missing or out of date"""
+        if not self.spelling:
+            return None
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked_at = now
+            count = self.store.count()
+            if self._index is None or count != self._built_from:
+                started = time.perf_counter()
+                frequencies = mine_vocabulary(self.store.texts())
+                frequencies.update({word: frequencies.get(word, 0) + self.min_frequency for word in QUESTION_WORDS})
+                self._index = SpellIndex(frequencies, self.max_distance, min_frequency=self.min_frequency)
+                self._built_from = count
+                logger.info(f"Spelling vocabulary of {len(frequencies)} words built from {count} chunks "
+                            f"in {time.perf_counter() - started:.2f}s")
+            return self._index
+
+    def correct(self, text: str) -> str:
+        """Folded text with unknown words replaced by their closest vocabulary word"""
+        index = self.index()
+        if index is None or not index.frequencies:
+            return text
+        words = text.split()
+        for i, word in enumerate(words):
+            if len(word) < self.min_length or word in index or not word.isalpha():
+                continue
+            # One edit for short words, more for longer ones
+            corrected = index.correct(word, 1 if len(word) < 8 else self.max_distance)
+            if corrected:
+                words[i] = corrected
+        return " ".join(words)
+
+    def normalize_sync(self, query: str) -> str:
+        if not self.enabled:
+            return query
+        return self.correct(fold(query)) or query
+
+    async def normalize(self, query: str) -> str:
+        """The form of the query used for retrieval and every cache keyed on it"""
+        if self.enabled and self.spelling and (
+                self._index is None or time.monotonic() - self._checked_at >= self.check_interval):
+            # Mining the vocabulary reads every chunk; keep it off the event loop
+            await asyncio.to_thread(self.index)
+        return self.normalize_sync(query)
+
+
+# Singleton instance
+query_normalizer = QueryNormalizer()
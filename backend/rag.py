@@ -1,15 +1,24 @@
 import asyncio
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from vector_store import qdrant_service
+from vector_store import qdrant_service, SearchFilters
 from openrouter import openrouter_service
-from database import SessionLocal, Document
 from translation_service import translation_service
+from reranker import rerank_service
+from diversity import diversity_service
+from query_expansion import query_expansion_service
+from cache import get_cache, make_key
+from answer_index import answer_index
+from query_normalizer import query_normalizer
+from cross_lingual import cross_lingual_service, script_language
+from attribution import attribution_service
+from retrieval_policy import adaptive_policy, NO_MATCH
+from usage import usage_service, BudgetExceeded
+from prompts import build_rag_messages, completion_budget, prompt_tokens, query_type
 import os
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class RAGRequest(BaseModel):
@@ -22,120 +31,165 @@ class RAGResponse(BaseModel):
     response: str
     sources: List[Dict[str, Any]]
     tokens_used: int
+    # Sentence-level attribution of the answer, see attribution.py
+    citations: List[Dict[str, Any]] = []
+
+
+def compact_sources(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sources as served: IDs, score and metadata, without the chunk text the citations point into"""
+    return [{k: v for k, v in source.items() if k not in ("text", "vector")} for source in sources]
+
+
+def shape_sources(sources: List[Dict[str, Any]], mode: str = "compact") -> List[Dict[str, Any]]:
+    """Sources for a response in the given mode: compact (no chunk text), full (with it) or none"""
+    if mode == "none":
+        return []
+    if mode == "full":
+        return [{k: v for k, v in source.items() if k != "vector"} for source in sources]
+    return compact_sources(sources)
+
+# Returned without a completion when nothing in the book matches the question
+NOT_IN_BOOK_RESPONSES = {
+    "en": "I couldn't find information about this in the 'Physical AI & Humanoid Robotics' book. "
+          "Try rephrasing your question or asking about a topic the book covers.",
+    "ur": "مجھے 'Physical AI & Humanoid Robotics' کتاب میں اس بارے میں معلومات نہیں ملیں۔ "
+          "اپنا سوال دوسرے الفاظ میں پوچھیں یا کتاب میں شامل کسی موضوع کے بارے میں پوچھیں۔",
+}
+
+
+def truncated(completion, max_tokens: int) -> bool:
+    """Whether a completion stopped at its token limit rather than at the end of the answer"""
+    if completion.finish_reason is not None:
+        return completion.finish_reason.lower() in ("length", "max_tokens")
+    return completion.completion_tokens >= max_tokens
+
 
 class RAGService:
     def __init__(self):
         self.max_sources = int(os.getenv("MAX_SOURCES", "5"))
         self.max_context_length = int(os.getenv("MAX_CONTEXT_LENGTH", "4096"))  # Increased for better context
+        self.retrieval_cache_ttl = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+
+    @staticmethod
+    def _retrieval_key(query: str, limit: int, filters: Optional[SearchFilters]) -> str:
+        return make_key(query, limit, filters.model_dump() if filters else None)
 
-    async def retrieve_context(self, query: str, limit: int = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _selection_query(selected_context: str) -> str:
+        # Embedding more than about a chunk of highlighted text adds cost, not recall
+        return selected_context.strip()[:1000]
+
+    async def prefetch(self, selected_context: str, filters: Optional[SearchFilters] = None) -> int:
+        """
+        Speculatively retrieve context around highlighted text before the question is typed.
+        query() runs the same search by the selection, which then comes from the retrieval cache;
+        the context is the same either way, a prefetch only takes the search off the critical path.
+        """
+        context_docs = await self.retrieve_context(self._selection_query(selected_context), filters=filters)
+        logger.info(f"Prefetched {len(context_docs)} context documents for selected text")
+        return len(context_docs)
+
+    async def retrieve_context(self, query: str, limit: int = None,
+                               filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
         """
-        Retrieve relevant context from the vector store based on the query
+        Retrieve relevant context from the vector store based on the query,
+        optionally restricted to a section, document or heading path
         """
         if limit is None:
             limit = self.max_sources
 
         try:
             # Check if qdrant service is connected before attempting to search
-            if not qdrant_service.connected:
+            if not qdrant_service.can_search:
                 logger.warning("Qdrant not connected. Returning empty context.")
                 return []
 
-            # Search for similar documents in the vector store
-            search_results = await qdrant_service.search_similar(query, limit=limit)
+            cache = get_cache("retrieval")
+            cache_key = self._retrieval_key(query, limit, filters)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Retrieved {len(cached)} context documents from cache")
+                return cached
+
+            # Search for similar documents in the vector store, over-fetching when rerank / MMR stages follow
+            candidates = max(rerank_service.candidate_limit(limit), diversity_service.candidate_limit(limit))
+            if query_expansion_service.enabled:
+                # The question and its rewrites go out as one embedding batch and one batch search,
+                # so expansion costs one round trip rather than one per variant
+                queries = await query_expansion_service.expand(query)
+                result_lists = await qdrant_service.search_similar_batch(
+                    queries, limit=candidates, filters=filters, with_vectors=diversity_service.enabled
+                )
+                search_results = query_expansion_service.fuse(result_lists)[:candidates]
+                logger.info(f"Retrieved {len(search_results)} context documents for {len(queries)} query variants")
+            else:
+                search_results = await qdrant_service.search_similar(
+                    query, limit=candidates, filters=filters, with_vectors=diversity_service.enabled
+                )
+                logger.info(f"Retrieved {len(search_results)} context documents")
 
-            logger.info(f"Retrieved {len(search_results)} context documents")
+                # Sort results by score to prioritize most relevant content
+                search_results.sort(key=lambda x: x.get('score', 0), reverse=True)
+            search_results = await rerank_service.rerank(query, search_results, diversity_service.candidate_limit(limit))
 
-            # Sort results by score to prioritize most relevant content
-            search_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-            return search_results
+            # Drop near-duplicate chunks and merge overlapping ones so each prompt token carries new information
+            context_docs = diversity_service.select(search_results, limit)
+            cache.set(cache_key, context_docs, ttl=self.retrieval_cache_ttl)
+            return context_docs
 
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
             return []  # Return empty context instead of raising error
 
     async def generate_response(self, query: str, context_docs: List[Dict[str, Any]],
-                                selected_context: Optional[str] = None) -> RAGResponse:
+                                selected_context: Optional[str] = None, max_tokens: int = 1024,
+                                max_context_length: Optional[int] = None) -> RAGResponse:
         """
         Generate a response using the retrieved context and LLM
         """
-        try:
-            # Build the context for the LLM ensuring book content is prioritized
-            context_str = ""
-
-            # Calculate total length of retrieved context
-            total_context_length = 0
-            context_parts = []
+        if max_context_length is None:
+            max_context_length = self.max_context_length
 
-            if selected_context:
-                # If specific text was selected, prioritize it
-                context_parts.append(f"EXPLICITLY SELECTED TEXT FROM BOOK:\n{selected_context}\n")
-                total_context_length += len(selected_context)
-
-            # Add retrieved documents from vector store
-            for doc in context_docs:
-                doc_text = doc['text'].strip()
-                if doc_text:  # Only add non-empty documents
-                    new_part = f"RELEVANT BOOK CONTENT:\n{doc_text}\n\n"
-                    if total_context_length + len(new_part) <= self.max_context_length:
-                        context_parts.append(new_part)
-                        total_context_length += len(new_part)
-                    else:
-                        # If adding this part would exceed the limit, truncate it
-                        remaining_space = self.max_context_length - total_context_length
-                        if remaining_space > 0:
-                            truncated_doc = doc_text[:remaining_space]
-                            context_parts.append(f"RELEVANT BOOK CONTENT:\n{truncated_doc}\n\n")
-                        break
-
-            context_str = "".join(context_parts)
-
-            # If no context was found, inform the user
-            if not context_str.strip():
-                context_str = "NO RELEVANT CONTENT FOUND IN THE BOOK FOR THIS QUESTION."
-
-            # Prepare messages for the language model with strict instructions to use book content only
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert assistant for the 'Physical AI & Humanoid Robotics' book. "
-                        "ANSWER ONLY BASED ON THE PROVIDED BOOK CONTENT. "
-                        "If the provided context doesn't contain relevant information, explicitly state that the information is not available in the book. "
-                        "NEVER provide information that is not contained in the provided context. "
-                        "Cite specific sections and content from the book when answering. "
-                        "Be precise and accurate based solely on the book content provided in the context."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"BOOK CONTENT CONTEXT:\n{context_str}\n\n"
-                        f"USER QUESTION: {query}\n\n"
-                        "Please provide a detailed answer based EXCLUSIVELY on the book content provided above. "
-                        "If the book content does not contain the information needed to answer this question, "
-                        "clearly state that the information is not available in the book. "
-                        "Do not make up information or provide external knowledge."
-                    )
-                }
-            ]
+        try:
+            # Static system prefix first (provider prefix caching), then compressed, numbered excerpts
+            messages = build_rag_messages(query, context_docs, selected_context, max_context_length)
+            cap = max_tokens
+            max_tokens = completion_budget(query, cap=cap, selected_context=selected_context)
 
             # Get response from OpenRouter (as fallback to Gemini)
             completion_response = await openrouter_service.get_chat_completion(
                 messages=messages,
                 temperature=0.3,  # Lower temperature for more consistent, fact-based responses
-                max_tokens=1024
+                max_tokens=max_tokens
             )
+            tokens_used = completion_response.tokens_used
+            if truncated(completion_response, max_tokens) and max_tokens < cap:
+                # The budget guessed short: ask again once with all the room this request has
+                logger.warning(f"Answer cut off at {max_tokens} tokens ({query_type(query)} question); "
+                               f"retrying with {cap}")
+                max_tokens = cap
+                completion_response = await openrouter_service.get_chat_completion(
+                    messages=messages, temperature=0.3, max_tokens=max_tokens
+                )
+                tokens_used += completion_response.tokens_used
+            if truncated(completion_response, max_tokens):
+                logger.warning(f"Answer cut off at the {max_tokens}-token cap ({query_type(query)} question)")
 
-            logger.info(f"Generated response with {completion_response.tokens_used} tokens")
+            logger.info(f"Generated response with {tokens_used} tokens: "
+                        f"prompt {completion_response.prompt_tokens or prompt_tokens(messages)}, "
+                        f"completion {completion_response.completion_tokens} of {max_tokens} "
+                        f"({query_type(query)} question)")
             return RAGResponse(
                 response=completion_response.response,
                 sources=context_docs,
-                tokens_used=completion_response.tokens_used
+                tokens_used=tokens_used
             )
 
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            if isinstance(e, BudgetExceeded):
+                logger.warning(f"Skipping completion: {e}; answering with a book extract")
+            else:
+                logger.error(f"Error generating response: {e}")
             # If there's an error generating the response, return a fallback response based on the context
             if context_docs:
                 # If we have context but couldn't generate a response, return the most relevant context
@@ -153,27 +207,80 @@ class RAGService:
                     tokens_used=0
                 )
 
-    async def query(self, query: str, selected_context: Optional[str] = None, target_language: Optional[str] = "en") -> RAGResponse:
+    async def query(self, query: str, selected_context: Optional[str] = None, target_language: Optional[str] = None,
+                    filters: Optional[SearchFilters] = None, use_answer_index: bool = True) -> RAGResponse:
         """
-        Main RAG query method - retrieves context and generates response
+        Main RAG query method - retrieves context and generates response. Without a
+        `target_language`, the answer is in the language the question is written in.
         """
+        # Every provider call below (answer, translation) is charged to this request
+        usage_token = usage_service.begin_request()
         try:
+            if target_language is None:
+                target_language = script_language(query)
+            # Urdu questions are searched and answered in English (the book's language), then the
+            # answer is translated as usual; the translation of a question is cached
+            query = await cross_lingual_service.english_query(query)
+            # Retrieval and every cache are keyed on the normalized question; the model sees it as asked
+            search_query = await query_normalizer.normalize(query)
+
+            # Frequent questions asked without a selection or filters have precomputed answers
+            if use_answer_index and not selected_context and filters is None:
+                precomputed = await answer_index.lookup(search_query, target_language or "en")
+                if precomputed is not None:
+                    logger.info(f"Served precomputed answer for '{precomputed['query']}'")
+                    return RAGResponse(response=precomputed["response"], sources=precomputed["sources"], tokens_used=0)
+
+            started = time.perf_counter()
             context_docs = []
 
             if selected_context:
-                # If specific context is provided, primarily use that
-                # but also retrieve additional context if the selected text is too short
-                if len(selected_context) < 100:  # If the selected text is too short, retrieve more context
-                    context_docs = await self.retrieve_context(query)
+                # If specific context is provided, primarily use that, plus what the book says around
+                # it (cached when the selection was prefetched on highlight)
+                searches = [self.retrieve_context(self._selection_query(selected_context), filters=filters)]
+                if len(selected_context) < 100:  # If the selected text is too short, also search by the question
+                    searches.insert(0, self.retrieve_context(search_query, filters=filters))
+                seen = set()
+                for doc in (doc for docs in await asyncio.gather(*searches) for doc in docs):
+                    if (doc.get("id") or doc.get("text")) not in seen:
+                        seen.add(doc.get("id") or doc.get("text"))
+                        context_docs.append(doc)
+                context_docs = context_docs[:self.max_sources]
             else:
                 # Retrieve context based on the query
-                context_docs = await self.retrieve_context(query)
+                context_docs = await self.retrieve_context(search_query, filters=filters)
 
-            # Generate response using the context
-            response = await self.generate_response(query, context_docs, selected_context)
+            # Size the prompt and completion from how well the book matched. Selected text is
+            # context in its own right, so those requests always get the default treatment
+            if selected_context:
+                decision = adaptive_policy.default(self.max_sources, self.max_context_length)
+            else:
+                decision = adaptive_policy.decide(context_docs, self.max_sources, self.max_context_length)
+
+            language = target_language or "en"
+            if decision.branch == NO_MATCH:
+                # Nothing in the book matches: skip the completion that would only say so
+                response = RAGResponse(
+                    response=NOT_IN_BOOK_RESPONSES.get(language, NOT_IN_BOOK_RESPONSES["en"]),
+                    sources=[],
+                    tokens_used=0
+                )
+            else:
+                # Generate response using the context
+                response = await self.generate_response(
+                    query, context_docs[:decision.sources], selected_context,
+                    max_tokens=decision.max_tokens, max_context_length=decision.max_context_length
+                )
 
             # Translate response if requested and it's not already in the target language
-            if target_language and target_language != "en":
+            translated = decision.branch == NO_MATCH and language in NOT_IN_BOOK_RESPONSES
+            if language == "en" and response.sources:
+                # Offsets index the English text, so translated answers go without citations
+                try:
+                    response.citations = await attribution_service.attribute(response.response, response.sources)
+                except Exception as e:
+                    logger.warning(f"Could not attribute the answer: {e}")
+            if target_language and target_language != "en" and not translated:
                 logger.info(f"Translating response from English to {target_language}")
                 translated_response = await translation_service.translate(
                     text=response.response,
@@ -183,12 +290,17 @@ class RAGService:
                 response.response = translated_response.translated_text
                 logger.info(f"Translation completed: {translated_response.translated_text[:100]}...")
 
-            logger.info(f"RAG query completed successfully")
+            # Prompt + completion tokens of every call made for this request, translation included
+            response.tokens_used = usage_service.request_tokens()
+            adaptive_policy.record(decision, (time.perf_counter() - started) * 1000, response.tokens_used)
+            logger.info(f"RAG query completed successfully ({decision.branch} policy)")
             return response
 
         except Exception as e:
             logger.error(f"Error in RAG query: {e}")
             raise
+        finally:
+            usage_service.end_request(usage_token)
 
 # Singleton instance
 rag_service = RAGService()
\ No newline at end of file
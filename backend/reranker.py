@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Try to import a local cross-encoder, with fallback to the lexical scorer
+CROSS_ENCODER_AVAILABLE = False
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CrossEncoder = None
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its of on or the this "
+    "to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class LexicalScorer:
+    """
+    BM25 over the candidate set: cheap enough to rescore a few dozen chunks in well under a millisecond
+    """
+    name = "lexical"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not texts:
+            return np.zeros(len(texts))
+
+        counts = [Counter(tokenize(text)) for text in texts]
+        tf = np.array([[count[term] for term in terms] for count in counts], dtype=np.float64)
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float64)
+
+        n = len(texts)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        return ((tf * (self.k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+class CrossEncoderScorer:
+    """
+    Local CPU cross-encoder; scores all (query, chunk) pairs in one batched predict call
+    """
+
+    def __init__(self, model_name: str):
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.predict([(query, text) for text in texts], batch_size=len(texts) or 1))
+
+
+class RerankService:
+    def __init__(self, scorer=None):
+        self.enabled = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+        self.overfetch = max(1, int(os.getenv("RERANK_OVERFETCH", "4")))  # fetch k x N candidates
+        self.budget_ms = float(os.getenv("RERANK_BUDGET_MS", "150"))
+        self.model_name = os.getenv("RERANK_MODEL", "lexical")
+        self._scorer = scorer
+        self._load_lock = threading.Lock()
+
+    @property
+    def scorer(self):
+        """The scorer, loaded on first use (the boot warm-up loads it, see warmup.py)"""
+        if self._scorer is not None:
+            return self._scorer
+        with self._load_lock:
+            if self._scorer is not None:
+                return self._scorer
+            if self.model_name != "lexical" and CROSS_ENCODER_AVAILABLE:
+                try:
+                    self._scorer = CrossEncoderScorer(self.model_name)
+                    logger.info(f"Loaded cross-encoder reranker: {self.model_name}")
+                except Exception as e:
+                    logger.warning(f"Could not load cross-encoder {self.model_name}: {e}. Using lexical reranker.")
+            if self._scorer is None:
+                if self.model_name != "lexical" and not CROSS_ENCODER_AVAILABLE:
+                    logger.warning("sentence-transformers not installed. Using lexical reranker.")
+                self._scorer = LexicalScorer()
+        return self._scorer
+
+    def candidate_limit(self, limit: int) -> int:
+        return limit * self.overfetch if self.enabled else limit
+
+    def rescore(self, query: str, hits: List[Dict[str, Any]]) -> List[Tuple[float, Dict[str, Any]]]:
+        """Every hit with its score, best first, computed synchronously and without a budget"""
+        scores = self.scorer.score(query, [hit.get("text", "") for hit in hits])
+        # Stable sort keeps vector order between equal rerank scores
+        order = sorted(range(len(hits)), key=lambda i: -scores[i])
+        return [(float(scores[i]), hits[i]) for i in order]
+
+    async def rerank(self, query: str, hits: List[Dict[str, Any]], limit: int,
+                     budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Rescore vector hits and keep the best `limit`. If scoring does not finish within the
+        budget the hits are returned in vector order, so a slow model never stalls a request.
+        """
+        if not self.enabled or len(hits) <= 1:
+            return hits[:limit]
+
+        if self._scorer is None:
+            # Loading a cross-encoder takes seconds: outside the budget, or the request would time
+            # out and leave the load running in its thread. Normally done by the boot warm-up
+            await asyncio.to_thread(lambda: self.scorer)
+
+        budget = (budget_ms if budget_ms is not None else self.budget_ms) / 1000
+        start = time.perf_counter()
+        try:
+            rescored = await asyncio.wait_for(asyncio.to_thread(self.rescore, query, hits), timeout=budget)
+        except asyncio.TimeoutError:
+            logger.warning(f"Rerank exceeded {budget * 1000:.0f} ms budget, keeping vector order")
+            return hits[:limit]
+        except Exception as e:
+            logger.error(f"Error reranking results: {e}")
+            return hits[:limit]
+
+        logger.info(f"Reranked {len(hits)} candidates with {self.scorer.name} "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return [{**hit, "rerank_score": score} for score, hit in rescored[:limit]]
+
+
+# Singleton instance
+rerank_service = RerankService()
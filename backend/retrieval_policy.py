@@ -0,0 +1,110 @@
+import logging
+import os
+import statistics
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Dict, Any
+
+from tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+NO_MATCH = "no_match"
+CONFIDENT = "confident"
+DEFAULT = "default"
+BRANCHES = [NO_MATCH, CONFIDENT, DEFAULT]
+
+
+@dataclass
+class PolicyDecision:
+    branch: str
+    sources: int  # context chunks to keep
+    max_context_length: int  # characters of retrieved context in the prompt
+    max_tokens: int  # completion budget
+    prompt_tokens_saved: int = 0  # context tokens dropped compared to the default branch
+
+
+class AdaptivePolicy:
+    """
+    Sizes each request from its retrieval scores:
+
+    - no_match: every hit scores below ADAPTIVE_MIN_SCORE, so the book has no answer;
+      the caller returns the canned reply and skips the completion
+    - confident: the top hit beats the runner-up by ADAPTIVE_DOMINANCE_MARGIN, so a couple of
+      chunks and a smaller completion budget are enough
+    - default: everything else gets MAX_SOURCES chunks and the full budget
+
+    Off unless ADAPTIVE_ENABLED=true. ADAPTIVE_MIN_SCORE defaults to SEARCH_MIN_SCORE, the
+    similarity search itself treats as relevant; calibrate it for the embedding model with
+    bench_adaptive.py before enabling, since no_match overrides the search fallback results.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("ADAPTIVE_ENABLED", "false").lower() == "true"
+        self.min_score = float(os.getenv("ADAPTIVE_MIN_SCORE", os.getenv("SEARCH_MIN_SCORE", "0.05")))
+        self.dominance_margin = float(os.getenv("ADAPTIVE_DOMINANCE_MARGIN", "0.15"))
+        self.confident_sources = int(os.getenv("ADAPTIVE_CONFIDENT_SOURCES", "2"))
+        self.confident_max_tokens = int(os.getenv("ADAPTIVE_CONFIDENT_MAX_TOKENS", "512"))
+        self.default_max_tokens = 1024
+
+        self._lock = threading.Lock()
+        self._stats = {branch: self._empty_stats() for branch in BRANCHES}
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {"requests": 0, "tokens_used": 0, "prompt_tokens_saved": 0,
+                "completions_skipped": 0, "latencies_ms": deque(maxlen=1000)}
+
+    def default(self, max_sources: int, max_context_length: int) -> PolicyDecision:
+        return PolicyDecision(DEFAULT, max_sources, max_context_length, self.default_max_tokens)
+
+    def decide(self, context_docs: List[Dict[str, Any]], max_sources: int, max_context_length: int) -> PolicyDecision:
+        default = self.default(max_sources, max_context_length)
+        if not self.enabled:
+            return default
+
+        scores = sorted((doc.get("score", 0.0) for doc in context_docs), reverse=True)
+        if not scores or scores[0] < self.min_score:
+            return PolicyDecision(NO_MATCH, 0, 0, 0, prompt_tokens_saved=self._context_tokens(context_docs))
+
+        runner_up = scores[1] if len(scores) > 1 and scores[1] >= self.min_score else self.min_score
+        if scores[0] - runner_up >= self.dominance_margin and max_sources > self.confident_sources:
+            sources = self.confident_sources
+            return PolicyDecision(
+                CONFIDENT, sources,
+                max_context_length * sources // max_sources,
+                self.confident_max_tokens,
+                prompt_tokens_saved=self._context_tokens(context_docs[sources:])
+            )
+        return default
+
+    @staticmethod
+    def _context_tokens(context_docs: List[Dict[str, Any]]) -> int:
+        return sum(count_tokens(doc.get("text", "")) for doc in context_docs)
+
+    def record(self, decision: PolicyDecision, latency_ms: float, tokens_used: int):
+        with self._lock:
+            stats = self._stats[decision.branch]
+            stats["requests"] += 1
+            stats["tokens_used"] += tokens_used
+            stats["prompt_tokens_saved"] += decision.prompt_tokens_saved
+            stats["completions_skipped"] += decision.branch == NO_MATCH
+            stats["latencies_ms"].append(latency_ms)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-branch request counts, token totals and latency percentiles since startup"""
+        report = {}
+        with self._lock:
+            for branch, stats in self._stats.items():
+                latencies = sorted(stats["latencies_ms"])
+                report[branch] = {
+                    **{k: v for k, v in stats.items() if k != "latencies_ms"},
+                    "latency_p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+                    "latency_p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 1) if latencies else None,
+                }
+        return report
+
+
+# Singleton instance
+adaptive_policy = AdaptivePolicy()
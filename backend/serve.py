@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Production launcher: preload read-only state once, then fork N uvicorn workers that share
+one listening socket.
+
+Preloaded before forking (and so shared copy-on-write / through the page cache):
+    - every application module (FastAPI app, services)
+    - the tokenizer (tiktoken downloads and parses its BPE file once instead of per worker)
+    - the memory-mapped local vector index, when LOCAL_INDEX_PATH is set
+
+Connections (Qdrant, database, HTTP clients) are opened lazily, so each worker creates its own
+after the fork. Set CACHE_BACKEND=shared (or redis) so workers share one cache tier.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from config import load_environment, configure_logging
+
+logger = logging.getLogger("serve")
+
+
+def preload():
+    """Import the app and load read-only state in the parent process"""
+    start = time.perf_counter()
+    import main  # noqa: F401  (imports every service module)
+    from tokens import get_encoding
+    from vector_store import qdrant_service
+
+    get_encoding()
+    index = qdrant_service.load_local_index()
+    logger.info(f"Preloaded app, tokenizer and {'local index' if index is not None else 'no local index'} "
+                f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    # Keep the preloaded objects out of the collector's generations so GC passes in the
+    # workers don't touch (and copy) their pages
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str):
+    import uvicorn
+    from main import app
+
+    config = uvicorn.Config(app, log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock: socket.socket, log_level: str, worker=run_worker) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            worker(sock, log_level)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def supervise(sock: socket.socket, workers: int, log_level: str, worker=run_worker,
+              backoff: float = 1.0, max_quick_exits: int = 5, min_uptime: float = 30.0) -> int:
+    """
+    Run the workers until SIGTERM / SIGINT, restarting any that exit. A worker that exits within
+    min_uptime of starting (bad environment, import error) is restarted after an exponential
+    backoff, and after max_quick_exits such exits in a row the supervisor stops; returns 1 then.
+    """
+    started = {}
+
+    def start():
+        pid = spawn(sock, log_level, worker)
+        started[pid] = time.monotonic()
+
+    for _ in range(workers):
+        start()
+    logger.info(f"Started {workers} workers: {sorted(started)}")
+    stopping = False
+    quick_exits = 0
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in started:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while started:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        uptime = time.monotonic() - started.pop(pid, time.monotonic())
+        if stopping:
+            continue
+        quick_exits = quick_exits + 1 if uptime < min_uptime else 0
+        if quick_exits >= max_quick_exits:
+            logger.error(f"Workers exited {quick_exits} times in a row within {min_uptime:.0f}s of starting; stopping")
+            stop(signal.SIGTERM, None)
+            continue
+        delay = backoff * 2 ** (quick_exits - 1) if quick_exits else 0
+        logger.warning(f"Worker {pid} exited with status {status} after {uptime:.1f}s; restarting in {delay:.1f}s")
+        time.sleep(delay)
+        if not stopping:
+            start()
+    return 1 if quick_exits >= max_quick_exits else 0
+
+
+def main():
+    load_environment()
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--restart-backoff", type=float, default=float(os.getenv("WORKER_RESTART_BACKOFF", "1")),
+                        help="seconds before restarting a worker that exited soon after starting, doubled per retry")
+    parser.add_argument("--max-quick-exits", type=int, default=int(os.getenv("WORKER_MAX_QUICK_EXITS", "5")),
+                        help="give up after this many workers in a row exit soon after starting")
+    args = parser.parse_args()
+
+    preload()
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port}")
+
+    status = 0
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        run_worker(sock, args.log_level)
+    else:
+        status = supervise(sock, args.workers, args.log_level, backoff=args.restart_backoff,
+                           max_quick_exits=args.max_quick_exits)
+    sock.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
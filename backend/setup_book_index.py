@@ -2,7 +2,7 @@ import asyncio
 import os
 from dotenv import load_dotenv
 from vector_store import qdrant_service
-from database import SessionLocal, Document
+from database import SessionLocal, Document, init_db, upsert_document
 import uuid
 
 # Load environment variables
@@ -13,6 +13,7 @@ async def index_sample_book_content():
     Index sample book content about Physical AI & Humanoid Robotics
     """
     print("Starting to index book content...")
+    init_db()
 
     # Sample content about Physical AI (this would normally come from your book files)
     sample_content = """
@@ -101,14 +102,7 @@ async def index_sample_book_content():
     db = SessionLocal()
     try:
         # Create document record
-        doc = Document(
-            doc_id=doc_id,
-            title=doc_title,
-            content=sample_content,
-            section=doc_section,
-            is_indexed=True
-        )
-        db.add(doc)
+        upsert_document(db, doc_id, doc_title, sample_content, doc_section)
         db.commit()
         print("Document saved to database")
     except Exception as e:
@@ -122,17 +116,17 @@ async def index_sample_book_content():
         doc_ids = [doc_id] * len(chunks)
         metadata_list = [{"section": doc_section, "title": doc_title} for _ in chunks]
 
-        vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list)
+        vector_ids = await qdrant_service.store_embeddings(chunks, doc_ids, metadata_list, replace=True)
         print(f"Stored {len(vector_ids)} vectors in Qdrant")
 
         # Update document record with embedding reference
         db = SessionLocal()
         try:
-            doc = db.query(Document).filter(Document.doc_id == doc_id).first()
-            if doc:
-                doc.embedding_vector_id = ",".join(vector_ids)
-                db.commit()
-                print("Updated document with embedding references")
+            db.query(Document).filter(Document.doc_id == doc_id).update(
+                {"embedding_vector_id": ",".join(vector_ids)}, synchronize_session=False
+            )
+            db.commit()
+            print("Updated document with embedding references")
         finally:
             db.close()
     else:
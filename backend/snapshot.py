@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Portable snapshot of the whole index, to bring up a new instance without re-embedding.
+
+One .npz file, column per field: point IDs, payloads and vectors (float32, or int8 with a
+scale per vector), the chunk store (texts, metadata and per-document references) and the
+`documents` rows. String columns are stored as one UTF-8 blob plus offsets, so loading them
+is a slice per value rather than a parse. (Lexical reranking computes BM25 over each query's
+candidates, so there are no postings to export.)
+
+Import loads it into:
+    qdrant  a new versioned collection, bulk-loaded with indexing off and switched in behind
+            the alias (see index_versions.py)
+    local   a memory-mapped local index directory (LOCAL_INDEX_PATH), served without Qdrant
+
+then, once the vectors are in place, replaces the chunk store and upserts the documents rows.
+
+Usage:
+    python snapshot.py export index.npz [--quantize int8]
+    python snapshot.py import index.npz --target qdrant
+    python snapshot.py import index.npz --target local --out ./local_index
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config import load_environment, configure_logging
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+_DOCUMENT_COLUMNS = ["doc_id", "title", "content", "section", "embedding_vector_id",
+                     "is_indexed", "created_at", "updated_at", "doc_metadata"]
+
+
+def pack_strings(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob and end offsets of a string column (None is stored as empty)"""
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    starts = np.concatenate(([0], offsets[:-1])) if len(offsets) else offsets
+    return [data[start:end].decode("utf-8") for start, end in zip(starts.tolist(), offsets.tolist())]
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 quantization with one scale per vector"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+# ===================== EXPORT =====================
+
+def _points(qdrant_service) -> Tuple[List[str], np.ndarray, List[Dict[str, Any]]]:
+    """Every point of the live collection, or of the local index when Qdrant is not configured"""
+    if qdrant_service.connected:
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = qdrant_service.client.scroll(
+                collection_name=qdrant_service.collection_name, limit=1000,
+                offset=offset, with_payload=True, with_vectors=True
+            )
+            for point in points:
+                ids.append(str(point.id))
+                vectors.append(point.vector)
+                payloads.append(point.payload or {})
+            if offset is None:
+                break
+        return ids, np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1), payloads
+
+    index = qdrant_service.load_local_index()
+    if index is None:
+        raise RuntimeError("Neither Qdrant nor a local index is available to export from")
+    return list(index.ids), np.asarray(index.vectors, dtype=np.float32), list(index.payloads)
+
+
+def _document_rows(session_factory) -> List[Dict[str, Any]]:
+    from sqlalchemy import select
+    from database import Document
+
+    db = session_factory()
+    try:
+        rows = db.execute(select(*[getattr(Document, column) for column in _DOCUMENT_COLUMNS])).all()
+    finally:
+        db.close()
+    return [dict(zip(_DOCUMENT_COLUMNS, row)) for row in rows]
+
+
+def export_snapshot(path: str, quantization: str = "float32", service=None, store=None,
+                    session_factory=None) -> Dict[str, Any]:
+    """Write the index of `service`, `store` and `session_factory` (the live ones by default)"""
+    if service is None:
+        from vector_store import qdrant_service as service
+    if store is None:
+        from chunk_store import chunk_store as store
+    if session_factory is None:
+        from database import SessionLocal as session_factory
+
+    start = time.perf_counter()
+    ids, vectors, payloads = _points(service)
+    chunks, refs = store.dump()
+    documents = _document_rows(session_factory)
+
+    columns: Dict[str, np.ndarray] = {}
+
+    def strings(name: str, values):
+        columns[f"{name}.blob"], columns[f"{name}.offsets"] = pack_strings(list(values))
+
+    strings("point_ids", ids)
+    strings("payloads", (json.dumps(payload) for payload in payloads))
+    if quantization == "int8":
+        columns["vectors"], columns["scales"] = quantize(vectors)
+    else:
+        columns["vectors"] = vectors
+
+    strings("chunk_point_ids", (row[0] for row in chunks))
+    strings("chunk_doc_ids", (row[1] for row in chunks))
+    strings("chunk_texts", (row[2] for row in chunks))
+    strings("chunk_metadata", (row[3] for row in chunks))
+    strings("chunk_hashes", (row[4] for row in chunks))
+    columns["chunk_refcounts"] = np.asarray([row[5] for row in chunks], dtype=np.int32)
+    strings("ref_point_ids", (row[0] for row in refs))
+    strings("ref_doc_ids", (row[1] for row in refs))
+    columns["ref_positions"] = np.asarray([row[2] for row in refs], dtype=np.int64)
+    strings("ref_metadata", (row[3] for row in refs))
+
+    for column in _DOCUMENT_COLUMNS:
+        if column == "is_indexed":
+            columns["documents.is_indexed"] = np.asarray([bool(row[column]) for row in documents], dtype=bool)
+        else:
+            strings(f"documents.{column}", (
+                row[column].isoformat() if hasattr(row[column], "isoformat") else row[column] for row in documents
+            ))
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_model": service.embedding_model,
+        "points": len(ids),
+        "dim": int(vectors.shape[1]) if len(ids) else 0,
+        "quantization": quantization,
+        "chunks": len(chunks),
+        "references": len(refs),
+        "documents": len(documents),
+    }
+    columns["manifest"] = np.frombuffer(json.dumps(manifest).encode("utf-8"), dtype=np.uint8)
+
+    # Vectors barely compress; write uncompressed so import reads each column with one copy
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **columns)
+    os.replace(tmp, path)
+    manifest["seconds"] = round(time.perf_counter() - start, 3)
+    manifest["bytes"] = os.path.getsize(path)
+    return manifest
+
+
+# ===================== IMPORT =====================
+
+class Snapshot:
+    """A loaded snapshot file; string columns are decoded on access"""
+
+    def __init__(self, path: str):
+        self._data = np.load(path, allow_pickle=False)
+        self.manifest = json.loads(self._data["manifest"].tobytes().decode("utf-8"))
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')}")
+
+    def strings(self, name: str) -> List[str]:
+        return unpack_strings(self._data[f"{name}.blob"], self._data[f"{name}.offsets"])
+
+    def vectors(self) -> np.ndarray:
+        vectors = self._data["vectors"]
+        if self.manifest["quantization"] == "int8":
+            return vectors.astype(np.float32) * self._data["scales"][:, None]
+        return vectors
+
+    def array(self, name: str) -> np.ndarray:
+        return self._data[name]
+
+
+def _load_chunk_store(snapshot: Snapshot, store):
+    chunks = list(zip(snapshot.strings("chunk_point_ids"), snapshot.strings("chunk_doc_ids"),
+                      snapshot.strings("chunk_texts"), snapshot.strings("chunk_metadata"),
+                      [value or None for value in snapshot.strings("chunk_hashes")],
+                      snapshot.array("chunk_refcounts").tolist()))
+    refs = list(zip(snapshot.strings("ref_point_ids"), snapshot.strings("ref_doc_ids"),
+                    snapshot.array("ref_positions").tolist(), snapshot.strings("ref_metadata")))
+    store.load(chunks, refs)
+
+
+def _load_documents(snapshot: Snapshot, session_factory):
+    from datetime import datetime
+    from database import document_upsert
+
+    columns = {column: snapshot.strings(f"documents.{column}")
+               for column in _DOCUMENT_COLUMNS if column != "is_indexed"}
+    indexed = snapshot.array("documents.is_indexed").tolist()
+    rows = []
+    for i in range(len(indexed)):
+        row = {column: values[i] or None for column, values in columns.items()}
+        row["is_indexed"] = indexed[i]
+        for column in ("created_at", "updated_at"):
+            row[column] = datetime.fromisoformat(row[column]) if row[column] else datetime.utcnow()
+        rows.append(row)
+    if not rows:
+        return
+
+    db = session_factory()
+    try:
+        stmt = document_upsert(db.get_bind().dialect.name)
+        if stmt is None:
+            raise RuntimeError(f"Snapshot import needs ON CONFLICT support, not {db.get_bind().dialect.name}")
+        db.execute(stmt, rows)  # executemany
+        db.commit()
+    finally:
+        db.close()
+
+
+def _load_qdrant(snapshot: Snapshot, batch_size: int, service) -> str:
+    from qdrant_client.http import models
+    from index_versions import IndexVersions, RebuildFailed
+
+    versions = IndexVersions(service)
+    if not versions.service.connected:
+        raise RuntimeError("Qdrant is not reachable")
+    ids = snapshot.strings("point_ids")
+    payloads = snapshot.strings("payloads")
+    vectors = snapshot.vectors()
+    if ids and vectors.shape[1] != 768:
+        raise ValueError(f"Snapshot vectors have {vectors.shape[1]} dimensions, the collection 768")
+
+    name = versions.create_version()
+    try:
+        for offset in range(0, len(ids), batch_size):
+            versions.client.upsert(
+                collection_name=name,
+                points=models.Batch(
+                    ids=ids[offset:offset + batch_size],
+                    vectors=vectors[offset:offset + batch_size].tolist(),
+                    payloads=[json.loads(payload) for payload in payloads[offset:offset + batch_size]],
+                ),
+                wait=False,
+            )
+        versions.finish_indexing(name)
+        count = versions.client.count(name, exact=True).count
+        if count != len(ids):
+            raise RebuildFailed(f"{name} holds {count} of {len(ids)} points")
+    except Exception:
+        versions.client.delete_collection(name)
+        raise
+    versions.switch(name)
+    versions.gc()
+    return name
+
+
+def _load_local(snapshot: Snapshot, out: str):
+    from local_index import LocalVectorIndex
+
+    LocalVectorIndex.write(out, snapshot.strings("point_ids"), snapshot.vectors(),
+                           [json.loads(payload) for payload in snapshot.strings("payloads")])
+
+
+def import_snapshot(path: str, target: str = "qdrant", out: Optional[str] = None,
+                    batch_size: int = 1024, service=None, store=None, session_factory=None,
+                    answers=None) -> Dict[str, float]:
+    """
+    Load a snapshot; returns the seconds each step took. The vectors are loaded (and, for Qdrant,
+    switched in) first, so a failed load leaves the chunk store and documents as they were.
+    Precomputed answers citing documents that changed are retired last.
+    """
+    if service is None:
+        from vector_store import qdrant_service as service
+    if store is None:
+        from chunk_store import chunk_store as store
+    if session_factory is None:
+        from database import SessionLocal as session_factory, init_db
+        init_db()
+    if answers is None:
+        from answer_index import answer_index as answers
+
+    timings = {}
+    start = time.perf_counter()
+    snapshot = Snapshot(path)
+    if snapshot.manifest["embedding_model"] != service.embedding_model:
+        logger.warning(f"Snapshot vectors come from {snapshot.manifest['embedding_model']}, "
+                       f"this instance embeds queries with {service.embedding_model}")
+    timings["read"] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    if target == "local":
+        _load_local(snapshot, out or os.getenv("LOCAL_INDEX_PATH", "./local_index"))
+    else:
+        _load_qdrant(snapshot, batch_size, service)
+    timings[target] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    _load_chunk_store(snapshot, store)
+    timings["chunk_store"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    _load_documents(snapshot, session_factory)
+    timings["documents"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    answers.invalidate_outdated(store)
+    timings["answers"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - start
+    return {key: round(value, 3) for key, value in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write the index to a snapshot file")
+    export.add_argument("path")
+    export.add_argument("--quantize", choices=["float32", "int8"], default="float32")
+    load = commands.add_parser("import", help="load a snapshot file")
+    load.add_argument("path")
+    load.add_argument("--target", choices=["qdrant", "local"], default="qdrant")
+    load.add_argument("--out", default=None, help="local index directory (default: LOCAL_INDEX_PATH)")
+    load.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == "export":
+        print(json.dumps(export_snapshot(args.path, args.quantize), indent=2))
+    else:
+        print(json.dumps(import_snapshot(args.path, args.target, args.out, args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import tempfile
+
+from answer_index import AnswerIndex
+from chunk_store import chunk_store, content_key
+
+SOURCES = [{"id": "p1", "doc_id": "intro", "text": "ROS 2 is a robotics middleware.", "score": 0.9, "metadata": {}}]
+
+
+def test_exact_and_near_matches_are_served_until_invalidated():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = AnswerIndex(os.path.join(tmp, "answers.db"))
+        index.put("What is ROS 2?", "en", [1.0, 0.0, 0.0], "ROS 2 is middleware.", SOURCES, {"intro": "abc"})
+
+        # Case, punctuation and spacing don't matter for an exact match
+        assert asyncio.run(index.lookup("what is  ros 2", "en"))["response"] == "ROS 2 is middleware."
+        assert index.exact("what is ros 2", "ur") is None
+
+        assert index.nearest([0.99, 0.05, 0.0], "en")["query"] == "What is ROS 2?"
+        assert index.nearest([0.0, 1.0, 0.0], "en") is None
+
+        # Another process (worker) sees writes and invalidations made through its own connection
+        other = AnswerIndex(index.path)
+        assert other.exact("What is ROS 2?", "en") is not None
+        assert index.invalidate_docs(["intro"]) == 1
+        assert other.exact("What is ROS 2?", "en") is None
+        assert index.outdated() == [{"query": "What is ROS 2?", "language": "en"}]
+        other.close()
+        index.close()
+
+
+def test_outdated_when_cited_document_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path, chunk_store.path = chunk_store.path, os.path.join(tmp, "chunks.db")
+        try:
+            chunk_store.add_refs([("p1", content_key(SOURCES[0]["text"]), "intro", 0, SOURCES[0]["text"], {})])
+            index = AnswerIndex(os.path.join(tmp, "answers.db"))
+            index.put("What is ROS 2?", "en", [1.0, 0.0], "ROS 2 is middleware.", SOURCES,
+                      chunk_store.fingerprints(["intro"]))
+            assert index.outdated() == []
+
+            # Re-indexed with new text: the old chunk is released and a new one added
+            text = "ROS 2 is a robotics framework."
+            chunk_store.release(["intro"])
+            chunk_store.add_refs([("p2", content_key(text), "intro", 0, text, {})])
+            assert index.outdated() == [{"query": "What is ROS 2?", "language": "en"}]
+            index.close()
+        finally:
+            chunk_store.close()
+            chunk_store.path = path
+
+
+if __name__ == "__main__":
+    test_exact_and_near_matches_are_served_until_invalidated()
+    test_outdated_when_cited_document_changes()
+    print("All answer index tests passed!")
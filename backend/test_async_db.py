@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tempfile
+
+import async_db
+from async_db import async_url
+
+
+def test_async_url_for_neon():
+    url, connect_args = async_url("postgresql://u:p@ep-x.neon.tech/db?sslmode=require&channel_binding=require")
+    assert url.startswith("postgresql+asyncpg://u:p@ep-x.neon.tech/db?")
+    assert "sslmode" not in url and "channel_binding" not in url
+    assert connect_args == {"ssl": "require"}
+
+    # PgBouncer in transaction mode cannot keep prepared statements
+    url, connect_args = async_url("postgresql://u:p@ep-x-pooler.neon.tech/db")
+    assert "prepared_statement_cache_size=0" in url
+    assert connect_args["statement_cache_size"] == 0
+
+    assert async_url("sqlite:///./rag_chatbot.db") == ("sqlite+aiosqlite:///./rag_chatbot.db", {})
+
+
+def test_upsert_document_on_sqlite():
+    async def run():
+        from sqlalchemy import create_engine
+        from sqlalchemy import select
+        from database import Base, Document
+
+        path = os.path.join(tempfile.mkdtemp(), "test.db")
+        Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+        database_url, async_db.DATABASE_URL = async_db.DATABASE_URL, f"sqlite:///{path}"
+        try:
+            async with async_db.session_factory()() as session:
+                await async_db.upsert_document(session, "intro", "Intro", "first", "basics")
+                await async_db.upsert_document(session, "intro", "Introduction", "second", "basics")
+                await session.commit()
+                result = await session.execute(select(Document.title, Document.content)
+                                               .where(Document.doc_id == "intro"))
+                assert result.all() == [("Introduction", "second")]
+        finally:
+            # Later tests get an engine for the configured database again
+            await async_db.dispose()
+            async_db.DATABASE_URL = database_url
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_async_url_for_neon()
+    test_upsert_document_on_sqlite()
+    print("All async database tests passed!")
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import tempfile
+
+from attribution import AttributionService, sentence_spans
+from chunk_store import ChunkStore, content_key
+
+
+def test_sentence_spans_skip_code_and_markup():
+    text = ("## Topics\n\nROS 2 uses DDS for transport. Nodes publish on topics!\n"
+            "- Services are request/response calls.\n```python\nrclpy.init(). node = Node()\n```\n"
+            "ہیومنائڈ روبوٹ توازن رکھتے ہیں۔ وہ قدم بہ قدم چلتے ہیں۔")
+    assert [text[a:b] for a, b in sentence_spans(text)] == [
+        "ROS 2 uses DDS for transport.", "Nodes publish on topics!", "Services are request/response calls.",
+        "ہیومنائڈ روبوٹ توازن رکھتے ہیں۔", "وہ قدم بہ قدم چلتے ہیں۔",
+    ]
+
+
+def test_answer_sentences_cite_the_matching_chunk_sentence():
+    store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    store.add_refs((point_id, content_key(text), doc_id, 0, text, {}) for point_id, doc_id, text in [
+        ("p1", "ros2", "ROS 2 uses DDS for transport. Nodes publish on topics."),
+        ("p2", "gait", "Humanoids balance with the zero moment point. Footsteps are planned ahead."),
+    ])
+    service = AttributionService(store)
+    sources = [{"id": "p1", "doc_id": "ros2"}, {"id": "p2", "doc_id": "gait"}]
+    answer = "Nodes publish on topics. Footsteps are planned ahead. Nothing in the book says this."
+
+    citations = asyncio.run(service.attribute(answer, sources))
+    assert [(answer[c["start"]:c["end"]], c["chunk_id"], c["span"]) for c in citations] == [
+        ("Nodes publish on topics.", "p1", [30, 54]),
+        ("Footsteps are planned ahead.", "p2", [46, 74]),
+    ]
+    # Sentence embeddings were stored for the next answer citing these chunks
+    assert set(store.get_sentences(["p1", "p2"])) == {"p1", "p2"}
+
+
+if __name__ == "__main__":
+    test_sentence_spans_skip_code_and_markup()
+    test_answer_sentences_cite_the_matching_chunk_sentence()
+    print("All attribution tests passed!")
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import time
+
+from cache import MemoryCache, SharedCache, make_key
+
+
+def test_make_key_is_stable():
+    assert make_key("model", "What is ROS 2?") == make_key("model", "What is ROS 2?")
+    assert make_key({"b": 1, "a": 2}) == make_key({"a": 2, "b": 1})
+    assert make_key("model", "a") != make_key("model", "b")
+
+
+def test_memory_cache_evicts_least_recently_used_and_expires():
+    cache = MemoryCache("test", max_entries=2)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    assert cache.get("a") == [1.0]  # "b" is now the least recently used
+    cache.set("c", [3.0])
+    assert cache.get("b") is None and cache.get("a") == [1.0] and cache.get("c") == [3.0]
+
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+
+
+def test_shared_cache_is_shared_between_instances():
+    path = os.path.join(tempfile.mkdtemp(), "cache.db")
+    writer, reader = SharedCache("retrieval", path=path), SharedCache("retrieval", path=path)
+    other_namespace = SharedCache("embeddings", path=path)
+
+    writer.set("key", [{"id": "a", "score": 0.5}])
+    assert reader.get("key") == [{"id": "a", "score": 0.5}]
+    assert other_namespace.get("key") is None
+
+    writer.set("expired", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert reader.get("expired") is None
+
+    reader.clear()
+    assert writer.get("key") is None
+
+
+if __name__ == "__main__":
+    test_make_key_is_stable()
+    test_memory_cache_evicts_least_recently_used_and_expires()
+    test_shared_cache_is_shared_between_instances()
+    print("All cache tests passed!")
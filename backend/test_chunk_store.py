@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+
+from chunk_store import ChunkStore, content_key, point_id_for
+
+
+def test_add_get_and_release():
+    store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    texts = [f"text {i}" for i in range(1000)]  # more than one batch of bound parameters
+    ids = [point_id_for(content_key(text)) for text in texts]
+    store.add_refs((point_id, content_key(text), "intro" if i < 999 else "ros2", i, text, {"section": "basics"})
+                   for i, (point_id, text) in enumerate(zip(ids, texts)))
+
+    found = store.get_many(ids + ["missing"])
+    assert len(found) == 1000 and "missing" not in found
+    assert found[ids[7]] == {"text": "text 7", "metadata": {"section": "basics"}}
+
+    orphaned, changed = store.release(["intro"])
+    assert set(orphaned) == set(ids[:999]) and changed == []
+    assert list(store.get_many(ids)) == [ids[999]]
+    assert store.count() == 1
+    assert store.stats() == {"chunks": 1, "references": 1, "shared_chunks": 0}
+    store.close()
+
+
+def test_shared_chunk_survives_reopen():
+    path = os.path.join(tempfile.mkdtemp(), "chunks.db")
+    store = ChunkStore(path)
+    key = content_key("License: CC BY 4.0")
+    point_id = point_id_for(key)
+    store.add_refs([(point_id, key, "intro", 3, "License: CC BY 4.0", {"title": "Intro"}),
+                    (point_id, key, "ros2", 9, "License:  CC BY 4.0", {"title": "ROS 2"})])
+
+    # Committed rows sit in the write-ahead log until a checkpoint; another connection reads them
+    # while the writer is still open, and they survive the writer closing
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened = ChunkStore(path)
+    assert point_id in reopened.get_many([point_id])
+    store.close()
+    chunk = reopened.get_many([point_id])[point_id]
+    assert chunk["text"] == "License: CC BY 4.0"  # the first occurrence's text is kept
+    assert [(ref["doc_id"], ref["position"]) for ref in chunk["refs"]] == [("intro", 3), ("ros2", 9)]
+
+    assert reopened.release(["intro"]) == ([], [point_id])
+    assert reopened.release(["ros2"]) == ([point_id], [])
+    assert reopened.get_many([point_id]) == {}
+    reopened.close()
+
+
+if __name__ == "__main__":
+    test_add_get_and_release()
+    test_shared_chunk_survives_reopen()
+    print("All chunk store tests passed!")
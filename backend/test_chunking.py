@@ -0,0 +1,62 @@
+from chunking import chunk_document, chunk_spans, chunk_metadata, heading_prefixes, section_spans
+from vector_store import QdrantService, SearchFilters
+
+SAMPLE = (
+    "# Physical AI\n\n" + "Intro text. " * 60 + "\n\n"
+    "## Embodiment\n\n" + "Body text. " * 60 + "\n\n"
+    "```python\n# not a heading\nprint('x')\n```\n\n" + "More text. " * 60
+)
+
+
+def test_chunks_match_spans():
+    spans = chunk_spans(SAMPLE)
+    assert chunk_document(SAMPLE) == [SAMPLE[start:end] for start, end in spans]
+
+
+def test_chunk_spans_stop_at_the_end():
+    # The chunker used to step back by the overlap from the end forever, repeating (1400, 1500)
+    # until it hit its len // 100 chunk cap
+    assert chunk_spans("x" * 1500) == [(0, 1000), (900, 1500)]
+    assert chunk_spans("x" * 1000) == [(0, 1000)]
+    assert chunk_spans("x" * 2700, chunk_size=1000, overlap=100) == [(0, 1000), (900, 1900), (1800, 2700)]
+
+
+def test_heading_path_follows_chunk_start():
+    spans = chunk_spans(SAMPLE)
+    metadata = chunk_metadata(SAMPLE, spans, section="intro", title="Intro")
+
+    assert metadata[0]["heading_path"] == ["Physical AI"]
+    assert metadata[-1]["heading_path"] == heading_prefixes(["Physical AI", "Embodiment"])
+    assert metadata[-1]["heading_path"][-1] == "Physical AI > Embodiment"
+    assert all(meta["section"] == "intro" for meta in metadata)
+
+
+def test_section_spans_isolate_edits():
+    spans = section_spans(SAMPLE)
+    assert spans[0][0] == 0 and spans[-1][1] == len(SAMPLE)
+    embodiment = SAMPLE.index("## Embodiment")
+    assert embodiment in {start for start, _ in spans}
+
+    # Growing the first section shifts no chunk of the second
+    edited = SAMPLE.replace("Intro text. ", "Intro text, longer. ", 3)
+    shift = len(edited) - len(SAMPLE)
+    before = {SAMPLE[a:b] for a, b in spans if a >= embodiment}
+    after = {edited[a:b] for a, b in section_spans(edited) if a >= embodiment + shift}
+    assert before == after
+
+
+def test_build_filter_skips_empty_fields():
+    assert QdrantService._build_filter(None) is None
+    assert QdrantService._build_filter(SearchFilters()) is None
+
+    query_filter = QdrantService._build_filter(SearchFilters(section="lab-setup", heading_path="Setup"))
+    assert [condition.key for condition in query_filter.must] == ["section", "heading_path"]
+
+
+if __name__ == "__main__":
+    test_chunks_match_spans()
+    test_chunk_spans_stop_at_the_end()
+    test_heading_path_follows_chunk_start()
+    test_section_spans_isolate_edits()
+    test_build_filter_skips_empty_fields()
+    print("All chunking tests passed!")
@@ -0,0 +1,49 @@
+import asyncio
+
+from cross_lingual import CrossLingualService, script_language
+from translation_service import TranslationResponse
+
+
+class FakeTranslator:
+    def __init__(self, tokens_used: int = 12):
+        self.calls = []
+        self.tokens_used = tokens_used
+
+    async def translate(self, text, source_lang="en", target_lang="ur"):
+        self.calls.append((text, source_lang, target_lang))
+        return TranslationResponse(translated_text=" What is a humanoid robot? ", source_lang=source_lang,
+                                   target_lang=target_lang, tokens_used=self.tokens_used)
+
+
+def test_script_language():
+    assert script_language("ہیومنائڈ روبوٹ کیا ہے؟") == "ur"
+    assert script_language("ROS 2 میں نوڈ کیا ہے") == "ur"
+    assert script_language("What is ROS 2?") == "en"
+    assert script_language("1234") == "en"
+
+
+def test_urdu_questions_are_translated_once():
+    translator = FakeTranslator()
+    service = CrossLingualService(translator)
+
+    assert asyncio.run(service.english_query("What is a humanoid?")) == "What is a humanoid?"
+    assert asyncio.run(service.english_query("ہیومنائڈ روبوٹ کیا ہے؟")) == "What is a humanoid robot?"
+    # Arabic yeh, a diacritic and different punctuation: the same question, served from the cache
+    assert asyncio.run(service.english_query("ہیومنائڈ روبوٹ كيا ہےَ")) == "What is a humanoid robot?"
+    assert translator.calls == [("ہیومنائڈ روبوٹ کیا ہے؟", "ur", "en")]
+
+
+def test_failed_translations_are_not_cached():
+    translator = FakeTranslator(tokens_used=0)
+    service = CrossLingualService(translator)
+
+    assert asyncio.run(service.english_query("سینسر کیا ہے")) == "سینسر کیا ہے"
+    asyncio.run(service.english_query("سینسر کیا ہے"))
+    assert len(translator.calls) == 2
+
+
+if __name__ == "__main__":
+    test_script_language()
+    test_urdu_questions_are_translated_once()
+    test_failed_translations_are_not_cached()
+    print("All cross-lingual tests passed!")
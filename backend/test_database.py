@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Document, CompressedText, upsert_document
+
+
+def session():
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_upsert_keeps_created_at_and_defers_content():
+    db = session()
+    upsert_document(db, "intro", "Intro", "first " * 100, "basics")
+    db.commit()
+    created = db.query(Document.created_at).scalar()
+
+    upsert_document(db, "intro", "Introduction", "second", "basics")
+    db.commit()
+    assert db.query(Document).count() == 1
+
+    document = db.query(Document).one()
+    # Loading the row leaves the body unloaded until it is accessed
+    assert "content" in inspect(document).unloaded and "doc_metadata" in inspect(document).unloaded
+    assert (document.title, document.created_at) == ("Introduction", created)
+    assert document.content == "second"
+
+
+def test_compressed_content_round_trips():
+    column = CompressedText()
+    column.enabled, column.min_length = True, 16
+    body = "A humanoid robot balances with its ankles and hips. " * 200
+
+    stored = column.process_bind_param(body, None)
+    assert stored.startswith(CompressedText.PREFIX) and len(stored) < len(body) / 4
+    assert column.process_result_value(stored, None) == body
+    # Short and previously stored plain values are left as they are
+    assert column.process_bind_param("short", None) == "short"
+    assert column.process_result_value(body, None) == body
+
+    db = session()
+    Document.__table__.c.content.type.enabled = True
+    try:
+        upsert_document(db, "long", "Long", body, "basics")
+        db.commit()
+    finally:
+        Document.__table__.c.content.type.enabled = False
+    raw = db.execute(text("SELECT content FROM documents WHERE doc_id = 'long'")).scalar()
+    assert raw.startswith(CompressedText.PREFIX)
+    assert db.query(Document).one().content == body
+
+
+if __name__ == "__main__":
+    test_upsert_keeps_created_at_and_defers_content()
+    test_compressed_content_round_trips()
+    print("All database tests passed!")
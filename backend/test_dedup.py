@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+from chunk_store import ChunkStore, content_key, point_id_for
+from vector_store import QdrantService
+
+LICENSE = "Content is licensed under CC BY-SA 4.0."
+
+
+def ref(doc_id, position, text, **metadata):
+    key = content_key(text)
+    return point_id_for(key), key, doc_id, position, text, metadata
+
+
+def test_identical_chunks_share_one_point_with_provenance():
+    assert content_key(LICENSE) == content_key(f"  {LICENSE.replace(' ', chr(10))} ")
+    shared = point_id_for(content_key(LICENSE))
+
+    store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    store.add_refs([ref("intro", 0, "Physical AI is embodied.", section="intro"), ref("intro", 1, LICENSE, section="intro")])
+    store.add_refs([ref("ros2", 0, "ROS 2 uses DDS.", section="ros2"), ref("ros2", 1, LICENSE + "\n", section="ros2")])
+    assert store.stats() == {"chunks": 3, "references": 4, "shared_chunks": 1}
+
+    chunk = store.get_many([shared])[shared]
+    assert chunk["text"] == LICENSE
+    assert [r["doc_id"] for r in chunk["refs"]] == ["intro", "ros2"]
+    payload = QdrantService._payload(store.provenance([shared])[shared])
+    assert payload["doc_id"] == ["intro", "ros2"] and payload["section"] == ["intro", "ros2"]
+
+    # Re-indexing ros2 without the license releases its reference; the text outlives it
+    kept = ref("ros2", 0, "ROS 2 uses DDS.")
+    orphaned, changed = store.release(["ros2"], keep={(kept[0], "ros2", 0)})
+    assert orphaned == [] and changed == [shared]
+    assert store.get_many([shared])[shared].get("refs") is None
+
+    # Dropping the last reference removes the chunk
+    orphaned, _ = store.release(["intro"])
+    assert shared in orphaned and store.count() == 1
+
+
+if __name__ == "__main__":
+    test_identical_chunks_share_one_point_with_provenance()
+    print("All dedup tests passed!")
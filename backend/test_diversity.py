@@ -0,0 +1,62 @@
+import numpy as np
+
+from diversity import mmr, merge_adjacent
+
+TEXT = "".join(chr(ord("a") + i % 26) for i in range(300))
+
+
+def test_mmr_skips_duplicate_vectors():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    relevance = np.array([1.0, 0.99, 0.5])
+    assert mmr(relevance, vectors, k=2) == [0, 2]
+
+
+def test_merge_adjacent_builds_contiguous_span():
+    hits = [
+        {"id": "b", "doc_id": "d", "text": TEXT[100:250], "score": 0.9, "metadata": {"start": 100, "end": 250}},
+        {"id": "a", "doc_id": "d", "text": TEXT[0:120], "score": 0.8, "metadata": {"start": 0, "end": 120}},
+        {"id": "c", "doc_id": "other", "text": TEXT[0:120], "score": 0.7, "metadata": {"start": 0, "end": 120}},
+        {"id": "e", "doc_id": "d", "text": TEXT[250:300], "score": 0.6, "metadata": {"start": 250, "end": 300}},
+    ]
+    merged = merge_adjacent(hits)
+
+    # "c" repeats the text of "a" and is dropped; "a" and "e" fold into "b"'s span
+    assert len(merged) == 1
+    assert merged[0]["text"] == TEXT
+    assert merged[0]["metadata"] == {"start": 0, "end": 300}
+    assert merged[0]["merged_ids"] == ["b", "a", "e"]
+    assert merged[0]["score"] == 0.9
+
+
+def test_merge_adjacent_joins_spans_bridged_by_a_later_hit():
+    hits = [
+        {"id": "a", "doc_id": "d", "text": TEXT[0:100], "score": 0.9, "metadata": {"start": 0, "end": 100}},
+        {"id": "c", "doc_id": "d", "text": TEXT[150:250], "score": 0.8, "metadata": {"start": 150, "end": 250}},
+        {"id": "b", "doc_id": "d", "text": TEXT[90:160], "score": 0.7, "metadata": {"start": 90, "end": 160}},
+    ]
+    merged = merge_adjacent(hits)
+
+    assert len(merged) == 1
+    assert merged[0]["text"] == TEXT[0:250]
+    assert merged[0]["merged_ids"] == ["a", "c", "b"]
+
+
+def test_merge_adjacent_keeps_deduplicated_text_whole():
+    # A shared chunk served with another page's spelling: its text is not this page's content[start:end]
+    variant = TEXT[100:150].replace("z", "z  ")
+    hits = [
+        {"id": "a", "doc_id": "d", "text": TEXT[0:120], "score": 0.9, "metadata": {"start": 0, "end": 120}},
+        {"id": "b", "doc_id": "d", "text": variant, "score": 0.8, "metadata": {"start": 100, "end": 150}},
+    ]
+    merged = merge_adjacent(hits)
+
+    assert [hit["text"] for hit in merged] == [TEXT[0:120], variant]
+    assert "merged_ids" not in merged[0]
+
+
+if __name__ == "__main__":
+    test_mmr_skips_duplicate_vectors()
+    test_merge_adjacent_builds_contiguous_span()
+    test_merge_adjacent_joins_spans_bridged_by_a_later_hit()
+    test_merge_adjacent_keeps_deduplicated_text_whole()
+    print("All diversity tests passed!")
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+from docs_watcher import DocsWatcher, read_document
+
+
+class RecordingWatcher(DocsWatcher):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.indexed, self.removed = [], []
+
+    async def reindex(self, document):
+        self.indexed.append(document["doc_id"])
+
+    async def remove(self, doc_id):
+        self.removed.append(doc_id)
+
+
+def test_read_document_matches_index_book_content():
+    docs = Path(tempfile.mkdtemp())
+    (docs / "lab-setup").mkdir()
+    page = docs / "lab-setup" / "workstation.md"
+    page.write_text('---\ntitle: "Digital Twin Workstation"\n---\n# Ignored\nText', encoding="utf-8")
+    document = read_document(page, docs)
+    assert (document["doc_id"], document["title"], document["section"]) == (
+        "lab-setup_workstation", "Digital Twin Workstation", "lab-setup"
+    )
+    (docs / "intro.md").write_text("# Welcome\nText", encoding="utf-8")
+    assert read_document(docs / "intro.md", docs)["title"] == "Welcome"
+
+
+def test_sync_indexes_only_content_changes():
+    docs = Path(tempfile.mkdtemp())
+    (docs / "a.md").write_text("# A\none", encoding="utf-8")
+    (docs / "b.md").write_text("# B\ntwo", encoding="utf-8")
+    state = os.path.join(tempfile.mkdtemp(), "state.json")
+
+    watcher = RecordingWatcher(docs, state_path=state)
+    assert asyncio.run(watcher.sync())["indexed"] == 2
+
+    # A restart remembers what was indexed; a save without edits is not re-indexed
+    watcher = RecordingWatcher(docs, state_path=state)
+    os.utime(docs / "a.md", ns=(1, 1))
+    (docs / "b.md").write_text("# B\ntwo, edited", encoding="utf-8")
+    assert asyncio.run(watcher.sync()) == {"indexed": 1, "removed": 0, "unchanged": 1, "failed": 0}
+    assert watcher.indexed == ["b"]
+
+    (docs / "a.md").unlink()
+    asyncio.run(watcher.sync())
+    assert watcher.removed == ["a"]
+
+
+def test_failed_page_is_retried_without_stopping_the_sync():
+    docs = Path(tempfile.mkdtemp())
+    (docs / "a.md").write_text("# A\none", encoding="utf-8")
+    (docs / "b.md").write_text("# B\ntwo", encoding="utf-8")
+    state = os.path.join(tempfile.mkdtemp(), "state.json")
+
+    class FlakyWatcher(RecordingWatcher):
+        async def reindex(self, document):
+            if document["doc_id"] == "a" and not self.indexed:
+                self.indexed.append(None)
+                raise RuntimeError("Qdrant unavailable")
+            await super().reindex(document)
+
+    watcher = FlakyWatcher(docs, state_path=state)
+    assert asyncio.run(watcher.sync()) == {"indexed": 1, "removed": 0, "unchanged": 0, "failed": 1}
+    assert "a.md" not in watcher.state and "b.md" in watcher.state
+    assert asyncio.run(watcher.sync())["indexed"] == 1
+    assert watcher.indexed == [None, "b", "a"]
+
+
+if __name__ == "__main__":
+    test_read_document_matches_index_book_content()
+    test_sync_indexes_only_content_changes()
+    test_failed_page_is_retried_without_stopping_the_sync()
+    print("All docs watcher tests passed!")
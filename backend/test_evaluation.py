@@ -0,0 +1,48 @@
+from evaluation import build_labels, evaluate_chunking, metrics, regressions
+
+DOCUMENTS = {
+    "gait.md": "# Gait\n\nIntro to walking.\n\n## Zero moment point\n\n"
+               + "The zero moment point keeps a walking humanoid balanced over its support polygon. " * 4
+               + "\n\n## Footstep planning\n\n" + "Footstep planners choose where each foot lands next. " * 4,
+    "ros2.md": "# ROS 2\n\n## Topics\n\n" + "Nodes publish messages on topics and subscribers receive them. " * 4,
+}
+
+
+def test_labels_are_section_spans():
+    labels = build_labels(DOCUMENTS)
+    assert [label["question"] for label in labels] == ["Zero moment point", "Footstep planning", "Topics"]
+    doc_id, start, end = labels[1]["relevant"][0]
+    # The heading line is the question, so the answer starts below it
+    assert doc_id == "gait.md" and DOCUMENTS[doc_id][start:end].startswith("\nFootstep planners")
+    assert end == len(DOCUMENTS[doc_id])
+
+
+def test_metrics():
+    scores = metrics([[4], [2], [7]], {2, 9}, k=3)
+    assert scores["recall"] == 0.5 and scores["mrr"] == 0.5
+    assert round(scores["ndcg"], 3) == 0.387  # (1 / log2 3) / (1 + 1 / log2 3)
+    # A merged span is one result covering both of its chunks
+    assert metrics([[2, 9], [4]], {2, 9}, k=1)["recall"] == 1.0
+
+
+def test_lexical_retrieval_finds_every_section_and_drops_are_flagged():
+    task = {"documents": DOCUMENTS, "labels": build_labels(DOCUMENTS), "ks": [1, 3],
+            "chunker": "section", "chunk_size": 200, "overlap": 0,
+            "variants": [{"min_score": 0.05, "fallback": 2, "fusion": 0.0, "rerank": False,
+                          "mmr": False, "adaptive": False}]}
+    rows = evaluate_chunking(task)
+    # Every section spans two chunks, which merge_adjacent serves as one span when both are found
+    assert [(row["k"], row["mrr"]) for row in rows] == [(1, 1.0), (3, 1.0)]
+    assert rows[0]["recall"] == rows[1]["recall"] == round(2.5 / 3, 4)
+    assert rows[0]["questions"] == 3 and rows[0]["chunks"] == 6
+
+    worse = [{**row, "recall": row["recall"] - 0.1} for row in rows]
+    assert len(regressions(worse, rows, max_drop=0.05)) == 2
+    assert regressions(rows, worse, max_drop=0.05) == []
+
+
+if __name__ == "__main__":
+    test_labels_are_section_spans()
+    test_metrics()
+    test_lexical_retrieval_finds_every_section_and_drops_are_flagged()
+    print("All evaluation tests passed!")
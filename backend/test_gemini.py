@@ -0,0 +1,83 @@
+import asyncio
+
+from google.api_core import exceptions
+
+from gemini_service import GeminiService, load_genai
+
+
+class FakeClient:
+    """Stands in for the SDK's async client; fails the first `failures` calls with `error`"""
+
+    def __init__(self, failures=0, error=exceptions.TooManyRequests("quota")):
+        self.failures, self.error = failures, error
+        self.requests, self.in_flight, self.peak = [], 0, 0
+
+    async def generate_content(self, request, timeout=None, retry=None):
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if len(self.requests) <= self.failures:
+                raise self.error
+            return load_genai().protos.GenerateContentResponse(
+                candidates=[{"content": {"role": "model", "parts": [{"text": "Humanoids "}, {"text": "walk."}]}}],
+                usage_metadata={"prompt_token_count": 42, "candidates_token_count": 3},
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def service(client, **settings):
+    gemini = GeminiService()
+    gemini.api_key, gemini._client, gemini.retry_base_delay = "test", client, 0.001
+    for name, value in settings.items():
+        setattr(gemini, name, value)
+    gemini._semaphore = asyncio.Semaphore(gemini.max_concurrency)
+    return gemini
+
+
+MESSAGES = [{"role": "system", "content": "Answer from the book."}, {"role": "user", "content": "How do humanoids walk?"}]
+
+
+def test_request_carries_model_and_system_instruction():
+    client = FakeClient()
+    response = asyncio.run(service(client).get_chat_completion(MESSAGES, model="gemini-2.0-flash-lite"))
+    request = client.requests[0]
+    assert request.model == "models/gemini-2.0-flash-lite"
+    assert request.system_instruction.parts[0].text == "Answer from the book."
+    assert [content.role for content in request.contents] == ["user"]
+    # Token counts come from usage_metadata
+    assert (response.response, response.prompt_tokens, response.completion_tokens) == ("Humanoids walk.", 42, 3)
+
+
+def test_quota_errors_are_retried_and_others_are_not():
+    client = FakeClient(failures=2)
+    assert asyncio.run(service(client).get_chat_completion(MESSAGES)).response == "Humanoids walk."
+    assert len(client.requests) == 3
+
+    client = FakeClient(failures=1, error=exceptions.BadRequest("bad request"))
+    response = asyncio.run(service(client).get_chat_completion(MESSAGES))
+    assert "issue with the Google Gemini API" in response.response and len(client.requests) == 1
+
+    client = FakeClient(failures=10)
+    response = asyncio.run(service(client, max_retries=2).get_chat_completion(MESSAGES))
+    assert "quota has been exceeded" in response.response and len(client.requests) == 3
+
+
+def test_concurrency_is_limited():
+    client = FakeClient()
+    gemini = service(client, max_concurrency=3)
+
+    async def burst():
+        await asyncio.gather(*(gemini.get_chat_completion(MESSAGES) for _ in range(20)))
+
+    asyncio.run(burst())
+    assert client.peak == 3
+
+
+if __name__ == "__main__":
+    test_request_carries_model_and_system_instruction()
+    test_quota_errors_are_retried_and_others_are_not()
+    test_concurrency_is_limited()
+    print("All Gemini service tests passed!")
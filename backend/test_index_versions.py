@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+from index_versions import IndexVersions, RebuildFailed, smoke_queries
+from vector_store import QdrantService
+
+
+def versions():
+    from qdrant_client import QdrantClient
+
+    service = QdrantService()
+    service.client, service._connected = QdrantClient(":memory:"), True
+    service._create_collection()
+    return IndexVersions(service)
+
+
+def test_alias_switch_and_gc():
+    index = versions()
+    assert index.active() == f"{index.alias}_v1"
+
+    for version in (2, 3, 4):
+        name = f"{index.alias}_v{version}"
+        index.service.create_versioned_collection(name, bulk=True)
+        index.switch(name)
+    assert index.active() == f"{index.alias}_v4"
+
+    # The live version and the one before it survive
+    assert index.gc(keep=2) == [f"{index.alias}_v1", f"{index.alias}_v2"]
+    assert index.versions() == [f"{index.alias}_v3", f"{index.alias}_v4"]
+
+
+def test_validation_rejects_a_version_missing_pages():
+    index = versions()
+    name = f"{index.alias}_v2"
+    index.service.create_versioned_collection(name, bulk=True)
+    documents = [{"doc_id": "intro", "content": "# Intro\n\n## Embodiment\nText"}]
+    assert smoke_queries(documents) == [{"query": "Embodiment", "doc_id": "intro"}]
+
+    with pytest.raises(RebuildFailed):
+        asyncio.run(index.validate(name, documents, smoke_queries(documents)))
+    assert index.active() == f"{index.alias}_v1"
+
+
+def test_build_stages_chunks_and_documents_until_the_switch():
+    from chunk_store import ChunkStore
+
+    index = versions()
+    index.staging_dir = tempfile.mkdtemp()
+    name = f"{index.alias}_v2"
+    index.service.create_versioned_collection(name, bulk=True)
+    documents = [{"doc_id": "intro", "title": "Intro", "section": "main",
+                  "content": "# Intro\n\n## Embodiment\n" + "Physical AI acts in the world. " * 10}]
+    asyncio.run(index.build(name, documents))
+
+    staged = ChunkStore(os.path.join(index.staging(name), "chunks.db"))
+    assert staged.doc_ids() == ["intro"] and staged.count() == index.client.count(name).count
+    staged.close()
+    with open(os.path.join(index.staging(name), "documents.json"), encoding="utf-8") as f:
+        assert [document["doc_id"] for document in json.load(f)] == ["intro"]
+
+
+if __name__ == "__main__":
+    test_alias_switch_and_gc()
+    test_validation_rejects_a_version_missing_pages()
+    test_build_stages_chunks_and_documents_until_the_switch()
+    print("All index version tests passed!")
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from local_index import LocalVectorIndex
+from vector_store import SearchFilters
+
+
+def test_search_ranks_and_filters():
+    path = tempfile.mkdtemp()
+    vectors = np.eye(3, dtype=np.float32) * 2  # stored normalised
+    payloads = [{"doc_id": "intro", "section": "main"}, {"doc_id": ["ros2", "intro"], "section": "ros2"},
+                {"doc_id": "sim", "section": "sim"}]
+    LocalVectorIndex.write(path, ["a", "b", "c"], vectors, payloads)
+    index = LocalVectorIndex(path)
+
+    hits = index.search([0.1, 1.0, 0.0], limit=2, with_vectors=True)
+    assert [hit.id for hit in hits] == ["b", "a"]
+    assert abs(hits[0].score - 1.0 / np.linalg.norm([0.1, 1.0])) < 1e-6 and hits[0].vector == [0.0, 1.0, 0.0]
+    # A shared chunk matches a filter on any of its documents
+    assert [hit.id for hit in index.search([0, 0, 1], limit=3, filters=SearchFilters(doc_id="intro"))] == ["a", "b"]
+    assert index.search([0, 0, 1], limit=3, filters=SearchFilters(doc_id="missing")) == []
+
+
+def test_empty_index_and_rebuild_detection():
+    path = tempfile.mkdtemp()
+    LocalVectorIndex.write(path, [], np.empty((0, 768), dtype=np.float32), [])
+    index = LocalVectorIndex(path)
+    assert len(index) == 0 and index.search([1.0] * 768, limit=5) == []
+    assert not index.rebuilt()
+
+    time.sleep(0.01)
+    LocalVectorIndex.write(path, ["a"], np.ones((1, 768), dtype=np.float32), [{}])
+    assert index.rebuilt()
+    assert [hit.id for hit in LocalVectorIndex(path).search([1.0] * 768, limit=5)] == ["a"]
+
+
+def test_rebuild_swaps_matrix_and_ids_together():
+    path = tempfile.mkdtemp()
+    LocalVectorIndex.write(path, ["a", "b"], np.eye(2, dtype=np.float32), [{}, {}])
+    old = LocalVectorIndex(path)
+    LocalVectorIndex.write(path, ["c", "d", "e"], np.eye(3, dtype=np.float32), [{}, {}, {}])
+    LocalVectorIndex.write(path, ["f"], np.ones((1, 4), dtype=np.float32), [{}])
+
+    # The newest matrix and the one before it are kept; the loaded one is still mapped
+    assert len([name for name in os.listdir(path) if name.endswith(".f32")]) == 2
+    assert [hit.id for hit in old.search([0, 1], limit=1)] == ["b"]
+    assert [hit.id for hit in LocalVectorIndex(path).search([1, 1, 1, 1], limit=5)] == ["f"]
+
+
+def test_failed_load_is_retried():
+    from vector_store import qdrant_service
+
+    path = tempfile.mkdtemp()
+    with open(os.path.join(path, "index.json"), "w") as f:
+        f.write("{")  # caught mid-write
+    saved = qdrant_service.local_index_path, qdrant_service.local_index, qdrant_service._local_index_checked
+    qdrant_service.local_index_path, qdrant_service.local_index, qdrant_service._local_index_checked = path, None, False
+    try:
+        assert qdrant_service.load_local_index() is None
+        LocalVectorIndex.write(path, ["a"], np.ones((1, 4), dtype=np.float32), [{}])
+        assert len(qdrant_service.load_local_index()) == 1
+    finally:
+        qdrant_service.local_index_path, qdrant_service.local_index, qdrant_service._local_index_checked = saved
+
+
+if __name__ == "__main__":
+    test_search_ranks_and_filters()
+    test_empty_index_and_rebuild_detection()
+    test_rebuild_swaps_matrix_and_ids_together()
+    test_failed_load_is_retried()
+    print("All local index tests passed!")
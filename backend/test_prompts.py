@@ -0,0 +1,70 @@
+from prompts import compress_context, completion_budget, build_rag_messages, RAG_SYSTEM_PROMPT
+
+CHUNK = """---
+title: ROS 2
+---
+
+## Nodes   and  Topics
+
+A **node** publishes to a [topic](../topics.md).
+
+
+```python
+# keep comments and indentation
+def main():
+    rclpy.init()
+```
+"""
+
+
+def test_compress_context_strips_markup_but_keeps_code():
+    compressed = compress_context(CHUNK)
+    assert compressed == (
+        "Nodes and Topics\nA node publishes to a topic.\n"
+        "```python\n# keep comments and indentation\ndef main():\n    rclpy.init()\n```"
+    )
+
+
+def test_static_prefix_and_completion_budget():
+    first = build_rag_messages("What is ROS 2?", [{"text": CHUNK}])
+    second = build_rag_messages("How do I set up Gazebo?", [{"text": "other"}])
+    assert first[0] is second[0] and first[0]["content"] == RAG_SYSTEM_PROMPT
+    assert "[1] Nodes and Topics" in first[1]["content"]
+
+    assert completion_budget("What is ROS 2?") < completion_budget("Why does physical AI matter?")
+    assert completion_budget("How do I set up Gazebo?") == 1024
+    assert completion_budget("How do I set up Gazebo?", cap=512) == 512
+    # Explaining a long selection, or a long multi-part question, needs more room than the type alone
+    assert completion_budget("What is this?", selected_context=CHUNK * 20) > completion_budget("What is this?")
+    long_question = "What is ROS 2, " + ", ".join(f"and what does part {i} of the launch file do" for i in range(10))
+    assert completion_budget("What is ROS 2?") < completion_budget(long_question) <= 2 * completion_budget("What is ROS 2?")
+
+
+def test_truncated_answer_is_retried_with_the_cap():
+    import asyncio
+
+    from openrouter import ChatCompletionResponse, openrouter_service
+    from rag import rag_service
+
+    budgets = []
+
+    async def completion(messages, temperature, max_tokens):
+        budgets.append(max_tokens)
+        return ChatCompletionResponse(response="answer", tokens_used=max_tokens + 100, completion_tokens=max_tokens,
+                                      finish_reason="length" if len(budgets) == 1 else "stop")
+
+    original = openrouter_service.get_chat_completion
+    openrouter_service.get_chat_completion = completion
+    try:
+        response = asyncio.run(rag_service.generate_response("What is ROS 2?", [{"text": CHUNK}], max_tokens=1024))
+    finally:
+        openrouter_service.get_chat_completion = original
+    assert budgets == [256, 1024]
+    assert response.tokens_used == 256 + 1024 + 200
+
+
+if __name__ == "__main__":
+    test_compress_context_strips_markup_but_keeps_code()
+    test_static_prefix_and_completion_budget()
+    test_truncated_answer_is_retried_with_the_cap()
+    print("All prompt tests passed!")
@@ -0,0 +1,22 @@
+from query_expansion import fuse, heuristic_variants
+
+
+def test_rrf_rewards_hits_found_by_several_variants():
+    original = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+    variant = [{"id": "c", "score": 0.95}, {"id": "d", "score": 0.6}]
+    fused = fuse([original, variant])
+
+    assert [hit["id"] for hit in fused] == ["c", "a", "b", "d"]
+    assert fused[0]["score"] == 0.95  # best vector score is kept for later stages
+
+
+def test_heuristic_variants_swap_abbreviations():
+    variants = heuristic_variants("What is ROS 2?")
+    assert "what is robot operating system 2" in variants
+    assert "ROS 2 is" in variants
+
+
+if __name__ == "__main__":
+    test_rrf_rewards_hits_found_by_several_variants()
+    test_heuristic_variants_swap_abbreviations()
+    print("All query expansion tests passed!")
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import tempfile
+
+from chunk_store import ChunkStore, content_key
+from query_normalizer import QueryNormalizer, edit_distance, fold
+
+
+def test_fold_unicode_case_and_punctuation():
+    assert fold("What is  Physical AI??") == "what is physical ai"
+    assert fold("ＲＯＳ ２ in C++ / C#!") == "ros 2 in c++ c#"
+    # Arabic yeh and kaf, a zero-width non-joiner and a question mark in Urdu script
+    assert fold("روبوٹ كيا ہے؟") == fold("روبوٹ کیا ‌ہے") == "روبوٹ کیا ہے"
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("physcial", "physical", 2) == 1
+    assert edit_distance("simulaton", "simulation", 2) == 1
+    assert edit_distance("gazebo", "humanoid", 2) == 3
+
+
+def test_near_duplicate_queries_normalize_alike():
+    store = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    store.add_refs((point_id, content_key(text), doc_id, 0, text, {}) for point_id, doc_id, text in [
+        ("p1", "intro", "Physical AI is AI embodied in a physical body. Physical systems sense and act."),
+        ("p2", "sim", "Simulation in Gazebo comes before the humanoid walks. Simulation is cheap."),
+    ])
+    normalizer = QueryNormalizer(store)
+
+    variants = ["what is physcial ai?", "What is Physical AI", "what is physical  ai??"]
+    assert {asyncio.run(normalizer.normalize(q)) for q in variants} == {"what is physical ai"}
+    # Short words are left alone, and so are words without a close match
+    assert asyncio.run(normalizer.normalize("Simulaton in gazbo with ROS")) == "simulation in gazebo with ros"
+    assert asyncio.run(normalizer.normalize("zebrafish")) == "zebrafish"
+
+    # New chunks extend the vocabulary once the normalizer is told about them
+    text = "Isaac Sim renders photorealistic scenes. Isaac is by NVIDIA."
+    store.add_refs([("p3", content_key(text), "isaac", 0, text, {})])
+    normalizer.invalidate()
+    assert asyncio.run(normalizer.normalize("isaak sim")) == "isaac sim"
+
+
+if __name__ == "__main__":
+    test_fold_unicode_case_and_punctuation()
+    test_edit_distance_counts_transpositions_once()
+    test_near_duplicate_queries_normalize_alike()
+    print("All query normalizer tests passed!")
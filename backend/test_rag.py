@@ -9,7 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from rag import rag_service
 from vector_store import qdrant_service
-from database import SessionLocal, Document
+from database import SessionLocal, Document, init_db
 
 async def test_rag_system():
     """
@@ -23,13 +23,14 @@ async def test_rag_system():
     print(f"Qdrant Collection: {os.getenv('QDRANT_COLLECTION_NAME', 'book_embeddings')}")
     
     # Check database
+    init_db()
     db = SessionLocal()
     try:
         doc_count = db.query(Document).count()
         print(f"Documents in database: {doc_count}")
         
         if doc_count > 0:
-            sample_docs = db.query(Document).limit(2).all()
+            sample_docs = db.query(Document.title, Document.section).limit(2).all()
             print("Sample documents:")
             for doc in sample_docs:
                 print(f"  - {doc.title} (Section: {doc.section})")
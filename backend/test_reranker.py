@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from reranker import LexicalScorer, RerankService
+
+HITS = [
+    {"id": "a", "text": "Gazebo simulates sensors and physics.", "score": 0.9},
+    {"id": "b", "text": "A humanoid keeps its balance with the zero moment point.", "score": 0.8},
+    {"id": "c", "text": "Balance control and the zero moment point of a walking humanoid.", "score": 0.7},
+]
+
+
+class SlowScorer:
+    name = "slow"
+
+    def score(self, query, texts):
+        time.sleep(0.2)
+        return LexicalScorer().score(query, texts)
+
+
+def service(scorer=None, enabled=True):
+    rerank = RerankService(scorer)
+    rerank.enabled = enabled
+    return rerank
+
+
+def test_lexical_scorer_ranks_by_query_terms():
+    scores = LexicalScorer().score("How does a humanoid keep its balance?", [hit["text"] for hit in HITS])
+    assert scores[0] == 0 and scores[1] > 0 and scores[2] > 0
+    # Stopwords alone score nothing
+    assert not LexicalScorer().score("what is the", [hit["text"] for hit in HITS]).any()
+
+
+def test_rerank_reorders_and_keeps_the_limit():
+    reranked = asyncio.run(service(LexicalScorer()).rerank("zero moment point balance", HITS, limit=2))
+    assert [hit["id"] for hit in reranked] == ["b", "c"] and all("rerank_score" in hit for hit in reranked)
+    # Disabled: vector order, cut to the limit
+    assert asyncio.run(service(enabled=False).rerank("balance", HITS, limit=2)) == HITS[:2]
+
+
+def test_slow_scorer_falls_back_to_vector_order():
+    reranked = asyncio.run(service(SlowScorer()).rerank("zero moment point", HITS, limit=2, budget_ms=20))
+    assert reranked == HITS[:2]
+
+
+if __name__ == "__main__":
+    test_lexical_scorer_ranks_by_query_terms()
+    test_rerank_reorders_and_keeps_the_limit()
+    test_slow_scorer_falls_back_to_vector_order()
+    print("All reranker tests passed!")
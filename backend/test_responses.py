@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+
+from rag import shape_sources
+
+SOURCES = [{"id": "p1", "doc_id": "intro", "text": "Physical AI is embodied.", "score": 0.9,
+            "vector": [0.1, 0.2], "metadata": {"title": "Intro"}}]
+
+
+def test_source_modes():
+    assert shape_sources(SOURCES, "compact") == [{"id": "p1", "doc_id": "intro", "score": 0.9,
+                                                  "metadata": {"title": "Intro"}}]
+    assert shape_sources(SOURCES, "full")[0]["text"] == "Physical AI is embodied."
+    assert "vector" not in shape_sources(SOURCES, "full")[0]
+    assert shape_sources(SOURCES, "none") == []
+
+
+def test_large_responses_are_compressed():
+    from main import app
+
+    client = TestClient(app)
+    response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] in ("gzip", "br")
+    assert response.json()["paths"]["/chat"]["post"]["parameters"][0]["name"] == "sources"
+    # Small bodies are sent as they are
+    assert "content-encoding" not in client.get("/stats").headers
+
+
+if __name__ == "__main__":
+    test_source_modes()
+    test_large_responses_are_compressed()
+    print("All response tests passed!")
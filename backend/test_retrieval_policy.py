@@ -0,0 +1,32 @@
+from retrieval_policy import AdaptivePolicy, NO_MATCH, CONFIDENT, DEFAULT
+
+
+def docs(*scores):
+    return [{"text": f"chunk {i} " * 20, "score": score} for i, score in enumerate(scores)]
+
+
+def test_branches_follow_the_score_distribution():
+    policy = AdaptivePolicy()
+    policy.enabled, policy.min_score, policy.dominance_margin, policy.confident_sources = True, 0.3, 0.15, 2
+
+    no_match = policy.decide(docs(0.2, 0.1), 5, 4000)
+    assert no_match.branch == NO_MATCH and no_match.prompt_tokens_saved > 0
+
+    confident = policy.decide(docs(0.9, 0.5, 0.45, 0.4), 5, 4000)
+    assert (confident.branch, confident.sources, confident.max_context_length) == (CONFIDENT, 2, 1600)
+    assert confident.max_tokens < policy.default_max_tokens
+
+    # A lone hit above the threshold dominates; close scores keep the full context
+    assert policy.decide(docs(0.6, 0.2), 5, 4000).branch == CONFIDENT
+    assert policy.decide(docs(0.7, 0.65, 0.6), 5, 4000).branch == DEFAULT
+
+    policy.record(no_match, 3.0, 0)
+    policy.record(confident, 800.0, 300)
+    stats = policy.stats()
+    assert stats[NO_MATCH]["completions_skipped"] == 1
+    assert stats[CONFIDENT]["tokens_used"] == 300 and stats[CONFIDENT]["latency_p50_ms"] == 800.0
+
+
+if __name__ == "__main__":
+    test_branches_follow_the_score_distribution()
+    print("All retrieval policy tests passed!")
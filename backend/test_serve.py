@@ -0,0 +1,76 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_workers import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_workers_serve_one_socket_and_stop_on_sigterm():
+    port = free_port()
+    tmp = tempfile.mkdtemp()
+    env = {**os.environ, "WARMUP_ENABLED": "false", "NEON_DB_URL": f"sqlite:///{tmp}/rag_chatbot.db",
+           "CHUNK_STORE_PATH": os.path.join(tmp, "chunk_store.db")}
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", "2",
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            assert time.monotonic() < deadline, "serve.py did not start"
+            time.sleep(0.1)
+        # Both workers accept on the inherited socket; keep-alive off so requests spread
+        for _ in range(10):
+            assert httpx.get(f"http://127.0.0.1:{port}/health", timeout=5,
+                             headers={"Connection": "close"}).json()["status"] == "healthy"
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+        try:
+            os.killpg(server.pid, signal.SIGKILL)  # workers left behind, if any
+            leftover = True
+        except ProcessLookupError:
+            leftover = False
+    assert not leftover
+
+
+def crash(sock, log_level):
+    raise RuntimeError("bad environment")
+
+
+def test_supervisor_backs_off_and_gives_up_on_crashing_workers():
+    import socket
+
+    from serve import supervise
+
+    handlers = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    sock = socket.socket()
+    start = time.monotonic()
+    try:
+        assert supervise(sock, 1, "warning", worker=crash, backoff=0.05, max_quick_exits=4) == 1
+    finally:
+        sock.close()
+        signal.signal(signal.SIGTERM, handlers[0])
+        signal.signal(signal.SIGINT, handlers[1])
+    # Three restarts, after 0.05 + 0.1 + 0.2 s
+    assert time.monotonic() - start >= 0.35
+
+
+if __name__ == "__main__":
+    test_workers_serve_one_socket_and_stop_on_sigterm()
+    test_supervisor_backs_off_and_gives_up_on_crashing_workers()
+    print("All serve tests passed!")
@@ -0,0 +1,108 @@
+import os
+import tempfile
+
+import numpy as np
+
+from chunk_store import ChunkStore, content_key, point_id_for
+from snapshot import export_snapshot, import_snapshot, pack_strings, unpack_strings, quantize
+
+
+def test_string_columns_round_trip():
+    values = ["intro", "", None, "اردو میں خلاصہ", "a" * 5000]
+    blob, offsets = pack_strings(values)
+    assert unpack_strings(blob, offsets) == ["intro", "", "", "اردو میں خلاصہ", "a" * 5000]
+    assert unpack_strings(*pack_strings([])) == []
+
+
+def test_int8_vectors_keep_their_neighbours():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, 64)).astype(np.float32)
+    codes, scales = quantize(vectors)
+    restored = codes.astype(np.float32) * scales[:, None]
+    assert np.abs(restored - vectors).max() <= scales.max() / 2 + 1e-6
+
+    query = vectors[0] + 0.1 * rng.standard_normal(64).astype(np.float32)
+    assert np.argsort(-(restored @ query))[0] == np.argsort(-(vectors @ query))[0] == 0
+
+
+def test_chunk_store_dump_and_load():
+    def ref(doc_id, position, text):
+        key = content_key(text)
+        return point_id_for(key), key, doc_id, position, text, {"section": doc_id}
+
+    source = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    source.add_refs([ref("intro", 0, "Physical AI."), ref("intro", 1, "License.")])
+    source.add_refs([ref("ros2", 0, "ROS 2 uses DDS."), ref("ros2", 1, "License.")])
+
+    target = ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    target.add_refs([ref("stale", 0, "Replaced by the load.")])
+    target.load(*source.dump())
+    assert target.stats() == source.stats() == {"chunks": 3, "references": 4, "shared_chunks": 1}
+    assert target.fingerprints(["intro", "ros2", "stale"]) == source.fingerprints(["intro", "ros2", "stale"])
+
+
+def test_export_and_import_round_trip():
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from answer_index import AnswerIndex
+    from database import Base, Document, upsert_document
+    from vector_store import QdrantService
+
+    def service():
+        instance = QdrantService()
+        instance.client, instance._connected = QdrantClient(":memory:"), True
+        instance._create_collection()
+        return instance
+
+    def database():
+        engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'documents.db')}")
+        Base.metadata.create_all(bind=engine)
+        return sessionmaker(bind=engine)
+
+    texts = {"intro": "Physical AI acts in the world.", "ros2": "ROS 2 uses DDS."}
+    source, source_store = service(), ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db"))
+    source_store.add_refs([(point_id_for(content_key(text)), content_key(text), doc_id, 0, text, {})
+                           for doc_id, text in texts.items()])
+    rng = np.random.default_rng(0)
+    source.client.upsert(source.collection_name, points=[
+        models.PointStruct(id=point_id_for(content_key(text)), vector=rng.standard_normal(768).tolist(),
+                           payload={"doc_id": doc_id})
+        for doc_id, text in texts.items()
+    ])
+
+    source_db = database()
+    with source_db() as db:
+        for doc_id, text in texts.items():
+            upsert_document(db, doc_id, doc_id.title(), text, "main")
+        db.commit()
+
+    path = os.path.join(tempfile.mkdtemp(), "index.npz")
+    assert export_snapshot(path, service=source, store=source_store, session_factory=source_db)["documents"] == 2
+
+    # Answers precomputed before the import: one from the imported corpus, one from an older "ros2"
+    answers = AnswerIndex(os.path.join(tempfile.mkdtemp(), "answers.db"))
+    answers.put("What is Physical AI?", "en", [1.0, 0.0], "It acts.", [], source_store.fingerprints(["intro"]))
+    answers.put("What is ROS 2?", "en", [0.0, 1.0], "Middleware.", [], {"ros2": "outdated"})
+
+    target, target_store, target_db = service(), ChunkStore(os.path.join(tempfile.mkdtemp(), "chunks.db")), database()
+    import_snapshot(path, target="qdrant", service=target, store=target_store, session_factory=target_db,
+                    answers=answers)
+    assert target.client.count(target.collection_name).count == 2
+    assert target_store.stats() == source_store.stats()
+    point_id = point_id_for(content_key(texts["ros2"]))
+    assert target_store.get_many([point_id])[point_id]["text"] == texts["ros2"]
+    with target_db() as db:
+        assert db.query(Document).filter(Document.doc_id == "ros2").one().content == texts["ros2"]
+    assert answers.count() == {"en": 1, "en (stale)": 1}
+    assert answers.exact("What is Physical AI?") is not None and answers.exact("What is ROS 2?") is None
+    answers.close()
+
+
+if __name__ == "__main__":
+    test_string_columns_round_trip()
+    test_int8_vectors_keep_their_neighbours()
+    test_chunk_store_dump_and_load()
+    test_export_and_import_round_trip()
+    print("All snapshot tests passed!")
@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+from bench_startup import BACKEND_DIR, measure_import
+
+# Generous enough for a loaded CI box; the pre-lazy-init baseline was ~3.3 s
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "2000"))
+
+
+def test_import_main_is_lazy():
+    snippet = (
+        "import json, sys, main\n"
+        "print(json.dumps({'modules': [m for m in ('qdrant_client', 'google.generativeai') if m in sys.modules],"
+        " 'qdrant_probed': main.qdrant_service._connected is not None}))"
+    )
+    result = subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    state = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert state["modules"] == []
+    assert state["qdrant_probed"] is False
+
+
+def test_import_main_within_budget():
+    best = min(measure_import()[0] for _ in range(3))
+    assert best <= IMPORT_BUDGET_MS, f"import main took {best:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+
+if __name__ == "__main__":
+    test_import_main_is_lazy()
+    test_import_main_within_budget()
+    print("All startup tests passed!")
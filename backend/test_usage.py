@@ -0,0 +1,50 @@
+import pytest
+
+from usage import UsageService, BudgetExceeded
+
+MESSAGES = [{"role": "user", "content": "What is ROS 2?"}]
+
+
+def service(**budgets):
+    usage = UsageService()
+    usage.request_budget = budgets.get("request", 0)
+    usage.daily_budget = budgets.get("daily_soft", 0)
+    usage.daily_limit = budgets.get("daily_hard", 0)
+    usage.flush_size = 10 ** 6  # keep everything in memory
+    return usage
+
+
+def test_request_usage_is_summed_and_capped():
+    usage = service(request=1000)
+    token = usage.begin_request()
+    usage.record("openrouter", "m", MESSAGES, "answer", prompt_tokens=600, completion_tokens=100)
+    # Provider didn't report counts: the tokenizer fills them in
+    event = usage.record("gemini", "g", MESSAGES, "jawab", purpose="translation")
+    assert event.prompt_tokens > 0 and event.completion_tokens > 0
+    assert usage.request_tokens() == 700 + event.total_tokens
+
+    # What is left of the request budget bounds the next completion
+    assert usage.route("openrouter", MESSAGES, 1024).max_tokens < 300
+    usage.record("openrouter", "m", MESSAGES, "x", prompt_tokens=250, completion_tokens=1)
+    with pytest.raises(BudgetExceeded):
+        usage.route("openrouter", MESSAGES, 1024)
+    assert usage.end_request(token) > 950
+    assert usage.request_tokens() == 0
+
+
+def test_daily_budgets_route_to_cheaper_model_then_refuse():
+    usage = service(daily_soft=500, daily_hard=1000)
+    assert usage.route("openrouter", MESSAGES, 512).model is None
+
+    usage.record("openrouter", "m", MESSAGES, "a", prompt_tokens=400, completion_tokens=200)
+    assert usage.route("openrouter", MESSAGES, 512).model == usage.budget_models["openrouter"]
+
+    usage.record("openrouter", "m", MESSAGES, "a", prompt_tokens=400, completion_tokens=200)
+    with pytest.raises(BudgetExceeded):
+        usage.route("gemini", MESSAGES, 512)
+
+
+if __name__ == "__main__":
+    test_request_usage_is_summed_and_capped()
+    test_daily_budgets_route_to_cheaper_model_then_refuse()
+    print("All usage tests passed!")
@@ -0,0 +1,46 @@
+import asyncio
+
+from warmup import WarmupService
+
+
+async def _failing():
+    raise RuntimeError("connection refused")
+
+
+async def _slow():
+    await asyncio.sleep(10)
+
+
+def test_failed_or_slow_steps_do_not_keep_the_instance_out():
+    service = WarmupService({"database": _failing, "tokenizer": _slow})
+    service.queries, service.timeout = [], 0.05
+    assert not service.ready
+
+    asyncio.run(service.run())
+    report = service.report()
+    assert report["ready"] and report["duration_ms"] < 1000
+    assert report["steps"]["database"]["status"] == "failed: connection refused"
+    assert "tokenizer" not in report["steps"]
+
+
+def test_readiness_is_reported_apart_from_liveness():
+    from fastapi.testclient import TestClient
+    from main import app
+    from warmup import warmup_service
+
+    client = TestClient(app)
+    ready = warmup_service.ready
+    try:
+        warmup_service.ready = False
+        assert client.get("/health").status_code == 200
+        assert client.get("/health/ready").status_code == 503
+        warmup_service.ready = True
+        assert client.get("/health/ready").json()["ready"] is True
+    finally:
+        warmup_service.ready = ready
+
+
+if __name__ == "__main__":
+    test_failed_or_slow_steps_do_not_keep_the_instance_out()
+    test_readiness_is_reported_apart_from_liveness()
+    print("All warm-up tests passed!")
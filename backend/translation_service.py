@@ -6,9 +6,9 @@ import json
 
 from gemini_service import gemini_service
 from openrouter import openrouter_service
+from usage import BudgetExceeded
+from prompts import build_translation_messages, translation_budget
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class TranslationRequest(BaseModel):
@@ -46,33 +46,23 @@ class TranslationService:
             )
 
         try:
-            # Create a prompt for translation
-            if source_lang == "en" and target_lang == "ur":
-                prompt = f"Translate the following English text to Urdu. Only respond with the translated text and nothing else:\n\n{text}"
-            elif source_lang == "ur" and target_lang == "en":
-                prompt = f"Translate the following Urdu text to English. Only respond with the translated text and nothing else:\n\n{text}"
-            else:
+            if (source_lang, target_lang) not in (("en", "ur"), ("ur", "en")):
                 raise ValueError(f"Translation from {source_lang} to {target_lang} is not supported")
 
-            # Prepare messages for the language model
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a professional translator. Accurately translate between English and Urdu. Only return the translated text without any additional commentary."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+            # Prepare messages for the language model, sized to the input
+            messages = build_translation_messages(
+                text, self.supported_languages[source_lang], self.supported_languages[target_lang]
+            )
+            max_tokens = translation_budget(text, source_lang, target_lang)
 
             # Try Gemini service first (if available)
-            if gemini_service.model:
+            if gemini_service.available:
                 try:
                     response = await gemini_service.get_chat_completion(
                         messages=messages,
                         temperature=0.1,  # Low temperature for more accurate translations
-                        max_tokens=2048
+                        max_tokens=max_tokens,
+                        purpose="translation"
                     )
 
                     return TranslationResponse(
@@ -81,6 +71,8 @@ class TranslationService:
                         target_lang=target_lang,
                         tokens_used=response.tokens_used
                     )
+                except BudgetExceeded:
+                    raise
                 except Exception as e:
                     logger.warning(f"Gemini translation failed: {e}. Falling back to OpenRouter.")
 
@@ -89,7 +81,8 @@ class TranslationService:
                 response = await openrouter_service.get_chat_completion(
                     messages=messages,
                     temperature=0.1,  # Low temperature for more accurate translations
-                    max_tokens=2048
+                    max_tokens=max_tokens,
+                    purpose="translation"
                 )
 
                 return TranslationResponse(
@@ -98,6 +91,8 @@ class TranslationService:
                     target_lang=target_lang,
                     tokens_used=response.tokens_used
                 )
+            except BudgetExceeded:
+                raise
             except Exception as e:
                 logger.error(f"OpenRouter translation failed: {e}")
 
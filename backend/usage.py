@@ -0,0 +1,312 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from config import load_environment
+from tokens import count_tokens
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceeded(Exception):
+    """Raised by a provider call that would exceed the per-request or daily token limit"""
+
+
+@dataclass
+class UsageEvent:
+    provider: str
+    model: str
+    purpose: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    created_at: float
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class Route:
+    """How a provider call should be made under the current budgets"""
+    model: Optional[str]  # None keeps the provider's configured model
+    max_tokens: int
+    reason: str = "within budget"
+
+
+class RequestUsage:
+    """Tokens spent by the provider calls of one /chat request"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.tokens = 0
+
+
+_current_request: contextvars.ContextVar[Optional[RequestUsage]] = contextvars.ContextVar("request_usage", default=None)
+
+
+def _utc(timestamp: float) -> datetime:
+    """Naive UTC datetime, as stored by the models in database.py"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def message_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+class UsageService:
+    """
+    Records prompt and completion tokens for every provider call, aggregates them in memory
+    and flushes them to the usage_records table in batches.
+
+    Budgets:
+    - REQUEST_TOKEN_BUDGET caps what one request may spend across its calls (answer + translation);
+      completions are shortened to fit and a call that cannot fit is refused
+    - DAILY_TOKEN_BUDGET (soft): past it, calls are routed to the cheaper *_BUDGET_MODEL
+    - DAILY_TOKEN_LIMIT (hard): past it, no calls are made and answers come from caches and extracts
+
+    Daily totals combine this process' unflushed usage with what every worker has flushed,
+    re-read at each flush, so the budgets hold across workers to within one flush interval.
+    """
+
+    def __init__(self):
+        self.request_budget = int(os.getenv("REQUEST_TOKEN_BUDGET", "0"))  # 0 = unlimited
+        self.daily_budget = int(os.getenv("DAILY_TOKEN_BUDGET", "0"))
+        self.daily_limit = int(os.getenv("DAILY_TOKEN_LIMIT", "0"))
+        self.budget_models = {
+            "openrouter": os.getenv("OPENROUTER_BUDGET_MODEL", "openai/gpt-4o-mini"),
+            "gemini": os.getenv("GEMINI_BUDGET_MODEL", "gemini-2.0-flash-lite"),
+        }
+        # {"model": [USD per 1K prompt tokens, USD per 1K completion tokens]}
+        self.prices: Dict[str, List[float]] = json.loads(os.getenv("USAGE_PRICES", "{}"))
+        self.flush_size = int(os.getenv("USAGE_FLUSH_SIZE", "50"))
+        self.flush_interval = float(os.getenv("USAGE_FLUSH_INTERVAL", "30"))
+
+        self._lock = threading.Lock()
+        self._pending: List[UsageEvent] = []
+        self._totals: Dict[str, Dict[str, Dict[str, float]]] = {}  # today -> "provider/model" -> counters
+        self._flushed_today = 0  # tokens every worker has flushed today, as of the last flush
+        self._unflushed_today = 0
+        self._day = self._today()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    # ---------- per-request accounting ----------
+
+    def begin_request(self) -> contextvars.Token:
+        return _current_request.set(RequestUsage(self.request_budget))
+
+    def end_request(self, token: contextvars.Token) -> int:
+        """Tokens the request spent across all its provider calls"""
+        usage = _current_request.get()
+        _current_request.reset(token)
+        return usage.tokens if usage else 0
+
+    def request_tokens(self) -> int:
+        usage = _current_request.get()
+        return usage.tokens if usage else 0
+
+    # ---------- budgets ----------
+
+    def tokens_today(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._flushed_today + self._unflushed_today
+
+    def route(self, provider: str, messages: List[Dict[str, Any]], max_tokens: int) -> Route:
+        """Pick the model and completion budget for a call, or raise BudgetExceeded"""
+        today = self.tokens_today()
+        if self.daily_limit and today >= self.daily_limit:
+            raise BudgetExceeded(f"daily token limit of {self.daily_limit} reached")
+
+        request = _current_request.get()
+        if request is not None and request.budget:
+            remaining = request.budget - request.tokens - count_tokens(message_text(messages))
+            if remaining < min(max_tokens, 64):
+                raise BudgetExceeded(f"request token budget of {request.budget} reached")
+            max_tokens = min(max_tokens, remaining)
+
+        if self.daily_budget and today >= self.daily_budget:
+            return Route(self.budget_models.get(provider), max_tokens, "daily budget exceeded")
+        return Route(None, max_tokens)
+
+    # ---------- recording ----------
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = self.prices.get(model, [0.0, 0.0])
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, provider: str, model: str, messages: List[Dict[str, Any]], completion: str,
+               prompt_tokens: int = 0, completion_tokens: int = 0, purpose: str = "chat") -> UsageEvent:
+        """
+        Record one provider call. Counts the provider reports are used as-is; missing ones are
+        counted with the tokenizer from the prompt and completion text.
+        """
+        event = UsageEvent(
+            provider=provider,
+            model=model,
+            purpose=purpose,
+            prompt_tokens=prompt_tokens or count_tokens(message_text(messages)),
+            completion_tokens=completion_tokens or count_tokens(completion),
+            cost_usd=0.0,
+            created_at=time.time(),
+        )
+        event.cost_usd = self.cost(model, event.prompt_tokens, event.completion_tokens)
+
+        request = _current_request.get()
+        if request is not None:
+            request.tokens += event.total_tokens
+
+        with self._lock:
+            self._roll_day()
+            self._pending.append(event)
+            self._unflushed_today += event.total_tokens
+            counters = self._totals.setdefault(self._day, {}).setdefault(
+                f"{provider}/{model}",
+                {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+            )
+            counters["calls"] += 1
+            counters["prompt_tokens"] += event.prompt_tokens
+            counters["completion_tokens"] += event.completion_tokens
+            counters["cost_usd"] += event.cost_usd
+            flush_due = len(self._pending) >= self.flush_size
+
+        if flush_due:
+            self._schedule_flush()
+        return event
+
+    def _roll_day(self):
+        # Call with the lock held
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._totals = {}
+            self._flushed_today = 0
+            self._unflushed_today = sum(event.total_tokens for event in self._pending
+                                        if self._day_of(event.created_at) == today)
+
+    @staticmethod
+    def _day_of(timestamp: float) -> str:
+        return _utc(timestamp).strftime("%Y-%m-%d")
+
+    # ---------- flushing ----------
+
+    def _schedule_flush(self):
+        try:
+            asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            self.flush_sync()  # scripts without a running loop
+
+    async def flush(self):
+        await asyncio.to_thread(self.flush_sync)
+
+    def flush_sync(self):
+        """Write pending events in one batch and refresh the all-worker daily total"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        from database import SessionLocal, UsageRecord
+        from sqlalchemy import func
+
+        db = SessionLocal()
+        try:
+            if batch:
+                db.bulk_insert_mappings(UsageRecord, [
+                    {**asdict(event), "created_at": _utc(event.created_at)}
+                    for event in batch
+                ])
+                db.commit()
+            start = datetime.strptime(self._today(), "%Y-%m-%d")
+            flushed = db.query(
+                func.coalesce(func.sum(UsageRecord.prompt_tokens + UsageRecord.completion_tokens), 0)
+            ).filter(UsageRecord.created_at >= start).scalar()
+            with self._lock:
+                self._roll_day()
+                self._flushed_today = int(flushed)
+                self._unflushed_today = sum(event.total_tokens for event in self._pending)
+            if batch:
+                logger.info(f"Flushed {len(batch)} usage records")
+        except Exception as e:
+            logger.error(f"Could not flush usage records: {e}")
+            with self._lock:
+                self._pending = batch + self._pending  # retried with the next flush
+        finally:
+            db.close()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Flush periodically from the API process (called from the lifespan)"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # ---------- reporting ----------
+
+    def summary(self, days: int = 7) -> Dict[str, Any]:
+        """Per-day, per-model totals from the database plus this process' unflushed usage"""
+        from database import SessionLocal, UsageRecord
+        from sqlalchemy import func
+
+        db = SessionLocal()
+        try:
+            day = func.date(UsageRecord.created_at)
+            rows = db.query(
+                day, UsageRecord.provider, UsageRecord.model, UsageRecord.purpose, func.count(),
+                func.sum(UsageRecord.prompt_tokens), func.sum(UsageRecord.completion_tokens),
+                func.sum(UsageRecord.cost_usd)
+            ).filter(
+                UsageRecord.created_at >= _utc(time.time() - days * 86400)
+            ).group_by(day, UsageRecord.provider, UsageRecord.model, UsageRecord.purpose).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            pending = len(self._pending)
+            this_process = {key: dict(counters) for key, counters in self._totals.get(self._day, {}).items()}
+        return {
+            "tokens_today": self.tokens_today(),
+            "this_process_today": this_process,
+            "budgets": {
+                "request": self.request_budget or None,
+                "daily_soft": self.daily_budget or None,
+                "daily_hard": self.daily_limit or None,
+            },
+            "unflushed_records": pending,
+            "days": [
+                {"day": str(d), "provider": provider, "model": model, "purpose": purpose, "calls": calls,
+                 "prompt_tokens": int(prompt or 0), "completion_tokens": int(completion or 0),
+                 "cost_usd": round(float(cost or 0), 6)}
+                for d, provider, model, purpose, calls, prompt, completion, cost in rows
+            ],
+        }
+
+
+# Singleton instance
+usage_service = UsageService()
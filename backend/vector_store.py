@@ -1,20 +1,23 @@
 import asyncio
+import hashlib
 import logging
-import requests
-from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
-from qdrant_client.http.models import PointStruct
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple, TYPE_CHECKING
 import uuid
 from pydantic import BaseModel
 import os
 
+from config import load_environment
+from cache import get_cache, make_key
+from chunk_store import ChunkStore, chunk_store, content_key, point_id_for
+
+# qdrant_client takes over a second to import, so it is loaded on first connect
+if TYPE_CHECKING:
+    from qdrant_client.http import models
+
 # Load environment variables from .env file
-from dotenv import load_dotenv
-load_dotenv()
+load_environment()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EmbeddingRequest(BaseModel):
@@ -24,72 +27,261 @@ class EmbeddingRequest(BaseModel):
 class EmbeddingResponse(BaseModel):
     embeddings: List[float]
 
+class SearchFilters(BaseModel):
+    section: Optional[str] = None
+    doc_id: Optional[str] = None
+    heading_path: Optional[str] = None  # e.g. "Introduction > Why Physical AI"
+
+# Payload fields that get a keyword index so filtered searches stay on the HNSW path
+INDEXED_PAYLOAD_FIELDS = ["section", "doc_id", "heading_path"]
+
+# Everything Qdrant keeps per point; chunk text and display metadata live in the chunk store.
+# "text" is still requested so points written before the chunk store can be hydrated.
+PAYLOAD_FIELDS = ["doc_id", "section", "heading_path", "chunk_index"]
+_SEARCH_PAYLOAD_FIELDS = PAYLOAD_FIELDS + ["text"]
+
+def placeholder_embeddings(texts: List[str], dim: int = 768) -> List[List[float]]:
+    """
+    Deterministic hash-based embeddings for when no embedding API is available. The hash is
+    process-independent (unlike hash()), so every worker and every run agrees on a text's vector.
+    """
+    import numpy as np
+
+    if not texts:
+        return []
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little") for text in texts],
+        dtype=np.int64
+    )
+    values = ((hashes[:, None] + np.arange(dim, dtype=np.int64) * 1337) % 10000 - 5000) / 5000.0
+    norms = np.linalg.norm(values, axis=1, keepdims=True)
+    return (values / np.where(norms == 0, 1, norms)).tolist()
+
+def relevant_hits(points: list, min_score: float = 0.05, fallback: int = 2) -> list:
+    """
+    Only results with a meaningful score (to filter out irrelevant matches); if none has one,
+    the top `fallback` results regardless of score. evaluation.py sweeps both settings.
+    """
+    hits = [hit for hit in points if hit.score > min_score]
+    if not hits and points:
+        logger.info("No results above threshold, returning top results regardless of score")
+        hits = points[:fallback]
+    return hits
+
 class QdrantService:
     def __init__(self):
-        # Get configuration from environment variables
+        # Get configuration from environment variables; no network until first use
         self.host = os.getenv("QDRANT_HOST", "localhost")
         self.port = int(os.getenv("QDRANT_PORT", "6333"))
         self.api_key = os.getenv("QDRANT_API_KEY")
         self.collection_name = os.getenv("QDRANT_COLLECTION_NAME", "book_embeddings")
+        self.timeout = int(os.getenv("QDRANT_TIMEOUT", "5"))
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        # Similarity a hit needs to be kept, and how many top hits are kept when none has it
+        self.min_score = float(os.getenv("SEARCH_MIN_SCORE", "0.05"))
+        self.fallback_results = int(os.getenv("SEARCH_FALLBACK_RESULTS", "2"))
+
+        # Optional read-only local index (see local_index.py); when loaded, searches skip Qdrant
+        # until this process writes to the live collection, which the index doesn't reflect
+        self.local_index_path = os.getenv("LOCAL_INDEX_PATH")
+        self.local_index = None
+        self._local_index_checked = False
+        self._local_index_stale = False
 
-        # Initialize Qdrant client and test connection
         self.client = None
-        self.connected = False
-
+        self._connected: Optional[bool] = None  # None until the first probe
+        self._probing = False
+        self._connect_lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        # Scripts connect on first access; the API server probes from its lifespan instead,
+        # and never blocks a request on a probe that is still in flight
+        if self._connected is None and not self._probing:
+            self.connect()
+        return bool(self._connected)
+
+    def connect(self) -> bool:
+        """Create the client, test the connection and ensure the collection exists (blocking)"""
+        with self._connect_lock:
+            if self._connected is not None:
+                return self._connected
+
+            from qdrant_client import QdrantClient
+
+            try:
+                if self.api_key:
+                    client = QdrantClient(
+                        url=self.host,
+                        api_key=self.api_key,
+                        port=self.port,
+                        https=True,
+                        timeout=self.timeout
+                    )
+                else:
+                    client = QdrantClient(host=self.host, port=self.port, timeout=self.timeout)
+
+                # Test connection
+                client.get_collections()
+                self.client = client
+                self._connected = True
+                logger.info("Successfully connected to Qdrant")
+            except Exception as e:
+                logger.warning(f"Could not connect to Qdrant: {e}. Running in mock mode.")
+                self.client = None
+                self._connected = False
+
+            # Create collection if connected and it doesn't exist
+            if self._connected:
+                self._create_collection()
+            return self._connected
+
+    def load_local_index(self):
+        """Load the local index, if LOCAL_INDEX_PATH points at one; again once it is rebuilt"""
+        if self.local_index is not None and self.local_index.rebuilt():
+            logger.info(f"Local index at {self.local_index_path} was rebuilt; reloading")
+            self.local_index, self._local_index_checked, self._local_index_stale = None, False, False
+        if not self._local_index_checked:
+            self._local_index_checked = True
+            if self.local_index_path and os.path.exists(os.path.join(self.local_index_path, "index.json")):
+                from local_index import LocalVectorIndex
+                try:
+                    self.local_index = LocalVectorIndex(self.local_index_path)
+                except Exception as e:
+                    # Retried on the next call rather than serving from Qdrant for good
+                    self._local_index_checked = False
+                    logger.error(f"Could not load local index from {self.local_index_path}: {e}")
+        return self.local_index
+
+    def _current_local_index(self):
+        """The local index, unless this process has changed the live collection since it was built"""
+        index = self.load_local_index()
+        if index is not None and self._local_index_stale and self.connected:
+            return None
+        return index
+
+    @property
+    def can_search(self) -> bool:
+        """True when searches can be served, from the local index or from Qdrant"""
+        return self.load_local_index() is not None or self.connected
+
+    async def probe(self) -> bool:
+        """Connect from a worker thread so startup probes can run concurrently"""
+        self._probing = True
+        return await asyncio.to_thread(self._probe_connect)
+
+    def _probe_connect(self) -> bool:
+        # Cleared by the thread itself, so a caller that stops waiting doesn't end the probe early
         try:
-            if self.api_key:
-                self.client = QdrantClient(
-                    url=self.host,
-                    api_key=self.api_key,
-                    port=self.port,
-                    https=True
-                )
-            else:
-                self.client = QdrantClient(host=self.host, port=self.port)
-
-            # Test connection
-            self.client.get_collections()
-            self.connected = True
-            logger.info("Successfully connected to Qdrant")
-        except Exception as e:
-            logger.warning(f"Could not connect to Qdrant: {e}. Running in mock mode.")
-            self.client = None
-            self.connected = False
-
-        # Create collection if connected and it doesn't exist
-        if self.connected:
-            self._create_collection()
+            return self.connect()
+        finally:
+            self._probing = False
 
     def _create_collection(self):
-        """Create Qdrant collection for storing document embeddings"""
+        """
+        Make sure the collection searches read exists. collection_name is normally an alias for a
+        versioned collection (see index_versions.py); a fresh install starts at version 1.
+        """
         try:
-            # Check if collection exists
+            # Check if collection exists, directly or as an alias
             collections = self.client.get_collections()
             collection_names = [col.name for col in collections.collections]
+            aliases = [alias.alias_name for alias in self.client.get_aliases().aliases]
 
-            if self.collection_name not in collection_names:
-                # Create a new collection with appropriate vector size for embedding model
-                # Using 768 dimensions, which is common for many embedding models
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE)
-                )
-                logger.info(f"Created Qdrant collection: {self.collection_name}")
-            else:
+            if self.collection_name in aliases:
+                logger.info(f"Qdrant collection alias {self.collection_name} already exists")
+            elif self.collection_name in collection_names:
                 logger.info(f"Qdrant collection {self.collection_name} already exists")
+                self._create_payload_indexes()
+            else:
+                from qdrant_client.http import models
+
+                version = f"{self.collection_name}_v1"
+                self.create_versioned_collection(version)
+                self.client.update_collection_aliases(change_aliases_operations=[
+                    models.CreateAliasOperation(create_alias=models.CreateAlias(
+                        collection_name=version, alias_name=self.collection_name
+                    ))
+                ])
+                logger.info(f"Created Qdrant collection {version} with alias {self.collection_name}")
         except Exception as e:
             logger.error(f"Error creating Qdrant collection: {e}")
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def create_versioned_collection(self, name: str, bulk: bool = False):
+        """
+        Create a collection with the book's vector and payload index settings. `bulk` turns HNSW
+        indexing off while the collection is filled (re-enabled by index_versions.py), so a
+        rebuild writes at full speed and the graph is built once.
+        """
+        from qdrant_client.http import models
+
+        # Using 768 dimensions, which is common for many embedding models
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=768, distance=models.Distance.COSINE),
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0) if bulk else None
+        )
+        self._create_payload_indexes(name)
+
+    def _create_payload_indexes(self, collection: Optional[str] = None):
+        """Create keyword payload indexes for the fields used in search filters"""
+        from qdrant_client.http import models
+
+        for field_name in INDEXED_PAYLOAD_FIELDS:
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection or self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+            except Exception as e:
+                logger.warning(f"Could not create payload index on '{field_name}': {e}")
+
+    @staticmethod
+    def _build_filter(filters: Optional[SearchFilters]) -> Optional["models.Filter"]:
+        """Translate search filters into a Qdrant payload filter"""
+        if filters is None:
+            return None
+
+        from qdrant_client.http import models
+
+        conditions = [
+            models.FieldCondition(key=field_name, match=models.MatchValue(value=value))
+            for field_name, value in filters.model_dump().items()
+            if value
+        ]
+        return models.Filter(must=conditions) if conditions else None
+
+    async def generate_embeddings(self, texts: List[str], cache: bool = False) -> List[List[float]]:
+        """
+        Generate embeddings for the given texts. With `cache` (search queries), repeats are served
+        from the embedding cache; chunks and sentences are embedded once and stored with the
+        point, so caching them would only hold hundreds of megabytes of float lists.
+        """
+        if not cache:
+            return await self._embed(texts)
+
+        embedding_cache = get_cache("embeddings")
+        keys = [make_key(self.embedding_model, text) for text in texts]
+        embeddings = [embedding_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            fresh = await self._embed([texts[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+                embedding_cache.set(keys[i], embedding)
+        return embeddings
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for the given texts using Gemini service
         """
-        import numpy as np
         try:
             from gemini_service import gemini_service
 
             # Check if we can use Gemini for embeddings
-            if gemini_service.api_key and gemini_service.model:
+            if gemini_service.available:
                 try:
                     # Try to use Gemini's embedding capabilities if available
                     return await gemini_service.generate_embeddings(texts)
@@ -105,129 +297,323 @@ class QdrantService:
         """
         Generate placeholder embeddings when API is unavailable
         """
-        import numpy as np
-        embeddings = []
-
-        for text in texts:
-            # Create a simple hash-based embedding to ensure some similarity for similar texts
-            # This is just for demonstration - real embeddings would be generated by the model
-            text_hash = hash(text) % (2**32)
-            embedding = []
-
-            # Generate a 768-dim vector based on the text content
-            for i in range(768):
-                val = (text_hash + i * 1337) % 10000
-                val = (val - 5000) / 5000.0  # Normalize between -1 and 1
-                embedding.append(val)
-
-            # Normalize the embedding vector to unit length (standard for embeddings)
-            magnitude = sum(x**2 for x in embedding) ** 0.5
-            if magnitude > 0:
-                embedding = [x / magnitude for x in embedding]
-
-            embeddings.append(embedding)
-
+        embeddings = placeholder_embeddings(texts)
         logger.info(f"Generated fallback embeddings for {len(texts)} text(s)")
         return embeddings
 
-    async def store_embeddings(self, texts: List[str], doc_ids: List[str], metadata: List[Dict[str, Any]]) -> List[str]:
+    async def store_embeddings(self, texts: List[str], doc_ids: List[str], metadata: List[Dict[str, Any]],
+                               replace: bool = False, collection: Optional[str] = None,
+                               store: Optional[ChunkStore] = None) -> List[str]:
         """
-        Store embeddings in Qdrant and return the IDs
+        Store embeddings in Qdrant and return the point ID of each chunk.
+
+        Chunks are content-addressed (chunk_store.content_key): a chunk whose normalized text is
+        already stored, in this batch or from another document, reuses that point and is not
+        embedded again; only its provenance is added. With `replace`, whatever the given documents
+        held before and did not store again is released, and points left without references are
+        deleted.
+
+        `collection` writes into a collection other than the live one (a rebuild, see
+        index_versions.py): points it lacks are copied with the live collection's vectors where
+        those exist, so only new text is embedded. Its texts and provenance go to `store`, a
+        staging chunk store applied when the collection goes live, instead of the live one.
+
+        Qdrant errors propagate; the chunk store is only written once the new points are stored.
         """
         if not self.connected:
             logger.warning("Qdrant not connected. Skipping embedding storage.")
             return [str(uuid.uuid4()) for _ in texts]  # Return mock IDs
 
-        try:
-            # Generate embeddings for the texts
-            embeddings = await self.generate_embeddings(texts)
-
-            # Prepare points for insertion
-            points = []
-            vector_ids = []
-
-            for i, (text, doc_id, meta) in enumerate(zip(texts, doc_ids, metadata)):
-                vector_id = str(uuid.uuid4())
-                vector_ids.append(vector_id)
-
-                points.append(
-                    PointStruct(
-                        id=vector_id,
-                        vector=embeddings[i],
-                        payload={
-                            "text": text,
-                            "doc_id": doc_id,
-                            **meta
-                        }
-                    )
-                )
-
-            # Store the vectors in Qdrant
+        from qdrant_client.http import models
+
+        target = collection or self.collection_name
+        store = store or chunk_store
+        keys = [content_key(text) for text in texts]
+        vector_ids = [point_id_for(key) for key in keys]
+        unique_ids = list(dict.fromkeys(vector_ids))
+        if target == self.collection_name:
+            existing = store.existing(unique_ids)
+        else:
+            existing = {str(point.id) for point in self._retrieve(target, unique_ids, with_vectors=False)}
+
+        # One vector per distinct chunk the target lacks
+        new_texts: Dict[str, str] = {}
+        for vector_id, text in zip(vector_ids, texts):
+            if vector_id not in existing:
+                new_texts.setdefault(vector_id, text)
+        embeddings: Dict[str, List[float]] = {}
+        if target != self.collection_name and new_texts:
+            embeddings.update((str(point.id), point.vector)
+                              for point in self._retrieve(self.collection_name, list(new_texts), with_vectors=True))
+        to_embed = [vector_id for vector_id in new_texts if vector_id not in embeddings]
+        embeddings.update(zip(to_embed, await self.generate_embeddings([new_texts[i] for i in to_embed])))
+
+        refs = [
+            (vector_id, key, doc_id, meta.get("chunk_index", position), text,
+             {k: v for k, v in meta.items() if k not in ("doc_id", "chunk_index")})
+            for position, (vector_id, key, text, doc_id, meta)
+            in enumerate(zip(vector_ids, keys, texts, doc_ids, metadata))
+        ]
+        keep = {(vector_id, doc_id, position) for vector_id, _, doc_id, position, _, _ in refs}
+
+        # New points go to Qdrant before anything is committed to the chunk store: if the upsert
+        # fails, the store still describes what the collection holds and a retry embeds them again.
+        # Until their texts are added below, searches skip them (see _hydrate).
+        if embeddings:
+            occurrences = self._prospective_provenance(store, list(embeddings), refs, set(doc_ids) if replace else set(), keep)
             self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
+                collection_name=target,
+                points=[models.PointStruct(id=vector_id, vector=embedding,
+                                           payload=self._payload(occurrences[vector_id]))
+                        for vector_id, embedding in embeddings.items()],
+                # A rebuild is not read until it is validated: don't wait for each batch to apply
+                wait=target == self.collection_name
             )
 
-            logger.info(f"Stored {len(points)} embeddings in Qdrant")
-            return vector_ids
-
-        except Exception as e:
-            logger.error(f"Error storing embeddings in Qdrant: {e}")
-            # Return mock IDs on failure
-            return [str(uuid.uuid4()) for _ in texts]
-
-    async def search_similar(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        store.add_refs(refs)
+        if new_texts:
+            from attribution import attribution_service
+            try:
+                await attribution_service.index_sentences(new_texts)
+            except Exception as e:
+                # Citations embed missing sentences on demand; indexing doesn't depend on them
+                logger.warning(f"Could not store sentence embeddings: {e}")
+            # New words may have entered the spelling vocabulary
+            from query_normalizer import query_normalizer
+            query_normalizer.invalidate()
+
+        orphaned, changed = [], []
+        if replace:
+            orphaned, changed = store.release(sorted(set(doc_ids)), keep)
+
+        # Points that existed already only get their merged provenance; orphans are deleted last
+        touched = [vector_id for vector_id in dict.fromkeys(vector_ids + changed) if vector_id not in embeddings]
+        payloads = {vector_id: self._payload(occurrences)
+                    for vector_id, occurrences in store.provenance(touched).items()}
+        self._update_points(payloads, orphaned, target)
+
+        if target == self.collection_name:
+            self._local_index_stale = True
+        logger.info(f"Stored {len(texts)} chunks in {target}: {len(embeddings)} new points "
+                    f"({len(to_embed)} embedded), {len(texts) - len(embeddings)} reused, {len(orphaned)} removed")
+        return vector_ids
+
+    @staticmethod
+    def _prospective_provenance(store: ChunkStore, point_ids: List[str], refs: list, released_docs: Set[str],
+                                keep: Set[Tuple[str, str, int]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        The occurrences store.provenance will report for the points once `refs` are added
+        and `released_docs` released, without committing either
+        """
+        found: Dict[str, Dict[Tuple[str, int], Dict[str, Any]]] = {point_id: {} for point_id in point_ids}
+        for point_id, occurrences in store.provenance(point_ids).items():
+            for occurrence in occurrences:
+                if (occurrence["doc_id"] not in released_docs
+                        or (point_id, occurrence["doc_id"], occurrence["position"]) in keep):
+                    found[point_id][(occurrence["doc_id"], occurrence["position"])] = occurrence
+        for point_id, _, doc_id, position, _, metadata in refs:
+            if point_id in found:
+                found[point_id][(doc_id, position)] = {"doc_id": doc_id, "position": position, "metadata": metadata}
+        return {point_id: [occurrences[key] for key in sorted(occurrences)] for point_id, occurrences in found.items()}
+
+    async def remove_documents(self, doc_ids: List[str], keep: Set[Tuple[str, str, int]] = frozenset()) -> int:
         """
-        Search for similar documents to the query
+        Release every chunk the documents hold, except the (point_id, doc_id, position) occurrences
+        in `keep`: points no other document shares are deleted, shared ones lose the documents from
+        their payload. Returns the number of points deleted.
         """
         if not self.connected:
+            return 0
+        orphaned, changed = chunk_store.release(sorted(set(doc_ids)), keep)
+        payloads = {vector_id: self._payload(occurrences)
+                    for vector_id, occurrences in chunk_store.provenance(changed).items()}
+        self._update_points(payloads, orphaned)
+        self._local_index_stale = True
+        logger.info(f"Removed {len(doc_ids)} document(s) from Qdrant: {len(orphaned)} points deleted")
+        return len(orphaned)
+
+    def _retrieve(self, collection: str, point_ids: List[str], with_vectors: bool) -> list:
+        points = []
+        for offset in range(0, len(point_ids), 256):
+            points.extend(self.client.retrieve(collection, point_ids[offset:offset + 256],
+                                               with_payload=False, with_vectors=with_vectors))
+        return points
+
+    def _update_points(self, payloads: Dict[str, Dict[str, Any]], orphaned: List[str],
+                       collection: Optional[str] = None):
+        """Replace the payloads of existing points in one request and delete orphaned points"""
+        from qdrant_client.http import models
+
+        collection = collection or self.collection_name
+        if payloads:
+            self.client.batch_update_points(
+                collection_name=collection,
+                update_operations=[
+                    models.OverwritePayloadOperation(overwrite_payload=models.SetPayload(payload=payload, points=[vector_id]))
+                    for vector_id, payload in payloads.items()
+                ]
+            )
+        if orphaned:
+            self.client.delete(collection_name=collection,
+                               points_selector=models.PointIdsList(points=orphaned))
+
+    @staticmethod
+    def _payload(occurrences: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Qdrant payload of a point: its filter fields over every occurrence. A field with one value
+        stays a scalar; a chunk shared by several documents gets a list, which Qdrant's match
+        conditions (and the local index) treat as matching any element.
+        """
+        payload: Dict[str, Any] = {}
+        for field_name in PAYLOAD_FIELDS:
+            values = []
+            for occurrence in occurrences:
+                value = occurrence["doc_id"] if field_name == "doc_id" else (
+                    occurrence["position"] if field_name == "chunk_index" else occurrence["metadata"].get(field_name)
+                )
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None and item not in values:
+                        values.append(item)
+            if not values:
+                continue
+            if field_name == "heading_path":  # already a list of prefixes
+                payload[field_name] = values
+            else:
+                payload[field_name] = values[0] if len(values) == 1 or field_name == "chunk_index" else values
+        return payload
+
+    @staticmethod
+    def _hydrate(hits, filters: Optional[SearchFilters] = None,
+                 stored: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Attach chunk text and metadata to search hits with one batched chunk store lookup"""
+        if stored is None:
+            stored = chunk_store.get_many([str(hit.id) for hit in hits])
+        results = []
+
+        for hit in hits:
+            payload = hit.payload or {}
+            chunk = stored.get(str(hit.id), {})
+            if not chunk and "text" not in payload:
+                # Upserted but not yet committed to the chunk store, or released and about to be
+                # deleted (or already deleted, for a local index built before the release)
+                continue
+            doc_id = payload.get("doc_id", "")
+            result = {
+                "id": str(hit.id),
+                "text": chunk.get("text", payload.get("text", "")),
+                "doc_id": doc_id[0] if isinstance(doc_id, list) else doc_id,
+                "score": hit.score,
+                "metadata": {
+                    **{k: v for k, v in payload.items() if k not in ["text", "doc_id"]},
+                    **chunk.get("metadata", {})
+                }
+            }
+            refs = chunk.get("refs")
+            if refs:
+                # Shared chunk: cite the first occurrence the filters allow, keep the others for attribution
+                first = next((ref for ref in refs if QdrantService._matches(ref, filters)), refs[0])
+                result["doc_id"] = first["doc_id"]
+                result["metadata"].update(first["metadata"], chunk_index=first["position"])
+                result["metadata"]["provenance"] = [
+                    {"doc_id": ref["doc_id"], "title": ref["metadata"].get("title"),
+                     "section": ref["metadata"].get("section")}
+                    for ref in refs
+                ]
+            if hit.vector is not None:
+                result["vector"] = hit.vector
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _matches(ref: Dict[str, Any], filters: Optional[SearchFilters]) -> bool:
+        if filters is None:
+            return True
+        if filters.doc_id and ref["doc_id"] != filters.doc_id:
+            return False
+        if filters.section and ref["metadata"].get("section") != filters.section:
+            return False
+        return not filters.heading_path or filters.heading_path in (ref["metadata"].get("heading_path") or [])
+
+    async def search_similar(self, query: str, limit: int = 5,
+                             filters: Optional[SearchFilters] = None,
+                             with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search for similar documents to the query, optionally restricted by payload filters.
+        With `with_vectors`, each hit also carries its stored embedding under "vector".
+        """
+        if not self.can_search:
             logger.warning("Qdrant not connected. Returning empty search results.")
             return []  # Return empty results when not connected
 
         try:
             # Generate embedding for the query
-            query_embedding = (await self.generate_embeddings([query]))[0]
-
-            # Search in Qdrant - using the correct syntax for the search method
-            # In newer versions of Qdrant client, use query method
-            search_results = self.client.query_points(
-                collection_name=self.collection_name,
-                query=query_embedding,
-                limit=limit
-            )
+            query_embedding = (await self.generate_embeddings([query], cache=True))[0]
 
-            # Format results
-            results = []
-            for hit in search_results.points:
-                # Only include results with a meaningful score (to filter out irrelevant matches)
-                if hit.score > 0.05:  # Adjust threshold as needed
-                    results.append({
-                        "text": hit.payload.get("text", ""),
-                        "doc_id": hit.payload.get("doc_id", ""),
-                        "score": hit.score,
-                        "metadata": {k: v for k, v in hit.payload.items()
-                                    if k not in ["text", "doc_id"]}
-                    })
-
-            logger.info(f"Found {len(results)} similar documents for query with scores > 0.05")
-
-            # If no results found with the threshold, try to return at least some results
-            if not results and search_results.points:
-                logger.info("No results above threshold, returning top results regardless of score")
-                for hit in search_results.points[:2]:  # Return top 2 results even if score is low
-                    results.append({
-                        "text": hit.payload.get("text", ""),
-                        "doc_id": hit.payload.get("doc_id", ""),
-                        "score": hit.score,
-                        "metadata": {k: v for k, v in hit.payload.items()
-                                    if k not in ["text", "doc_id"]}
-                    })
-
-            return results
+            local_index = self._current_local_index()
+            if local_index is not None:
+                points = local_index.search(query_embedding, limit, filters=filters, with_vectors=with_vectors)
+            else:
+                # Search in Qdrant - using the correct syntax for the search method
+                # In newer versions of Qdrant client, use query method
+                points = self.client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_embedding,
+                    query_filter=self._build_filter(filters),
+                    limit=limit,
+                    with_payload=_SEARCH_PAYLOAD_FIELDS,
+                    with_vectors=with_vectors
+                ).points
+
+            return self._hydrate(self._relevant(points), filters)
 
         except Exception as e:
             logger.error(f"Error searching in Qdrant: {e}")
             return []  # Return empty results on failure
 
+    def _relevant(self, points) -> list:
+        hits = relevant_hits(points, self.min_score, self.fallback_results)
+        logger.info(f"Found {len(hits)} similar documents for query with scores > {self.min_score}")
+        return hits
+
+    async def search_similar_batch(self, queries: List[str], limit: int = 5,
+                                   filters: Optional[SearchFilters] = None,
+                                   with_vectors: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        search_similar for several queries in one round trip: one embedding batch, one Qdrant
+        batch query and one chunk store lookup. Returns one result list per query.
+        """
+        if not self.can_search:
+            logger.warning("Qdrant not connected. Returning empty search results.")
+            return [[] for _ in queries]
+
+        try:
+            embeddings = await self.generate_embeddings(queries, cache=True)
+
+            local_index = self._current_local_index()
+            if local_index is not None:
+                batches = [local_index.search(embedding, limit, filters=filters, with_vectors=with_vectors)
+                           for embedding in embeddings]
+            else:
+                from qdrant_client.http import models
+
+                query_filter = self._build_filter(filters)
+                responses = self.client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=[
+                        models.QueryRequest(query=embedding, filter=query_filter, limit=limit,
+                                            with_payload=_SEARCH_PAYLOAD_FIELDS, with_vector=with_vectors)
+                        for embedding in embeddings
+                    ]
+                )
+                batches = [response.points for response in responses]
+
+            hits = [self._relevant(points) for points in batches]
+            stored = chunk_store.get_many(list({str(hit.id) for batch in hits for hit in batch}))
+            return [self._hydrate(batch, filters, stored) for batch in hits]
+
+        except Exception as e:
+            logger.error(f"Error batch searching in Qdrant: {e}")
+            return [[] for _ in queries]
+
 # Singleton instance
 qdrant_service = QdrantService()
\ No newline at end of file
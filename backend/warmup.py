@@ -0,0 +1,149 @@
+"""
+Warm-up run by each worker after boot, so the first users don't pay for a cold instance.
+
+Opens the pooled connections (database, OpenRouter; Qdrant is connected by the startup probe),
+loads what is otherwise loaded by the first request that needs it (Gemini SDK, tokenizer, local
+index, spelling vocabulary, reranker model), then runs a few representative questions through retrieval, which
+fills the embedding and retrieval caches and opens the Qdrant and embedding connections.
+
+Liveness (`/health`) is reported from the moment the app starts; readiness (`/health/ready`)
+once the warm-up has finished or given up after WARMUP_TIMEOUT, so the platform routes traffic
+only to hot instances without a failed step keeping an instance out of rotation.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_QUERIES = [
+    "What is Physical AI?",
+    "What is ROS 2?",
+    "How do humanoid robots keep their balance?",
+    "What is Isaac Sim used for?",
+]
+
+
+async def _database():
+    import async_db
+    from sqlalchemy import text
+
+    async with async_db.session_factory()() as session:
+        await session.execute(text("SELECT 1"))
+
+
+async def _openrouter():
+    from openrouter import openrouter_service
+
+    if not await openrouter_service.warm():
+        return "skipped (no API key)"
+
+
+async def _gemini():
+    from gemini_service import gemini_service
+
+    if not await asyncio.to_thread(lambda: gemini_service.available):
+        return "skipped (not configured)"
+
+
+async def _tokenizer():
+    from tokens import get_encoding
+
+    if await asyncio.to_thread(get_encoding) is None:
+        return "character estimate"
+
+
+async def _local_index():
+    from vector_store import qdrant_service
+
+    if await asyncio.to_thread(qdrant_service.load_local_index) is None:
+        return "skipped (no LOCAL_INDEX_PATH)"
+
+
+async def _spelling():
+    from query_normalizer import query_normalizer
+
+    index = await asyncio.to_thread(query_normalizer.index)
+    return f"{len(index.frequencies)} words" if index is not None else "skipped (disabled)"
+
+
+async def _reranker():
+    from reranker import rerank_service
+
+    if not rerank_service.enabled:
+        return "skipped (disabled)"
+    scorer = await asyncio.to_thread(lambda: rerank_service.scorer)
+    return scorer.name
+
+
+# Independent of each other, so they run side by side
+WARMUP_STEPS = {
+    "database": _database,
+    "openrouter": _openrouter,
+    "gemini": _gemini,
+    "tokenizer": _tokenizer,
+    "local_index": _local_index,
+    "spelling": _spelling,
+    "reranker": _reranker,
+}
+
+
+class WarmupService:
+    def __init__(self, steps=None):
+        self.step_functions = steps if steps is not None else WARMUP_STEPS
+        self.enabled = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+        queries = os.getenv("WARMUP_QUERIES")
+        self.queries: List[str] = ([q.strip() for q in queries.split("|") if q.strip()] if queries is not None
+                                   else DEFAULT_WARMUP_QUERIES)
+        self.timeout = float(os.getenv("WARMUP_TIMEOUT", "30"))
+        self.ready = not self.enabled
+        self.timings: Dict[str, Any] = {}
+        self.duration_ms = 0.0
+
+    async def _step(self, name: str, coroutine):
+        started = time.perf_counter()
+        try:
+            note = await coroutine
+            self.timings[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "status": note or "ok"}
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            self.timings[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "status": f"failed: {e}"}
+
+    async def _queries(self):
+        from query_normalizer import query_normalizer
+        from rag import rag_service
+
+        found = 0
+        for query in self.queries:
+            found += len(await rag_service.retrieve_context(await query_normalizer.normalize(query)))
+        return f"{len(self.queries)} queries, {found} chunks"
+
+    async def _run(self):
+        await asyncio.gather(*(self._step(name, step()) for name, step in self.step_functions.items()))
+        # The queries go last so they find the index, vocabulary and connections already loaded
+        if self.queries:
+            await self._step("queries", self._queries())
+
+    async def run(self):
+        """Warm the instance, then mark it ready (also when a step fails or the timeout passes)"""
+        if not self.enabled:
+            self.ready = True
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._run(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Warm-up did not finish within {self.timeout}s; serving anyway")
+        finally:
+            self.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.ready = True
+        logger.info(f"✅ Warm-up finished in {self.duration_ms:.0f} ms")
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "enabled": self.enabled, "duration_ms": self.duration_ms, "steps": self.timings}
+
+
+# Singleton instance
+warmup_service = WarmupService()
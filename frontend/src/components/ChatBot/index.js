@@ -19,15 +19,30 @@ const ChatBot = () => {
 
   // Function to get selected text from the page
   useEffect(() => {
+    let prefetchTimer = null;
+
     const handleSelection = () => {
       const selectedText = window.getSelection().toString().trim();
       if (selectedText) {
         setSelectedText(selectedText);
+
+        // Warm the backend's retrieval for this selection while the question is being typed
+        clearTimeout(prefetchTimer);
+        prefetchTimer = setTimeout(() => {
+          fetch(`${BACKEND_URL}/prefetch`, {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ selected_text: selectedText }),
+          }).catch(() => {}); // best effort only
+        }, 300);
       }
     };
 
     document.addEventListener('mouseup', handleSelection);
     return () => {
+      clearTimeout(prefetchTimer);
       document.removeEventListener('mouseup', handleSelection);
     };
   }, []);
@@ -274,7 +289,8 @@ const ChatBot = () => {
                         }}>
                           {msg.sources.map((source, idx) => (
                             <li key={idx} style={{ marginBottom: '8px' }}>
-                              {source.text?.substring(0, 100)}...
+                              {source.metadata?.title || source.doc_id}
+                              {source.metadata?.section ? ` (${source.metadata.section})` : ''}
                             </li>
                           ))}
                         </ul>